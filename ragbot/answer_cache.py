@@ -0,0 +1,299 @@
+"""Semantic cache of RAG answers, reused for queries similar to previous ones."""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable, RunnableConfig
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL = 3600.0
+
+
+@dataclass
+class CacheEntry:
+    """A cached answer.
+
+    Attributes:
+        vector (np.ndarray): The normalized embedding of the query.
+        history (str): The hash of the chat history the query was asked with.
+        response (dict): The chain response, with its `answer` and `context`.
+        created (float): When the entry was stored, in seconds since the epoch.
+    """
+
+    vector: np.ndarray
+    history: str
+    response: dict
+    created: float
+
+
+class AnswerCache:
+    """Thread-safe LRU cache of answers, looked up by query similarity.
+
+    A query hits the cache when a previous query, asked with the same chat
+    history, has a cosine similarity of at least `threshold` with it. Entries
+    expire `ttl` seconds after being stored, and the least recently used ones
+    are evicted beyond `max_entries`.
+
+    Attributes:
+        namespace (str): Identifier of the project, index and chain whose
+            answers are cached.
+        threshold (float): Minimum cosine similarity of a hit.
+        max_entries (int): Maximum number of cached answers.
+        ttl (float): Lifetime of an entry, in seconds.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups not found in the cache.
+        evictions (int): Number of entries evicted or expired.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+    ):
+        """Initializes an empty cache.
+
+        Args:
+            namespace: Identifier of the project, index and chain whose answers are cached.
+            threshold: Minimum cosine similarity of a hit.
+            max_entries: Maximum number of cached answers.
+            ttl: Lifetime of an entry, in seconds.
+        """
+        self.namespace = namespace
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[int, CacheEntry] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        """Drop the expired entries. The lock must be held."""
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if now - entry.created > self.ttl
+        ]
+        for key in expired:
+            del self._entries[key]
+        self.evictions += len(expired)
+
+    def lookup(self, vector: list[float], history: str) -> dict | None:
+        """Find the answer of the most similar previous query.
+
+        Args:
+            vector: The embedding of the query.
+            history: The hash of the chat history, as returned by `history_key`.
+
+        Returns:
+            The cached chain response, or None if no previous query is similar enough.
+        """
+        query = normalize(vector)
+        with self._lock:
+            self._expire(time.time())
+            candidates = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if entry.history == history
+            ]
+            if candidates:
+                similarities = (
+                    np.stack([entry.vector for _, entry in candidates]) @ query
+                )
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.response
+            self.misses += 1
+            return None
+
+    def store(self, vector: list[float], history: str, response: dict):
+        """Cache the answer of a query.
+
+        Args:
+            vector: The embedding of the query.
+            history: The hash of the chat history, as returned by `history_key`.
+            response: The chain response, with its `answer` and `context`.
+        """
+        entry = CacheEntry(normalize(vector), history, response, time.time())
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Report how effective the cache has been.
+
+        Returns:
+            The number of `hits`, `misses` and `evictions`, the `hit_rate` and
+            the number of cached `entries`.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+def normalize(vector: list[float]) -> np.ndarray:
+    """Scale a vector to unit length, so that dot products are cosine similarities."""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+def history_key(history: list) -> str:
+    """Hash a chat history, so that answers are only reused within the same conversation state."""
+    payload = json.dumps([list(message) for message in history or []], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_caches: dict[str, AnswerCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_answer_cache(
+    project_name: str, index: str, settings: str, **kwargs: Any
+) -> AnswerCache:
+    """Return the process-wide answer cache of a project, index and chain.
+
+    Chains with the same project, index and settings share one cache. Caches
+    of the project built on another version of its index are dropped, since
+    their answers may be outdated.
+
+    Args:
+        project_name: The project identifier.
+        index: The fingerprint of the index the answers were retrieved from.
+        settings: Identifier of the chain settings the answers were generated with.
+        **kwargs: Keyword arguments of `AnswerCache`, used if the cache is created.
+
+    Returns:
+        The shared `AnswerCache`.
+    """
+    namespace = f"{project_name}/{index}/{settings}"
+    with _registry_lock:
+        for other in list(_caches):
+            if other.startswith(f"{project_name}/") and not other.startswith(
+                f"{project_name}/{index}/"
+            ):
+                del _caches[other]
+        if namespace not in _caches:
+            _caches[namespace] = AnswerCache(namespace, **kwargs)
+        return _caches[namespace]
+
+
+class CachedChain(Runnable):
+    """Retrieval chain answering from a semantic cache when possible.
+
+    The incoming query is embedded and looked up in the cache. On a hit, the
+    cached answer and context are returned without retrieval or generation. On a
+    miss, the chain runs and its response is cached. Streaming is preserved on
+    misses, and a hit is streamed as a single chunk.
+
+    Attributes:
+        chain (Runnable): The retrieval chain.
+        cache (AnswerCache): The answer cache.
+        embeddings (Embeddings): The embeddings model used to embed queries.
+    """
+
+    def __init__(self, chain: Runnable, cache: AnswerCache, embeddings: Embeddings):
+        """Initializes the cached chain.
+
+        Args:
+            chain: The retrieval chain.
+            cache: The answer cache.
+            embeddings: The embeddings model used to embed queries, usually the
+                one of the index, whose query embeddings are cached as well.
+        """
+        self.chain = chain
+        self.cache = cache
+        self.embeddings = embeddings
+
+    def _respond(self, input: dict, cached: dict) -> dict:
+        """Build the response to an input from a cached response."""
+        return {**input, "context": cached["context"], "answer": cached["answer"]}
+
+    def _store(self, vector: list[float], input: dict, response: dict):
+        """Cache the response of an input."""
+        self.cache.store(
+            vector,
+            history_key(input.get("history")),
+            {"context": response.get("context", []), "answer": response["answer"]},
+        )
+
+    def invoke(
+        self, input: dict, config: RunnableConfig | None = None, **kwargs: Any
+    ) -> dict:
+        vector = self.embeddings.embed_query(input["input"])
+        cached = self.cache.lookup(vector, history_key(input.get("history")))
+        if cached is not None:
+            return self._respond(input, cached)
+        response = self.chain.invoke(input, config, **kwargs)
+        self._store(vector, input, response)
+        return response
+
+    async def ainvoke(
+        self, input: dict, config: RunnableConfig | None = None, **kwargs: Any
+    ) -> dict:
+        vector = await self.embeddings.aembed_query(input["input"])
+        cached = self.cache.lookup(vector, history_key(input.get("history")))
+        if cached is not None:
+            return self._respond(input, cached)
+        response = await self.chain.ainvoke(input, config, **kwargs)
+        self._store(vector, input, response)
+        return response
+
+    def stream(
+        self, input: dict, config: RunnableConfig | None = None, **kwargs: Any
+    ) -> Iterator[dict]:
+        vector = self.embeddings.embed_query(input["input"])
+        cached = self.cache.lookup(vector, history_key(input.get("history")))
+        if cached is not None:
+            yield self._respond(input, cached)
+            return
+        response = {"answer": ""}
+        for chunk in self.chain.stream(input, config, **kwargs):
+            response["context"] = chunk.get("context", response.get("context"))
+            response["answer"] += chunk.get("answer", "")
+            yield chunk
+        self._store(vector, input, response)
+
+    async def astream(
+        self, input: dict, config: RunnableConfig | None = None, **kwargs: Any
+    ) -> AsyncIterator[dict]:
+        vector = await self.embeddings.aembed_query(input["input"])
+        cached = self.cache.lookup(vector, history_key(input.get("history")))
+        if cached is not None:
+            yield self._respond(input, cached)
+            return
+        response = {"answer": ""}
+        async for chunk in self.chain.astream(input, config, **kwargs):
+            response["context"] = chunk.get("context", response.get("context"))
+            response["answer"] += chunk.get("answer", "")
+            yield chunk
+        self._store(vector, input, response)
@@ -1,8 +1,73 @@
 """Interactive chat interface for a RAG-powered language model."""
 
-from IPython.core.display import display_markdown
+import time
+from typing import Any, Callable
 
+from langchain_core.runnables import Runnable
+
+from ragbot.answer_cache import CachedChain
 from ragbot.rag import setup
+from ragbot.retrieval import DEFAULT_FETCH_K, DEFAULT_LAMBDA_MULT
+from ragbot.utils.rate_limit import estimate_tokens
+
+
+def stream_answer(
+    qa: Runnable, inputs: dict, on_token: Callable[[str], Any]
+) -> tuple[dict, dict]:
+    """Stream the answer of a retrieval chain, collecting the full response.
+
+    Args:
+        qa: The retrieval chain.
+        inputs: The chain inputs, with the `history` and the `input` query.
+        on_token: Called with each piece of the answer as soon as it is generated.
+
+    Returns:
+        The full response, with the `context` documents and the whole `answer`,
+        and the latency stats of the turn: `retrieval` and `first_token` times
+        in seconds since the query was sent, and the `tokens_per_second` of the
+        generation, or None if the answer came in one piece, as it does from
+        the answer cache.
+    """
+    response = {"answer": ""}
+    start = time.perf_counter()
+    retrieval = first_token = None
+    pieces = 0
+    for chunk in qa.stream(inputs):
+        if "context" in chunk:
+            retrieval = time.perf_counter() - start
+            response["context"] = chunk["context"]
+        if chunk.get("answer"):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            response["answer"] += chunk["answer"]
+            pieces += 1
+            on_token(chunk["answer"])
+    total = time.perf_counter() - start
+
+    generation = total - (first_token or total)
+    tokens = estimate_tokens(response["answer"])
+    stats = {
+        "retrieval": retrieval,
+        "first_token": first_token,
+        "tokens_per_second": (
+            tokens / generation if pieces > 1 and generation > 0 else None
+        ),
+    }
+    return response, stats
+
+
+def format_stats(stats: dict) -> str:
+    """Format the latency stats of a chat turn as a status line."""
+    parts = []
+    if stats["retrieval"] is not None:
+        parts.append(f"retrieval {stats['retrieval'] * 1000:.0f} ms")
+    if stats["first_token"] is not None:
+        parts.append(f"first token {stats['first_token'] * 1000:.0f} ms")
+    if stats["tokens_per_second"] is not None:
+        parts.append(f"~{stats['tokens_per_second']:.1f} tokens/s")
+    if "cache_hit_rate" in stats:
+        parts.append(f"cache hit rate {stats['cache_hit_rate']:.0%}")
+    return f"[{' | '.join(parts)}]"
 
 
 def chat(
@@ -18,12 +83,21 @@ def chat(
     chunk_overlap: int,
     search_type: str,
     k_docs: int,
+    fetch_k: int = DEFAULT_FETCH_K,
+    lambda_mult: float = DEFAULT_LAMBDA_MULT,
+    show_stats: bool = False,
+    cache_threshold: float | None = None,
+    vectorstore: str = "chroma",
+    pack_context: bool = False,
+    context_tokens: int | None = None,
+    dedup_threshold: float | None = None,
 ):
     """Start an interactive chat session using a RAG pipeline.
 
     This function initializes the RAG components with the given parameters and launches
     a loop that allows users to send queries to the model. It supports simple commands
-    for help (`/?`), clearing history (`/clear`), and exiting (`/bye`).
+    for help (`/?`), clearing history (`/clear`), and exiting (`/bye`). Answers are
+    printed token by token as the model generates them.
 
     Args:
         project_name: The name of the LangChain project.
@@ -38,6 +112,21 @@ def chat(
         chunk_overlap: Number of overlapping tokens between chunks.
         search_type: The type of retrieval search to use.
         k_docs: Number of top documents to retrieve for each query.
+        fetch_k: Number of most similar chunks the "mmr" search selects from.
+        lambda_mult: Trade-off of the "mmr" search between relevance, at 1, and
+            diversity, at 0.
+        show_stats: Whether to print the retrieval latency, time to first token
+            and generation speed after each answer.
+        cache_threshold: Minimum cosine similarity for a query to be answered
+            from the semantic answer cache, or None to disable the cache.
+        vectorstore: The vector store backend, "chroma", "numpy" or "ivf", with
+            the default settings of the IVF index.
+        pack_context: Whether to merge overlapping chunks and drop repeated
+            text from the retrieved context.
+        context_tokens: Budget of the retrieved context, in estimated tokens,
+            or None for no limit.
+        dedup_threshold: Similarity above which chunks are merged into an
+            indexed near-duplicate, or None to index every chunk.
     """
     qa = setup(
         project_name=project_name,
@@ -52,6 +141,15 @@ def chat(
         chunk_overlap=chunk_overlap,
         search_type=search_type,
         k_docs=k_docs,
+        fetch_k=fetch_k,
+        lambda_mult=lambda_mult,
+        answer_cache=(
+            {"threshold": cache_threshold} if cache_threshold is not None else None
+        ),
+        vectorstore_backend=vectorstore,
+        pack_context=pack_context,
+        context_tokens=context_tokens,
+        dedup_threshold=dedup_threshold,
     )
 
     history = []
@@ -68,6 +166,14 @@ def chat(
         if query.lower() == "/bye":
             print("Session closed!")
             exit(0)
-        response = qa.invoke({"history": history, "input": query})
+        response, stats = stream_answer(
+            qa,
+            {"history": history, "input": query},
+            lambda token: print(token, end="", flush=True),
+        )
+        print()
         history.extend([("human", query), ("ai", response["answer"])])
-        display_markdown(response["answer"])
+        if show_stats:
+            if isinstance(qa, CachedChain):
+                stats["cache_hit_rate"] = qa.cache.stats()["hit_rate"]
+            print(format_stats(stats))
@@ -0,0 +1,244 @@
+"""Reading and splitting of knowledge base files into identified chunks."""
+
+import hashlib
+import itertools
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+
+from ragbot.utils.stages import StageStats
+
+# Characters of a knowledge base file read at a time when splitting it
+READ_BLOCK_SIZE = 1 << 20
+DEFAULT_CHUNKING_WORKERS = 1
+
+
+def file_hash(file: str) -> str:
+    """Compute the SHA-256 digest of a file's content.
+
+    Args:
+        file: Path to the file.
+
+    Returns:
+        The hexadecimal digest.
+
+    Raises:
+        RuntimeError: If the file cannot be read.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except Exception as e:
+        raise RuntimeError(f"Failed to read file {file}: {e}") from e
+    return digest.hexdigest()
+
+
+def get_text_splitter(chunk_size: int, chunk_overlap: int) -> TextSplitter:
+    """Create the text splitter used to chunk knowledge base files.
+
+    Args:
+        chunk_size: The maximum size of each text chunk.
+        chunk_overlap: The number of characters to overlap between chunks.
+
+    Returns:
+        A `RecursiveCharacterTextSplitter` recording each chunk's start index.
+    """
+    return RecursiveCharacterTextSplitter(
+        separators=["\n\n", "\n", " ", ""],
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True,
+    )
+
+
+def split_file(
+    file: str,
+    text_splitter: TextSplitter,
+    digest: str | None = None,
+    block_size: int = READ_BLOCK_SIZE,
+) -> Iterator[Document]:
+    """Split a knowledge base file into identified document chunks, lazily.
+
+    The file is read in blocks of `block_size` characters. Each block is cut
+    after its last paragraph, line or word break, and the text before the cut
+    is split while the rest is carried over to the next block, so memory use
+    does not grow with the file size. Files smaller than a block are split
+    exactly as a whole. Chunk IDs are derived from the file name, its content
+    hash and the chunk position, so they stay stable while the file is unchanged.
+
+    Args:
+        file: Path to the knowledge base file.
+        text_splitter: The splitter used to chunk the file content.
+        digest: The content hash of the file, computed if not given.
+        block_size: Number of characters read at a time.
+
+    Yields:
+        The chunks of the file, with their `source` and `start_index` metadata.
+
+    Raises:
+        RuntimeError: If the file cannot be read.
+    """
+    name = os.path.basename(file)
+    digest = digest or file_hash(file)
+    position = 0
+    # Character offset of the carried over text in the file
+    offset = 0
+    carry = ""
+    try:
+        with open(file, "r", encoding="utf-8") as f:
+            while True:
+                block = f.read(block_size)
+                text = carry + block
+                cut = len(text)
+                if len(block) == block_size:
+                    for separator in ("\n\n", "\n", " "):
+                        if (index := text.rfind(separator)) > 0:
+                            cut = index + len(separator)
+                            break
+                segment, carry = text[:cut], text[cut:]
+                for doc in text_splitter.create_documents(
+                    [segment], metadatas=[{"source": name}]
+                ):
+                    doc.metadata["start_index"] += offset
+                    doc.id = f"{name}-{digest[:12]}-{position}"
+                    position += 1
+                    yield doc
+                offset += len(segment)
+                if len(block) < block_size:
+                    return
+    except (OSError, UnicodeDecodeError) as e:
+        raise RuntimeError(f"Failed to read file {file}: {e}") from e
+
+
+def split_file_in_worker(
+    file: str, chunk_size: int, chunk_overlap: int, digest: str
+) -> tuple[list[tuple[str, int, str]], float]:
+    """Split a knowledge base file with `split_file` in a worker process.
+
+    The file is read block by block as in the main process, and its chunks are
+    collected and returned at once as plain tuples, which are much cheaper to
+    send back to the main process than `Document` objects.
+
+    Args:
+        file: Path to the knowledge base file.
+        chunk_size: The maximum size of each text chunk.
+        chunk_overlap: The number of characters to overlap between chunks.
+        digest: The content hash of the file.
+
+    Returns:
+        The ID, start index and text of each chunk of the file, and the time
+        spent reading and splitting it.
+    """
+    start = time.perf_counter()
+    chunks = [
+        (doc.id, doc.metadata["start_index"], doc.page_content)
+        for doc in split_file(
+            file, get_text_splitter(chunk_size, chunk_overlap), digest
+        )
+    ]
+    return chunks, time.perf_counter() - start
+
+
+def split_files(
+    files: list[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    digests: dict[str, str] | None = None,
+    workers: int = DEFAULT_CHUNKING_WORKERS,
+    stats: StageStats | None = None,
+) -> Iterator[tuple[str, Iterator[Document]]]:
+    """Split knowledge base files, in parallel with a pool of processes.
+
+    With a single worker, files are split lazily in this process. Otherwise
+    each file is split by a pool of `workers` processes, which send back all
+    its chunks at once, with at most two files per worker in flight to bound
+    memory usage. Files are
+    yielded in the given order and chunk IDs only depend on the file, so the
+    chunks are the same whatever the number of workers.
+
+    Args:
+        files: Paths to the knowledge base files.
+        chunk_size: The maximum size of each text chunk.
+        chunk_overlap: The number of characters to overlap between chunks.
+        digests: The content hash of each file name, computed if not given.
+        workers: Number of processes reading and splitting files.
+        stats: Where to record the files, bytes and time of the stage.
+
+    Yields:
+        The path of each file, and an iterator over its chunks.
+    """
+    digests = digests or {}
+
+    def digest(file: str) -> str:
+        return digests.get(os.path.basename(file)) or file_hash(file)
+
+    if workers <= 1:
+        text_splitter = get_text_splitter(chunk_size, chunk_overlap)
+        for file in files:
+            yield file, timed(
+                split_file(file, text_splitter, digest(file)), file, stats
+            )
+        return
+
+    # Workers only import this module, not the vector stores
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        queue = iter(files)
+        in_flight = deque()
+
+        def submit(file: str):
+            in_flight.append(
+                (
+                    file,
+                    executor.submit(
+                        split_file_in_worker,
+                        file,
+                        chunk_size,
+                        chunk_overlap,
+                        digest(file),
+                    ),
+                )
+            )
+
+        for file in itertools.islice(queue, 2 * workers):
+            submit(file)
+        while in_flight:
+            file, future = in_flight.popleft()
+            chunks, seconds = future.result()
+            for next_file in itertools.islice(queue, 1):
+                submit(next_file)
+            if stats is not None:
+                stats.add(1, seconds, os.path.getsize(file))
+            source = os.path.basename(file)
+            yield file, (
+                Document(
+                    page_content=text,
+                    metadata={"source": source, "start_index": start},
+                    id=chunk_id,
+                )
+                for chunk_id, start, text in chunks
+            )
+
+
+def timed(
+    docs: Iterator[Document], file: str, stats: StageStats | None
+) -> Iterator[Document]:
+    """Record the time spent producing the chunks of a file lazily."""
+    elapsed = 0.0
+    while True:
+        start = time.perf_counter()
+        doc = next(docs, None)
+        elapsed += time.perf_counter() - start
+        if doc is None:
+            break
+        yield doc
+    if stats is not None:
+        stats.add(1, elapsed, os.path.getsize(file))
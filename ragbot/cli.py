@@ -1,11 +1,34 @@
-"""Command-line interface (CLI) entry point for RAG-based chatbot and evaluation tool."""
+"""Command-line interface (CLI) entry point for RAG-based chatbot and evaluation tool.
+
+Subcommands import their implementation when they run, so that parsing the
+arguments, or printing the help, does not load LangChain or provider SDKs.
+"""
 
 import argparse
+import json
 from argparse import ArgumentParser
 
-from ragbot.chat import chat
-from ragbot.evaluate import evaluate
-from ragbot.utils.utils import use_langsmith
+from ragbot.retrieval import BACKENDS, DEFAULT_FETCH_K, DEFAULT_LAMBDA_MULT
+
+
+def parse_observability_args(subparser: argparse.ArgumentParser):
+    """Add the tracing and timing arguments of the subcommands running a chain.
+
+    Args:
+        subparser: A subparser object from argparse to attach the arguments to.
+    """
+    subparser.add_argument(
+        "--langsmith",
+        action="store_true",
+        help="Trace the runs remotely to LangSmith (needs LANGCHAIN_API_KEY)",
+    )
+    subparser.add_argument(
+        "--timings",
+        type=str,
+        default=None,
+        help="Path to a file for the latency histograms of the pipeline stages, "
+        "in the Prometheus text format if it ends with .prom, and JSON otherwise",
+    )
 
 
 def parse_chat_args(subparser: argparse.ArgumentParser):
@@ -49,6 +72,54 @@ def parse_chat_args(subparser: argparse.ArgumentParser):
     subparser.add_argument(
         "--k", type=int, default=4, help="Number of documents to retrieve"
     )
+    subparser.add_argument(
+        "--fetch-k",
+        type=int,
+        default=DEFAULT_FETCH_K,
+        help="Number of most similar documents the mmr search selects from",
+    )
+    subparser.add_argument(
+        "--lambda-mult",
+        type=float,
+        default=DEFAULT_LAMBDA_MULT,
+        help="Relevance (1) to diversity (0) trade-off of the mmr search",
+    )
+    subparser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Show retrieval latency, time to first token and tokens/s per answer",
+    )
+    subparser.add_argument(
+        "--cache-threshold",
+        type=float,
+        default=None,
+        help="Answer queries this similar to previous ones from a cache",
+    )
+    subparser.add_argument(
+        "--vectorstore",
+        type=str,
+        choices=BACKENDS,
+        default="chroma",
+        help="Vector store backend searched",
+    )
+    subparser.add_argument(
+        "--pack-context",
+        action="store_true",
+        help="Merge overlapping chunks and drop repeated text from the context",
+    )
+    subparser.add_argument(
+        "--context-tokens",
+        type=int,
+        default=None,
+        help="Token budget of the retrieved context, packing it",
+    )
+    subparser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=None,
+        help="Merge chunks this similar to an indexed chunk instead of embedding them",
+    )
+    parse_observability_args(subparser)
     subparser.set_defaults(func=chat_command)
 
 
@@ -70,15 +141,214 @@ def parse_evaluate_args(subparser: argparse.ArgumentParser):
     subparser.add_argument(
         "--dataset-name", type=str, default="ds-test", help="Name of the dataset"
     )
+    subparser.add_argument(
+        "--dataset",
+        type=str,
+        default=None,
+        help="Path to a local JSONL or Parquet dataset (evaluates offline)",
+    )
+    subparser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Path to the JSONL file for offline results",
+    )
+    parse_observability_args(subparser)
     subparser.set_defaults(func=evaluate_command)
 
 
+def parse_sweep_args(subparser: argparse.ArgumentParser):
+    """Add command-line arguments for the 'sweep' subcommand.
+
+    Args:
+        subparser: A subparser object from argparse to attach the sweep arguments to.
+    """
+    subparser.add_argument(
+        "-p", "--proj", type=str, required=True, help="Name of the project"
+    )
+    subparser.add_argument(
+        "--grid", type=str, required=True, help="Path to the parameter grid file"
+    )
+    subparser.add_argument(
+        "--dataset-name", type=str, default="ds-test", help="Name of the dataset"
+    )
+    subparser.add_argument(
+        "--dataset",
+        type=str,
+        default=None,
+        help="Path to a local JSONL or Parquet dataset (evaluates offline)",
+    )
+    subparser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Directory for the results of each configuration and the comparison",
+    )
+    subparser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of configurations evaluated in parallel",
+    )
+    subparser.set_defaults(func=sweep_command)
+
+
+def parse_serve_args(subparser: argparse.ArgumentParser):
+    """Add command-line arguments for the 'serve' subcommand.
+
+    Args:
+        subparser: A subparser object from argparse to attach the serve arguments to.
+    """
+    subparser.add_argument(
+        "-p", "--proj", type=str, required=True, help="Name of the project"
+    )
+    subparser.add_argument(
+        "--config-path",
+        type=str,
+        default="configs/default.json",
+        help="Path to config file",
+    )
+    subparser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Interface to listen on"
+    )
+    subparser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    subparser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=32,
+        help="Maximum number of answers generated at the same time",
+    )
+    subparser.add_argument(
+        "--max-queue",
+        type=int,
+        default=256,
+        help="Maximum number of waiting requests before rejecting new ones",
+    )
+    parse_observability_args(subparser)
+    subparser.set_defaults(func=serve_command)
+
+
+def parse_index_args(subparser: argparse.ArgumentParser):
+    """Add command-line arguments for the 'index' subcommand.
+
+    Args:
+        subparser: A subparser object from argparse to attach the index actions to.
+    """
+    actions = subparser.add_subparsers(title="actions", dest="action", required=True)
+
+    build_parser = actions.add_parser(
+        "build",
+        help="Build the index of a project for a config file",
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+    )
+    build_parser.add_argument(
+        "-p", "--proj", type=str, required=True, help="Name of the project"
+    )
+    build_parser.add_argument(
+        "--config-path",
+        type=str,
+        default="configs/default.json",
+        help="Path to config file",
+    )
+    build_parser.add_argument(
+        "--force", action="store_true", help="Rebuild the whole index from scratch"
+    )
+    build_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Chunks per embedding request (overrides the config file)",
+    )
+    build_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Concurrent embedding requests (overrides the config file)",
+    )
+    build_parser.add_argument(
+        "--chunking-workers",
+        type=int,
+        default=None,
+        help="Processes reading and splitting files (overrides the config file)",
+    )
+    build_parser.set_defaults(func=index_build_command)
+
+    status_parser = actions.add_parser(
+        "status",
+        help="Show the persisted indexes of a project",
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+    )
+    status_parser.add_argument(
+        "-p", "--proj", type=str, required=True, help="Name of the project"
+    )
+    status_parser.set_defaults(func=index_status_command)
+
+    drop_parser = actions.add_parser(
+        "drop",
+        help="Remove the persisted indexes of a project",
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+    )
+    drop_parser.add_argument(
+        "-p", "--proj", type=str, required=True, help="Name of the project"
+    )
+    drop_parser.add_argument(
+        "--key", type=str, default=None, help="Key of the index to remove"
+    )
+    drop_parser.set_defaults(func=index_drop_command)
+
+    report_parser = actions.add_parser(
+        "ann-report",
+        help="Compare the recall and latency of the IVF index with exact search",
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+    )
+    report_parser.add_argument(
+        "-p", "--proj", type=str, required=True, help="Name of the project"
+    )
+    report_parser.add_argument(
+        "--config-path",
+        type=str,
+        default="configs/default.json",
+        help="Path to config file",
+    )
+    report_parser.add_argument(
+        "--nprobe",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32],
+        help="Numbers of clusters searched per query to compare",
+    )
+    report_parser.add_argument(
+        "--k", type=int, default=None, help="Number of chunks retrieved per query"
+    )
+    report_parser.add_argument(
+        "--queries", type=int, default=200, help="Number of sampled queries"
+    )
+    report_parser.add_argument(
+        "--dataset",
+        type=str,
+        default=None,
+        help="Local dataset whose embedded questions are the queries",
+    )
+    report_parser.add_argument(
+        "--noise",
+        type=float,
+        default=None,
+        help="Norm of the noise moving sampled chunks away from the index",
+    )
+    report_parser.add_argument(
+        "--output", type=str, default=None, help="Path to a JSON file for the report"
+    )
+    report_parser.set_defaults(func=index_ann_report_command)
+
+
 def chat_command(args: argparse.Namespace):
     """Execute the chat command with parsed CLI arguments.
 
     Args:
         args: Parsed argparse namespace containing chat config.
     """
+    from ragbot.chat import chat
+
     chat(
         project_name=args.proj,
         llm_provider=args.llm_provider,
@@ -92,6 +362,14 @@ def chat_command(args: argparse.Namespace):
         chunk_overlap=args.chunk_overlap,
         search_type=args.search_type,
         k_docs=args.k,
+        fetch_k=args.fetch_k,
+        lambda_mult=args.lambda_mult,
+        show_stats=args.stats,
+        cache_threshold=args.cache_threshold,
+        vectorstore=args.vectorstore,
+        pack_context=args.pack_context,
+        context_tokens=args.context_tokens,
+        dedup_threshold=args.dedup_threshold,
     )
 
 
@@ -101,18 +379,218 @@ def evaluate_command(args: argparse.Namespace):
     Args:
         args: Parsed argparse namespace containing evaluation config.
     """
+    from ragbot.evaluate import evaluate
+
     evaluate(
         project_name=args.proj,
         config_path=args.config_path,
         dataset_name=args.dataset_name,
+        dataset_path=args.dataset,
+        output_path=args.output,
     )
 
 
+def sweep_command(args: argparse.Namespace):
+    """Execute the sweep command with parsed CLI arguments.
+
+    Args:
+        args: Parsed argparse namespace containing the grid and dataset.
+    """
+    from ragbot.sweep import sweep
+
+    sweep(
+        project_name=args.proj,
+        grid_path=args.grid,
+        dataset_name=args.dataset_name,
+        dataset_path=args.dataset,
+        output_dir=args.output,
+        workers=args.workers,
+    )
+
+
+def serve_command(args: argparse.Namespace):
+    """Execute the serve command with parsed CLI arguments.
+
+    Args:
+        args: Parsed argparse namespace containing the server config.
+    """
+    from ragbot.serve import serve
+
+    serve(
+        project_name=args.proj,
+        config_path=args.config_path,
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+    )
+
+
+def index_build_command(args: argparse.Namespace):
+    """Build the persisted index of a project with parsed CLI arguments.
+
+    Args:
+        args: Parsed argparse namespace containing the project and config path.
+    """
+    from ragbot.chunking import DEFAULT_CHUNKING_WORKERS
+    from ragbot.ingestion import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+    from ragbot.rag import get_vectorstore
+    from ragbot.utils.rate_limit import configure_rate_limits
+    from ragbot.utils.utils import load_config
+
+    config = load_config(args.config_path)
+    configure_rate_limits(config.get("rate_limits", {}))
+    get_vectorstore(
+        project_name=args.proj,
+        embeddings_provider=config["embeddings_provider"],
+        embedding_model=config["embedding_model"],
+        chunk_size=config["chunk_size"],
+        chunk_overlap=config["chunk_overlap"],
+        rebuild=args.force,
+        batch_size=args.batch_size
+        or config.get("embedding_batch_size", DEFAULT_BATCH_SIZE),
+        workers=args.workers or config.get("embedding_workers", DEFAULT_WORKERS),
+        backend=config.get("vectorstore", "chroma"),
+        ann=config.get("ann"),
+        dump_chunks=config.get("dump_chunks", False),
+        chunking_workers=args.chunking_workers
+        or config.get("chunking_workers", DEFAULT_CHUNKING_WORKERS),
+        dedup_threshold=config.get("dedup_threshold"),
+    )
+    index_status_command(args)
+
+
+def index_status_command(args: argparse.Namespace):
+    """Print the persisted indexes of a project.
+
+    Args:
+        args: Parsed argparse namespace containing the project.
+    """
+    from ragbot.indexing import index_status
+
+    status = index_status(args.proj)
+    if not status:
+        print(f"No indexes for project {args.proj}")
+    for index in status:
+        if not index["complete"]:
+            print(f"{index['key']}  incomplete")
+            continue
+        dedup = (
+            f"duplicates={index['num_duplicates']}  "
+            f"dedup_threshold={index['dedup_threshold']}  "
+            if "num_duplicates" in index
+            else ""
+        )
+        print(
+            f"{index['key']}  {'fresh' if index['fresh'] else 'stale'}  "
+            f"chunks={index['num_chunks']}  "
+            f"chunk_size={index['chunk_size']}  "
+            f"chunk_overlap={index['chunk_overlap']}  "
+            f"embeddings={index['embeddings_provider']}/{index['embedding_model']}  "
+            f"{dedup}created={index['created_at']}"
+        )
+
+
+def index_drop_command(args: argparse.Namespace):
+    """Remove persisted indexes of a project.
+
+    Args:
+        args: Parsed argparse namespace containing the project and index key.
+    """
+    from ragbot.indexing import drop_index
+
+    for key in drop_index(args.proj, args.key):
+        print(f"Dropped index {key}")
+
+
+def index_ann_report_command(args: argparse.Namespace):
+    """Print the recall@k and latency of the IVF index of a project.
+
+    Args:
+        args: Parsed argparse namespace containing the project, config path and
+            the settings of the report.
+    """
+    from ragbot.indexing import index_path, index_settings
+    from ragbot.ingestion import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+    from ragbot.rag import get_vectorstore
+    from ragbot.retrieval.ivf import (
+        DEFAULT_ITERATIONS,
+        DEFAULT_QUERY_NOISE,
+        recall_report,
+    )
+    from ragbot.utils.rate_limit import configure_rate_limits
+    from ragbot.utils.utils import load_config
+
+    config = load_config(args.config_path)
+    configure_rate_limits(config.get("rate_limits", {}))
+    ann = config.get("ann", {})
+    store = get_vectorstore(
+        project_name=args.proj,
+        embeddings_provider=config["embeddings_provider"],
+        embedding_model=config["embedding_model"],
+        chunk_size=config["chunk_size"],
+        chunk_overlap=config["chunk_overlap"],
+        batch_size=config.get("embedding_batch_size", DEFAULT_BATCH_SIZE),
+        workers=config.get("embedding_workers", DEFAULT_WORKERS),
+        backend="numpy",
+        dedup_threshold=config.get("dedup_threshold"),
+    )
+    path = index_path(
+        args.proj,
+        index_settings(
+            config["chunk_size"],
+            config["chunk_overlap"],
+            config["embeddings_provider"],
+            config["embedding_model"],
+            config.get("dedup_threshold"),
+        ),
+    )
+    queries = None
+    if args.dataset:
+        from ragbot.evaluation.local import load_dataset
+
+        questions = [
+            example["inputs"]["input"] for example in load_dataset(args.dataset)
+        ]
+        queries = store.embeddings.embed_documents(questions[: args.queries])
+    report = recall_report(
+        path,
+        store,
+        nprobes=args.nprobe,
+        k=args.k or config.get("k_docs", 4),
+        num_queries=args.queries,
+        nlist=ann.get("nlist"),
+        iterations=ann.get("iterations", DEFAULT_ITERATIONS),
+        seed=ann.get("seed", 0),
+        queries=queries,
+        noise=DEFAULT_QUERY_NOISE if args.noise is None else args.noise,
+    )
+
+    print(
+        f"{report['num_chunks']} chunks, nlist={report['nlist']}, "
+        f"built or loaded in {report['build_seconds']:.2f}s, "
+        f"{report['num_queries']} queries ({report['query_source']}), k={report['k']}"
+    )
+    print(
+        f"exact      recall=1.000  mean={report['exact']['mean_ms']:.3f} ms  "
+        f"p95={report['exact']['p95_ms']:.3f} ms"
+    )
+    for row in report["nprobe"]:
+        print(
+            f"nprobe={row['nprobe']:<4} recall={row['recall']:.3f}  "
+            f"mean={row['mean_ms']:.3f} ms  p95={row['p95_ms']:.3f} ms  "
+            f"speedup={row['speedup']:.1f}x"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
 def main():
     """Main CLI entry point.
 
-    Parses command-line arguments and invokes the corresponding function for either
-    chat or evaluation mode.
+    Parses command-line arguments and invokes the corresponding function for chat,
+    evaluation, sweep, serving or index management mode.
     """
     parser = ArgumentParser(
         prog="poetry run python -m ragbot.cli",
@@ -141,14 +619,52 @@ def main():
     )
     parse_evaluate_args(eval_parser)
 
+    # Subcommand: sweep
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Evaluate and compare a grid of configurations",
+        usage="poetry run python -m ragbot.cli sweep -p <project> --grid <path> [options]",
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+    )
+    parse_sweep_args(sweep_parser)
+
+    # Subcommand: serve
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Serve the chat over HTTP",
+        usage="poetry run python -m ragbot.cli serve -p <project> [options]",
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+    )
+    parse_serve_args(serve_parser)
+
+    # Subcommand: index
+    index_parser = subparsers.add_parser(
+        "index",
+        help="Build, inspect, drop or benchmark persisted indexes",
+        usage="poetry run python -m ragbot.cli index {build,status,drop,ann-report} -p <project> [options]",
+    )
+    parse_index_args(index_parser)
+
     args = parser.parse_args()
-    use_langsmith(args.proj)
+    from ragbot.utils.utils import disable_langsmith, use_langsmith
+
+    # Trace remotely only on request, or to evaluate on a LangSmith dataset
+    remote_dataset = getattr(args, "dataset_name", None) and args.dataset is None
+    if getattr(args, "langsmith", False) or remote_dataset:
+        use_langsmith(args.proj)
+    else:
+        disable_langsmith()
 
     try:
         args.func(args)
     except Exception as e:
         print(f"[ERROR] {e}")
         exit(1)
+    finally:
+        if getattr(args, "timings", None):
+            from ragbot.utils.instrumentation import dump_histograms
+
+            dump_histograms(args.timings)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+"""Near-duplicate detection of chunks with MinHash and locality-sensitive hashing."""
+
+import os
+import zlib
+
+import numpy as np
+
+from ragbot.retrieval.bm25 import tokenize
+
+DEDUP_FILE = "minhash.npz"
+DEFAULT_NUM_PERM = 128
+# Number of consecutive words of each shingle
+SHINGLE_SIZE = 3
+# Largest probability of missing a pair of chunks exactly at the threshold
+MAX_MISS_RATE = 0.05
+
+
+def band_layout(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Choose the LSH bands of MinHash signatures for a similarity threshold.
+
+    Two chunks of Jaccard similarity `s` share at least one band of `rows`
+    values, and are compared, with probability `1 - (1 - s**rows)**bands`.
+    The layout with the most rows per band, which compares the fewest
+    dissimilar pairs, that still finds pairs at the threshold with probability
+    `1 - MAX_MISS_RATE` is chosen.
+
+    Args:
+        threshold: The Jaccard similarity of near-duplicate chunks.
+        num_perm: The number of values of a signature.
+
+    Returns:
+        The number of bands and of rows per band.
+    """
+    layouts = [
+        (num_perm // rows, rows)
+        for rows in range(1, num_perm + 1)
+        if num_perm % rows == 0
+    ]
+    found = [
+        (bands, rows)
+        for bands, rows in layouts
+        if 1 - (1 - threshold**rows) ** bands >= 1 - MAX_MISS_RATE
+    ]
+    return max(found, key=lambda layout: layout[1]) if found else layouts[0]
+
+
+class MinHashIndex:
+    """LSH index of the MinHash signatures of chunks.
+
+    A signature holds, for each of `num_perm` hash functions, the minimum hash
+    of the word shingles of a chunk, so that two signatures agree on a value
+    with probability the Jaccard similarity of the shingles. Signatures are
+    split into bands, and only the chunks sharing a band with a query are
+    compared with it.
+
+    Attributes:
+        threshold (float): The Jaccard similarity of near-duplicate chunks.
+        num_perm (int): The number of values of a signature.
+        seed (int): The seed of the hash functions.
+        bands (int): The number of bands of a signature.
+        rows (int): The number of values of a band.
+    """
+
+    def __init__(
+        self, threshold: float, num_perm: int = DEFAULT_NUM_PERM, seed: int = 0
+    ):
+        """Initializes an empty index.
+
+        Args:
+            threshold: The Jaccard similarity of near-duplicate chunks, in (0, 1].
+            num_perm: The number of values of a signature.
+            seed: The seed of the hash functions.
+
+        Raises:
+            ValueError: If the threshold is not in (0, 1].
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Deduplication threshold must be in (0, 1]: {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.seed = seed
+        self.bands, self.rows = band_layout(threshold, num_perm)
+        # Multiply-add-shift hash functions, computed modulo 2**64
+        rng = np.random.default_rng(seed)
+        self._mul = rng.integers(1, 2**63, num_perm, dtype=np.uint64) * 2 + 1
+        self._add = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self._signatures: dict[str, np.ndarray] = {}
+        self._buckets: list[dict[bytes, list[str]]] = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text.
+
+        Args:
+            text: The text of a chunk.
+
+        Returns:
+            The `num_perm` minimum hashes of its word shingles, as `uint32`.
+        """
+        words = np.asarray(
+            [zlib.crc32(word.encode("utf-8")) for word in tokenize(text)],
+            dtype=np.uint64,
+        )
+        if len(words) == 0:
+            words = np.zeros(1, dtype=np.uint64)
+        # Combine the hashes of consecutive words into shingle hashes
+        size = min(SHINGLE_SIZE, len(words))
+        shingles = np.zeros(len(words) - size + 1, dtype=np.uint64)
+        for offset in range(size):
+            shingles = (
+                shingles * np.uint64(1000003) + words[offset : offset + len(shingles)]
+            )
+        shingles = np.unique(shingles)
+        hashes = (shingles[:, None] * self._mul + self._add) >> np.uint64(32)
+        return hashes.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def add(self, key: str, signature: np.ndarray):
+        """Add the signature of a chunk to the index."""
+        self._signatures[key] = signature
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band, []).append(key)
+
+    def remove(self, key: str):
+        """Remove a chunk from the index, if it is there."""
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            keys = buckets[band]
+            keys.remove(key)
+            if not keys:
+                del buckets[band]
+
+    def query(self, signature: np.ndarray) -> tuple[str, float] | None:
+        """Find the most similar chunk to a signature above the threshold.
+
+        Args:
+            signature: The signature of a chunk.
+
+        Returns:
+            The key of the most similar indexed chunk and its estimated Jaccard
+            similarity, or None if no chunk reaches the threshold.
+        """
+        candidates = {
+            key
+            for buckets, band in zip(self._buckets, self._band_keys(signature))
+            for key in buckets.get(band, ())
+        }
+        best = None
+        for key in sorted(candidates):
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def save(self, path: str):
+        """Write the signatures of the index to a `.npz` file.
+
+        Args:
+            path: Path to the file.
+        """
+        keys = list(self._signatures)
+        np.savez(
+            path,
+            threshold=self.threshold,
+            num_perm=self.num_perm,
+            seed=self.seed,
+            keys=np.asarray(keys, dtype=str),
+            signatures=np.asarray(
+                [self._signatures[key] for key in keys], dtype=np.uint32
+            ).reshape(len(keys), self.num_perm),
+        )
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        threshold: float,
+        num_perm: int = DEFAULT_NUM_PERM,
+        seed: int = 0,
+    ) -> "MinHashIndex | None":
+        """Read an index written by `save`.
+
+        Args:
+            path: Path to the file.
+            threshold: The expected Jaccard similarity of near-duplicate chunks.
+            num_perm: The expected number of values of a signature.
+            seed: The expected seed of the hash functions.
+
+        Returns:
+            The index, or None if the file is missing or was written with
+            other settings.
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as arrays:
+            if (
+                float(arrays["threshold"]) != threshold
+                or int(arrays["num_perm"]) != num_perm
+                or int(arrays["seed"]) != seed
+            ):
+                return None
+            index = cls(threshold, num_perm, seed)
+            for key, signature in zip(arrays["keys"], arrays["signatures"]):
+                index.add(str(key), signature)
+        return index
@@ -1,89 +1,216 @@
 """Evaluation pipeline for RAG model performance using LangSmith metrics."""
 
-import json
-import os
 import time
 
 import langsmith
 
-from ragbot.evaluation.eval_chain import EvaluatorChain
+from ragbot.evaluation.local import evaluate_local, load_dataset, mean_scores
 from ragbot.evaluation.metrics.answer_relevance import AnswerRelevance
 from ragbot.evaluation.metrics.bleu import BLEU
+from ragbot.evaluation.metrics.combined_judge import CombinedJudge
 from ragbot.evaluation.metrics.context_relevance import ContextRelevance
 from ragbot.evaluation.metrics.faithfulness import Faithfulness
 from ragbot.evaluation.metrics.rouge import ROUGE
 from ragbot.evaluation.metrics.semantic_similarity import SemanticSimilarity
-from ragbot.rag import setup
-from ragbot.utils.utils import get_embeddings, get_model
+from ragbot.evaluation.multi_evaluator import MultiMetricEvaluator
+from ragbot.evaluation.store import ResultStore, config_fingerprint, with_output_cache
+from ragbot.indexing import corpus_fingerprint, knowledge_base_files
+from ragbot.rag import setup_from_config
+from ragbot.utils.clients import client_stats
+from ragbot.utils.rate_limit import (
+    configure_rate_limits,
+    get_rate_limiter,
+    with_rate_limit,
+)
+from ragbot.utils.utils import (
+    disable_langsmith,
+    get_embeddings,
+    get_model,
+    load_config,
+)
 
 
-def evaluate(project_name: str, config_path: str, dataset_name: str):
-    """Run evaluation on a RAG setup using LangSmith metrics.
-
-    Loads a configuration file to initialize a RAG chain and evaluates its
-    performance on a dataset using a set of standard metrics.
+def evaluate(
+    project_name: str,
+    config_path: str,
+    dataset_name: str,
+    dataset_path: str | None = None,
+    output_path: str | None = None,
+) -> dict:
+    """Run evaluation on a RAG setup defined by a configuration file.
 
     Args:
         project_name: The name of the LangChain project used in LangSmith.
         config_path: Path to the JSON configuration file defining the RAG setup.
         dataset_name: The name of the dataset to be used for evaluation, registered in LangSmith.
+        dataset_path: Path to a local JSONL or Parquet dataset, for offline evaluation.
+        output_path: Path to the JSONL file where offline results are written.
+            Defaults to a timestamped file under `data/project_name/evaluations/`.
+
+    Returns:
+        The mean of each score over the dataset.
 
     Raises:
         IOError: If the configuration file at `config_path` does not exist.
     """
+    return evaluate_config(
+        project_name,
+        load_config(config_path),
+        dataset_name,
+        dataset_path=dataset_path,
+        output_path=output_path,
+    )
+
+
+def evaluate_config(
+    project_name: str,
+    config: dict,
+    dataset_name: str,
+    dataset_path: str | None = None,
+    output_path: str | None = None,
+    experiment_prefix: str = "base",
+) -> dict:
+    """Run evaluation on a RAG setup using LangSmith metrics.
+
+    Initializes a RAG chain from a configuration and evaluates its
+    performance on a dataset using a set of standard metrics. Calls to the RAG
+    chain and to the judge model go through the shared rate limiters of their
+    providers, configured by the `rate_limits` entry of the configuration, so
+    examples can be evaluated concurrently up to `max_concurrency`. With
+    `judge_mode` set to "combined", the three LLM-judged metrics are scored by a
+    single judge call per example, and `judge_agreement` also scores them with
+    separate calls to report how much both modes agree.
+
+    If `dataset_path` is given, the evaluation runs offline: the examples are
+    read from a local file, LangSmith tracing is disabled, and the results are
+    written to `output_path`. Together with the "fake" or "ollama" providers for
+    the RAG chain (`llm_provider`, `embeddings_provider`) and for the judges
+    (`judge_provider`, `judge_embeddings_provider`), no network call is made.
+
+    Chain outputs and metric scores are stored in
+    `data/project_name/evaluations/results.db`. Outputs are keyed by the
+    fingerprint of the configuration and knowledge base, and scores by the
+    metric, its version and parameters, the judge models and the hash of the
+    metric inputs, so a re-run only computes what is missing: an interrupted run
+    resumes at the examples without a stored output, and a newly added metric
+    is the only one computed.
+
+    Args:
+        project_name: The name of the LangChain project used in LangSmith.
+        config: The configuration defining the RAG setup.
+        dataset_name: The name of the dataset to be used for evaluation, registered in LangSmith.
+        dataset_path: Path to a local JSONL or Parquet dataset, for offline evaluation.
+        output_path: Path to the JSONL file where offline results are written.
+            Defaults to a timestamped file under `data/project_name/evaluations/`.
+        experiment_prefix: Prefix of the LangSmith experiment name.
+
+    Returns:
+        The mean of each score over the dataset. With `judge_mode` set to
+        "combined", it also counts the `judge fallbacks`, the examples scored
+        with the separate metrics because the combined output could not be parsed.
+    """
+    metadata = config
+    # Offline evaluations keep every chain step on the machine
+    if dataset_path is not None:
+        disable_langsmith()
+    configure_rate_limits(config.get("rate_limits", {}))
 
     # Define LLM and embedding model for evalution
-    llm = get_model("google", "gemini-2.0-flash", temperature=0.0)
-    embeddings = get_embeddings("google", "models/gemini-embedding-001")
+    judge_provider = config.get("judge_provider", "google")
+    judge_llm = config.get("judge_llm", "gemini-2.0-flash")
+    llm = with_rate_limit(
+        get_model(judge_provider, judge_llm, temperature=0.0),
+        get_rate_limiter(judge_provider, judge_llm),
+    )
+    judge_embeddings_provider = config.get("judge_embeddings_provider", "google")
+    judge_embedding_model = config.get(
+        "judge_embedding_model", "models/gemini-embedding-001"
+    )
+    embeddings = get_embeddings(judge_embeddings_provider, judge_embedding_model)
 
-    # Wrap the metrics for evaluation with LangSmith
-    evaluators = [
-        EvaluatorChain(metric=metric, llm=llm, embeddings=embeddings)
-        for metric in [
-            BLEU(),
-            ROUGE(),
-            SemanticSimilarity(),
-            Faithfulness(),
-            AnswerRelevance(),
-            ContextRelevance(),
-        ]
-    ]
+    # Reuse the chain outputs and scores computed by previous runs
+    store = ResultStore(f"data/{project_name}/evaluations/results.db")
+    fingerprint = config_fingerprint(
+        config, corpus_fingerprint(knowledge_base_files(project_name))
+    )
 
-    # Load configuration from json config
-    if os.path.exists(config_path):
-        with open(config_path, "r") as f:
-            config = json.load(f)
-            metadata = config
+    # Wrap the metrics for evaluation with LangSmith, scoring each run concurrently
+    if config.get("judge_mode", "separate") == "combined":
+        judges = [CombinedJudge(agreement=config.get("judge_agreement", False))]
     else:
-        raise IOError(f"Configuration file {config_path} not found.")
+        judges = [Faithfulness(), AnswerRelevance(), ContextRelevance()]
+    evaluators = [
+        MultiMetricEvaluator(
+            metrics=[BLEU(), ROUGE(), SemanticSimilarity(), *judges],
+            store=store,
+            scope=f"{judge_provider}/{judge_llm}|"
+            f"{judge_embeddings_provider}/{judge_embedding_model}",
+            llm=llm,
+            embeddings=embeddings,
+        )
+    ]
 
     # Set up RAG, and run an evalution
-    rag_chain = setup(
-        project_name=project_name,
-        llm_provider=config["llm_provider"],
-        llm=config["llm"],
-        llm_temperature=config["llm_temperature"],
-        llm_top_p=config["llm_top_p"],
-        llm_top_k=config["llm_top_k"],
-        embeddings_provider=config["embeddings_provider"],
-        embedding_model=config["embedding_model"],
-        chunk_size=config["chunk_size"],
-        chunk_overlap=config["chunk_overlap"],
-        search_type=config["search_type"],
-        k_docs=config["k_docs"],
-    )
+    rag_chain = setup_from_config(project_name, config)
 
-    # Add delay for quota management
-    def invoke_with_delay(*args, **kwargs):
-        time.sleep(12)
-        return rag_chain.invoke(*args, **kwargs)
+    # Share the provider quota, accounting for the context stuffed in the prompt
+    rag_chain = with_rate_limit(
+        rag_chain,
+        get_rate_limiter(config["llm_provider"], config["llm"]),
+        extra_tokens=config["k_docs"] * config["chunk_size"] // 4,
+    )
 
     # Run evaluation
-    langsmith.evaluate(
-        invoke_with_delay,
-        data=dataset_name,
-        evaluators=evaluators,
-        experiment_prefix="base",
-        metadata=metadata,
-        max_concurrency=1,
+    if dataset_path is not None:
+        output_path = output_path or (
+            f"data/{project_name}/evaluations/{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+        )
+        summary = evaluate_local(
+            rag_chain,
+            load_dataset(dataset_path),
+            evaluators[0],
+            output_path,
+            max_concurrency=config.get("max_concurrency", 1),
+            store=store,
+            config=fingerprint,
+        )
+        print(f"Results written to {output_path}")
+        for key, score in summary.items():
+            print(f"{key}: {score:.4f}")
+    else:
+        results = langsmith.evaluate(
+            with_output_cache(rag_chain, store, fingerprint),
+            data=dataset_name,
+            evaluators=evaluators,
+            experiment_prefix=experiment_prefix,
+            metadata=metadata,
+            max_concurrency=config.get("max_concurrency", 1),
+        )
+        summary = mean_scores(
+            {
+                result.key: result.score
+                for result in row["evaluation_results"]["results"]
+            }
+            for row in results
+        )
+
+    stats = embeddings.stats()
+    print(
+        f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} hit rate)"
+    )
+    clients = client_stats()
+    print(
+        f"Model clients: {clients['created']} built, {clients['reused']} reused "
+        f"({clients['reuse_rate']:.0%} reuse rate)"
     )
+    for provider, pool in clients["connections"].items():
+        print(
+            f"{provider} connections: {pool['requests']} requests over "
+            f"{pool['connections']} connections ({pool['reuse_rate']:.0%} reuse rate)"
+        )
+    for judge in judges:
+        if isinstance(judge, CombinedJudge):
+            print(f"Combined judge: {judge.fallbacks} fallbacks to separate metrics")
+            summary["judge fallbacks"] = judge.fallbacks
+    return summary
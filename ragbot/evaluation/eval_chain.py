@@ -11,6 +11,7 @@ from langsmith.schemas import Example, Run
 
 from ragbot.evaluation.dataset_schema import Sample
 from ragbot.evaluation.metrics.base import Metric, MetricWithEmbeddings, MetricWithLLM
+from ragbot.utils.instrumentation import timed
 
 
 class EvaluatorChain(Chain, RunEvaluator):
@@ -78,7 +79,8 @@ class EvaluatorChain(Chain, RunEvaluator):
         sample = Sample(**inputs)
         _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
         callbacks = _run_manager.get_child()
-        score = self.metric.score(sample, callbacks=callbacks)
+        with timed(f"score/{self.metric.name}"):
+            score = self.metric.score(sample, callbacks=callbacks)
         print(f"{self.metric.name}: {score}")
         return {self.metric.name: score}
 
@@ -0,0 +1,143 @@
+"""Offline evaluation over local datasets, writing results to local files."""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from langchain_core.runnables import Runnable
+
+from ragbot.evaluation.multi_evaluator import MultiMetricEvaluator
+from ragbot.evaluation.store import ResultStore
+
+
+def load_dataset(path: str) -> List[Dict[str, Any]]:
+    """Load an evaluation dataset from a local JSONL or Parquet file.
+
+    Each row must have an `input` question and may have a reference `output`
+    answer, a reference `context` (list of strings) and an `id`. Rows without
+    an `id` are identified by their position in the file.
+
+    Args:
+        path: Path to a `.jsonl` or `.parquet` file.
+
+    Returns:
+        A list of examples, each with its `id`, `inputs` and reference `outputs`.
+
+    Raises:
+        FileNotFoundError: If the dataset file does not exist.
+        ValueError: If the file format is not supported or a row has no `input`.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Dataset file {path} not found.")
+
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    elif path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError(
+                f"{e.name} is required. Please install it with `pip install {e.name}`"
+            ) from e
+        rows = pd.read_parquet(path).to_dict("records")
+    else:
+        raise ValueError(f"Unsupported dataset format: {path}")
+
+    examples = []
+    for i, row in enumerate(rows):
+        if not row.get("input"):
+            raise ValueError(f"Row {i} of {path} has no input")
+        outputs = {"output": row.get("output")}
+        if row.get("context") is not None:
+            outputs["context"] = list(row["context"])
+        examples.append(
+            {
+                "id": str(row.get("id", i)),
+                "inputs": {"input": row["input"]},
+                "outputs": outputs,
+            }
+        )
+    return examples
+
+
+def mean_scores(records: Iterable[Dict[str, Optional[float]]]) -> Dict[str, float]:
+    """Average the scores of several examples.
+
+    Args:
+        records: The scores of each example, by metric name.
+
+    Returns:
+        The mean of each score over the examples where it could be computed.
+    """
+    totals, counts = {}, {}
+    for scores in records:
+        for key, score in scores.items():
+            if score is not None:
+                totals[key] = totals.get(key, 0.0) + score
+                counts[key] = counts.get(key, 0) + 1
+    return {key: totals[key] / counts[key] for key in totals}
+
+
+def evaluate_local(
+    target: Runnable,
+    examples: List[Dict[str, Any]],
+    evaluator: MultiMetricEvaluator,
+    output_path: str,
+    max_concurrency: int = 1,
+    store: Optional[ResultStore] = None,
+    config: str = "",
+) -> Dict[str, float]:
+    """Run a RAG chain over local examples and score its outputs.
+
+    The chain output and the scores of each example are written as one JSON
+    line to `output_path`, and the mean of each score to a `.summary.json` file
+    next to it. With a result store, chain outputs already stored for the
+    configuration are reused, so an interrupted run resumes where it stopped.
+
+    Args:
+        target: The RAG chain to evaluate.
+        examples: The examples as returned by `load_dataset`.
+        evaluator: The evaluator scoring each output.
+        output_path: Path to the JSONL results file.
+        max_concurrency: Maximum number of examples evaluated at the same time.
+        store: The store of previously computed chain outputs, if any.
+        config: The fingerprint of the configuration under which outputs are stored.
+
+    Returns:
+        The mean of each score over the examples where it could be computed.
+    """
+
+    def run(example: Dict[str, Any]) -> Dict[str, Any]:
+        outputs = store.get_output(config, example["id"]) if store else None
+        if outputs is None:
+            outputs = target.invoke(example["inputs"])
+            if store is not None:
+                store.put_output(config, example["id"], outputs)
+        sample = evaluator.build_sample_from(outputs, example["outputs"])
+        results = evaluator.score_sample(sample)
+        return {
+            "id": example["id"],
+            "input": example["inputs"]["input"],
+            "answer": sample.answer,
+            "retrieved_context": sample.retrieved_context,
+            "reference_answer": sample.reference_answer,
+            "scores": {result.key: result.score for result in results},
+        }
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    scores = []
+    with open(output_path, "w", encoding="utf-8") as f:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for record in executor.map(run, examples):
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                scores.append(record["scores"])
+
+    summary = mean_scores(scores)
+    with open(f"{os.path.splitext(output_path)[0]}.summary.json", "w") as f:
+        json.dump({"examples": len(examples), "scores": summary}, f, indent=2)
+    return summary
@@ -1,7 +1,7 @@
 """Evaluation metric for answer relevance in RAG systems."""
 
 from dataclasses import dataclass, field
-from typing import Any, Set
+from typing import Set
 
 from ragbot.evaluation.dataset_schema import Sample
 from ragbot.evaluation.metrics.base import MetricWithLLM
@@ -18,8 +18,8 @@ class AnswerRelevance(MetricWithLLM):
     name: str = field(default="answer relevance", repr=True)
     _required_columns: Set[str] = field(default_factory=lambda: {"question", "answer"})
 
-    def score(self, sample: Sample, **kwargs: Any) -> float:
-        """Score the answer relevance using a language model.
+    def prompt(self, sample: Sample) -> str:
+        """Build the prompt asking the LLM to judge the answer relevance.
 
         The score is based on a scale from 1 to 5:
             5 - Excellent
@@ -30,14 +30,12 @@ class AnswerRelevance(MetricWithLLM):
 
         Args:
             sample (Sample): A sample containing a question and generated answer.
-            **kwargs: Additional keyword arguments (e.g., for callbacks).
 
         Returns:
-            float: A relevance score between 1 and 5.
+            str: A prompt asking for a relevance score between 1 and 5.
         """
         question, answer = sample.question, sample.answer
-        output = self.llm.invoke(
-            f"""
+        return f"""
             You are an expert evaluator assessing how relevant a given answer is to a user question. 
             Answer relevance is defined as how well the response aligns with the user input. 
         
@@ -56,7 +54,3 @@ class AnswerRelevance(MetricWithLLM):
             
             Verdict [1 | 2 | 3 | 4 | 5]: 
             """
-        )
-
-        score = int(output.content.strip())
-        return score
@@ -1,11 +1,14 @@
 """Base classes for defining RAG evaluation metrics."""
 
+import asyncio
+import json
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Any, Set
 
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import LLM, BaseChatModel
+from langchain_core.runnables import Runnable
 
 from ragbot.evaluation.dataset_schema import Sample
 
@@ -16,15 +19,31 @@ class Metric(ABC):
 
     Attributes:
         name (str): Name of the metric.
+        version (str): Version of the metric implementation. Bump it whenever a
+            change alters the scores, so that stored scores are recomputed.
     """
 
     name: str = field(default="", repr=True)
     _required_columns: Set[str] = field(default_factory=set)
+    version: str = field(default="1", repr=False)
 
     def init(self):
         """Optional initializer hook for the metric."""
         pass
 
+    def fingerprint(self) -> str:
+        """Identify the metric and the parameters its scores depend on.
+
+        Returns:
+            str: A JSON string with the name, version and public parameters of the metric.
+        """
+        params = {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if f.compare and not f.name.startswith("_")
+        }
+        return json.dumps(params, sort_keys=True, default=str)
+
     @property
     def required_columns(self) -> Set[str]:
         """Set of columns required in the input sample to compute the metric.
@@ -56,17 +75,74 @@ class Metric(ABC):
         """
         pass
 
+    async def ascore(self, sample: Sample, **kwargs: Any) -> float:
+        """Compute a score for a given sample asynchronously.
+
+        By default, `score` runs in a worker thread. Metrics that call models
+        override this method to await them instead.
+
+        Args:
+            sample (Sample): Input data to evaluate.
+            **kwargs: Additional arguments (e.g., for callbacks or config).
+
+        Returns:
+            float: Computed metric score.
+        """
+        return await asyncio.to_thread(self.score, sample, **kwargs)
+
 
 class MetricWithLLM(Metric, ABC):
-    """Base class for metrics that require an LLM to operate."""
+    """Base class for metrics that use an LLM as a judge.
+
+    Subclasses define the judge prompt, and the LLM answers with a single
+    integer verdict that is used as the score.
+    """
 
-    llm: BaseChatModel | LLM = None
+    llm: BaseChatModel | LLM | Runnable = None
 
     def init(self):
         """Check that the LLM is set before scoring."""
         if self.llm is None:
             raise ValueError(f"LLM not set for Metric {self.name}")
 
+    @abstractmethod
+    def prompt(self, sample: Sample) -> str:
+        """Build the judge prompt for a given sample.
+
+        Args:
+            sample (Sample): Input data to evaluate.
+
+        Returns:
+            str: The prompt sent to the LLM.
+        """
+        pass
+
+    def score(self, sample: Sample, **kwargs: Any) -> float:
+        """Score a sample with the verdict of the LLM.
+
+        Args:
+            sample (Sample): Input data to evaluate.
+            **kwargs: Additional keyword arguments (e.g., for callbacks).
+
+        Returns:
+            float: The verdict of the LLM.
+        """
+        output = self.llm.invoke(self.prompt(sample))
+        return int(output.content.strip())
+
+    async def ascore(self, sample: Sample, **kwargs: Any) -> float:
+        """Score a sample with the verdict of the LLM asynchronously.
+
+        Args:
+            sample (Sample): Input data to evaluate.
+            **kwargs: Additional keyword arguments (e.g., for callbacks).
+
+        Returns:
+            float: The verdict of the LLM.
+        """
+        output = await self.llm.ainvoke(self.prompt(sample))
+        return int(output.content.strip())
+
 
 class MetricWithEmbeddings(Metric, ABC):
     """Base class for metrics that require embeddings to operate."""
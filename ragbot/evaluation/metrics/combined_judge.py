@@ -0,0 +1,199 @@
+"""Combined LLM judge scoring faithfulness, answer relevance and context relevance in one call."""
+
+import asyncio
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Set
+
+from ragbot.evaluation.dataset_schema import Sample
+from ragbot.evaluation.metrics.answer_relevance import AnswerRelevance
+from ragbot.evaluation.metrics.base import MetricWithLLM
+from ragbot.evaluation.metrics.context_relevance import ContextRelevance
+from ragbot.evaluation.metrics.faithfulness import Faithfulness
+
+VERDICTS = {
+    "faithfulness": Faithfulness,
+    "answer_relevance": AnswerRelevance,
+    "context_relevance": ContextRelevance,
+}
+
+
+@dataclass
+class CombinedJudge(MetricWithLLM):
+    """Single-call judge for faithfulness, answer relevance and context relevance.
+
+    The retrieved context, question and answer are sent once, and the LLM returns
+    the three 1-5 verdicts as a JSON object. This takes one judge call instead of
+    three and sends the context once instead of twice. If the output cannot be
+    parsed, the sample is scored with the separate metrics instead. Results are
+    reported under the names of the separate metrics, so both modes can be compared.
+
+    Attributes:
+        name (str): The name of the metric.
+        agreement (bool): Whether to also score the sample with the separate
+            metrics and report how much the verdicts agree.
+        fallbacks (int): Number of samples scored with the separate metrics
+            because the combined output could not be parsed.
+    """
+
+    name: str = field(default="combined judge", repr=True)
+    _required_columns: Set[str] = field(
+        default_factory=lambda: {"question", "answer", "retrieved_context"}
+    )
+    agreement: bool = False
+    fallbacks: int = field(default=0, repr=False, compare=False)
+
+    def separate_metrics(self) -> Dict[str, MetricWithLLM]:
+        """Build the separate metrics sharing this judge's LLM.
+
+        Returns:
+            Dict[str, MetricWithLLM]: The separate metric of each verdict.
+        """
+        metrics = {key: metric() for key, metric in VERDICTS.items()}
+        for metric in metrics.values():
+            metric.llm = self.llm
+        return metrics
+
+    def prompt(self, sample: Sample) -> str:
+        """Build the prompt asking the LLM for the three verdicts.
+
+        Args:
+            sample (Sample): A sample containing the question, retrieved context and generated answer.
+
+        Returns:
+            str: A prompt asking for a JSON object with the three scores (1-5).
+        """
+        question, context, answer = (
+            sample.question,
+            sample.retrieved_context,
+            sample.answer,
+        )
+        return f"""
+            You are an expert evaluator assessing a retrieval-augmented answer on three criteria.
+
+            **Faithfulness:** how accurately the answer reflects the retrieved context, without unsupported details or hallucinations.
+            **Answer relevance:** how well the answer addresses the user question with clear, relevant and complete information.
+            **Context relevance:** how well the retrieved context aligns with the question and contains the information it needs.
+
+            **Scoring Guidelines (for each criterion):**
+            - **5 (Excellent):** Fully satisfies the criterion.
+            - **4 (Good):** Mostly satisfies it, with minor issues.
+            - **3 (Acceptable):** Somewhat satisfies it, with noticeable issues.
+            - **2 (Poor):** Only partially satisfies it, with significant issues.
+            - **1 (Not satisfied):** Does not satisfy it at all.
+
+            **User Question:** {question}
+            **Retrieved Context:** {context}
+            **Generated Answer:** {answer}
+
+            Assign a single integer score (1-5) to each criterion.
+            Only return a JSON object with the keys "faithfulness", "answer_relevance" and "context_relevance", without any extra text.
+            """
+
+    @staticmethod
+    def parse(output: str) -> Dict[str, int]:
+        """Parse the verdicts returned by the LLM.
+
+        Args:
+            output (str): The LLM output, optionally wrapped in a Markdown code block.
+
+        Returns:
+            Dict[str, int]: The verdict of each criterion.
+
+        Raises:
+            ValueError: If the output is not a JSON object with an integer score
+                between 1 and 5 for each criterion.
+        """
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", output.strip())
+        try:
+            verdicts = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Judge output is not valid JSON: {output!r}") from e
+        if not isinstance(verdicts, dict):
+            raise ValueError(f"Judge output is not a JSON object: {output!r}")
+
+        parsed = {}
+        for key in VERDICTS:
+            value = verdicts.get(key)
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError(f"Judge output has no integer {key}: {output!r}")
+            if not 1 <= value <= 5:
+                raise ValueError(f"Judge output has {key} out of range: {output!r}")
+            parsed[key] = value
+        return parsed
+
+    def _report(
+        self, verdicts: Dict[str, float], separate: Dict[str, float] | None
+    ) -> Dict[str, float]:
+        """Name the verdicts after the separate metrics and add agreement scores."""
+        metrics = self.separate_metrics()
+        scores = {metrics[key].name: verdicts[key] for key in VERDICTS}
+        if separate is not None:
+            for key in VERDICTS:
+                scores[f"{metrics[key].name} (separate)"] = separate[key]
+            scores["judge agreement"] = sum(
+                verdicts[key] == separate[key] for key in VERDICTS
+            ) / len(VERDICTS)
+            scores["judge deviation"] = sum(
+                abs(verdicts[key] - separate[key]) for key in VERDICTS
+            ) / len(VERDICTS)
+        return scores
+
+    def score(self, sample: Sample, **kwargs: Any) -> Dict[str, float]:
+        """Score a sample on the three criteria with a single LLM call.
+
+        Args:
+            sample (Sample): A sample containing the question, retrieved context and generated answer.
+            **kwargs: Additional keyword arguments (e.g., for callbacks).
+
+        Returns:
+            Dict[str, float]: The score of each criterion, named after its separate
+                metric, plus the agreement scores if `agreement` is enabled.
+        """
+        metrics = self.separate_metrics()
+        try:
+            verdicts = self.parse(self.llm.invoke(self.prompt(sample)).content)
+        except ValueError:
+            self.fallbacks += 1
+            verdicts = {key: metric.score(sample) for key, metric in metrics.items()}
+            return self._report(verdicts, None)
+
+        separate = None
+        if self.agreement:
+            separate = {key: metric.score(sample) for key, metric in metrics.items()}
+        return self._report(verdicts, separate)
+
+    async def ascore(self, sample: Sample, **kwargs: Any) -> Dict[str, float]:
+        """Score a sample on the three criteria asynchronously.
+
+        When the separate metrics are needed, their calls run concurrently.
+
+        Args:
+            sample (Sample): A sample containing the question, retrieved context and generated answer.
+            **kwargs: Additional keyword arguments (e.g., for callbacks).
+
+        Returns:
+            Dict[str, float]: The score of each criterion, named after its separate
+                metric, plus the agreement scores if `agreement` is enabled.
+        """
+        metrics = self.separate_metrics()
+
+        async def ascore_separate() -> Dict[str, float]:
+            scores = await asyncio.gather(
+                *(metric.ascore(sample) for metric in metrics.values())
+            )
+            return dict(zip(metrics, scores))
+
+        combined = self.llm.ainvoke(self.prompt(sample))
+        if self.agreement:
+            output, separate = await asyncio.gather(combined, ascore_separate())
+        else:
+            output, separate = await combined, None
+
+        try:
+            verdicts = self.parse(output.content)
+        except ValueError:
+            self.fallbacks += 1
+            return self._report(separate or await ascore_separate(), None)
+        return self._report(verdicts, separate)
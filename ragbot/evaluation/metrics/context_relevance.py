@@ -1,7 +1,7 @@
 """Context relevance metric for evaluating the relevance of retrieved context."""
 
 from dataclasses import dataclass, field
-from typing import Any, Set
+from typing import Set
 
 from ragbot.evaluation.dataset_schema import Sample
 from ragbot.evaluation.metrics.base import MetricWithLLM
@@ -24,19 +24,17 @@ class ContextRelevance(MetricWithLLM):
         default_factory=lambda: {"question", "retrieved_context"}
     )
 
-    def score(self, sample: Sample, **kwargs: Any) -> float:
-        """Compute the context relevance score for a given sample.
+    def prompt(self, sample: Sample) -> str:
+        """Build the prompt asking the LLM to judge the context relevance.
 
         Args:
             sample (Sample): A sample containing the user question and retrieved context.
-            **kwargs: Optional keyword arguments (not used here).
 
         Returns:
-            float: A score (1-5) indicating how relevant the retrieved context is to the user's question.
+            str: A prompt asking for a score (1-5) indicating how relevant the retrieved context is to the user's question.
         """
         question, context = sample.question, sample.retrieved_context
-        output = self.llm.invoke(
-            f"""
+        return f"""
             You are an expert evaluator assessing how relevant a retrieved context is to a given user question. 
             Context relevance is defined as how well the retrieved information aligns with the question. 
         
@@ -55,7 +53,3 @@ class ContextRelevance(MetricWithLLM):
     
             Verdict [1 | 2 | 3 | 4 | 5]: 
             """
-        )
-
-        score = int(output.content.strip())
-        return score
@@ -1,7 +1,7 @@
 """Faithfulness metric for evaluating the accuracy of generated answers based on the retrieved context."""
 
 from dataclasses import dataclass, field
-from typing import Any, Set
+from typing import Set
 
 from ragbot.evaluation.dataset_schema import Sample
 from ragbot.evaluation.metrics.base import MetricWithLLM
@@ -23,22 +23,20 @@ class Faithfulness(MetricWithLLM):
         default_factory=lambda: {"answer", "retrieved_context"}
     )
 
-    def score(self, sample: Sample, **kwargs: Any) -> float:
-        """Compute the faithfulness score for a given sample.
+    def prompt(self, sample: Sample) -> str:
+        """Build the prompt asking the LLM to judge the faithfulness.
 
-        This method evaluates how grounded the generated answer is in the provided context.
+        The LLM evaluates how grounded the generated answer is in the provided context.
 
         Args:
             sample (Sample): A sample containing the retrieved context and generated answer.
-            **kwargs: Optional keyword arguments (not used here).
 
         Returns:
-            float: A score (1-5) indicating how well the answer is grounded in the retrieved context.
+            str: A prompt asking for a score (1-5) indicating how well the answer is grounded in the retrieved context.
         """
 
         context, answer = sample.retrieved_context, sample.answer
-        output = self.llm.invoke(
-            f"""
+        return f"""
             You are an expert evaluator assessing how well a generated answer is grounded in the provided retrieved context. 
             Groundedness is defined as how accurately the answer reflects the information in the retrieved context, without adding unsupported details or hallucinating information.
         
@@ -57,7 +55,3 @@ class Faithfulness(MetricWithLLM):
 
             Verdict [1 | 2 | 3 | 4 | 5]: 
             """
-        )
-
-        score = int(output.content.strip())
-        return score
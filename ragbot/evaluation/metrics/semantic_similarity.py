@@ -1,5 +1,6 @@
 """Semantic similarity metric for evaluating the similarity between generated and reference answers."""
 
+import asyncio
 from dataclasses import dataclass, field
 from typing import Any, Set
 
@@ -40,15 +41,39 @@ class SemanticSimilarity(MetricWithEmbeddings):
             float: A similarity score between 0 and 1 indicating the degree of similarity between the
                   generated answer and the reference answer.
         """
-        reference, answer = sample.reference_answer, sample.answer
-
-        # Handle embeddings for empty strings
-        reference = reference or " "
-        answer = answer or " "
-
+        reference, answer = self._texts(sample)
         ref_embedding = np.array(self.embeddings.embed_query(reference))
         ans_embedding = np.array(self.embeddings.embed_query(answer))
+        return self._similarity(ref_embedding, ans_embedding)
+
+    async def ascore(self, sample: Sample, **kwargs: Any) -> float:
+        """Compute the semantic similarity score asynchronously.
+
+        Both texts are embedded concurrently.
+
+        Args:
+            sample (Sample): A sample containing the generated answer and the reference answer.
+            **kwargs: Optional keyword arguments (not used here).
+
+        Returns:
+            float: A similarity score between 0 and 1.
+        """
+        reference, answer = self._texts(sample)
+        ref_embedding, ans_embedding = await asyncio.gather(
+            self.embeddings.aembed_query(reference),
+            self.embeddings.aembed_query(answer),
+        )
+        return self._similarity(np.array(ref_embedding), np.array(ans_embedding))
+
+    @staticmethod
+    def _texts(sample: Sample) -> tuple[str, str]:
+        """Return the reference and generated answers to embed."""
+        # Handle embeddings for empty strings
+        return sample.reference_answer or " ", sample.answer or " "
 
+    @staticmethod
+    def _similarity(ref_embedding: np.ndarray, ans_embedding: np.ndarray) -> float:
+        """Compute the cosine similarity between two embedding vectors."""
         ref_norms = np.linalg.norm(ref_embedding, keepdims=True)
         ans_norms = np.linalg.norm(ans_embedding, keepdims=True)
         normalized_ref_emb = ref_embedding / ref_norms
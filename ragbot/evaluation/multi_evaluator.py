@@ -0,0 +1,215 @@
+"""Evaluator scoring every metric of a RAG run concurrently."""
+
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+from langsmith import EvaluationResult, RunEvaluator
+from langsmith.evaluation import EvaluationResults
+from langsmith.schemas import Example, Run
+
+from ragbot.evaluation.dataset_schema import Sample
+from ragbot.evaluation.metrics.base import Metric, MetricWithEmbeddings, MetricWithLLM
+from ragbot.evaluation.store import ResultStore, inputs_hash
+from ragbot.utils.instrumentation import timed
+
+
+class MultiMetricEvaluator(RunEvaluator):
+    """Evaluator that scores a run with several metrics at once.
+
+    The evaluation sample is built once per run. Cheap metrics are computed
+    inline, while metrics that call an LLM or an embeddings model are awaited
+    concurrently, so the latency of a run is close to that of its slowest
+    model call instead of the sum of all of them.
+
+    If a result store is given, scores are looked up by metric fingerprint and
+    inputs hash before being computed, and stored afterwards.
+
+    Model calls run on one event loop owned by the evaluator, in a background
+    thread, whatever thread or loop the evaluation is called from. Async
+    clients, such as the gRPC client of `ChatGoogleGenerativeAI`, are bound to
+    the first loop they run on, so they keep working across runs.
+
+    Attributes:
+        metrics (List[Metric]): The scoring metrics used for evaluation.
+        store (Optional[ResultStore]): The store of previously computed scores.
+        scope (str): Identifier of the judge models, added to the fingerprint of
+            the metrics that use them.
+    """
+
+    def __init__(
+        self,
+        metrics: List[Metric],
+        store: Optional[ResultStore] = None,
+        scope: str = "",
+        **kwargs: Any,
+    ):
+        """Initializes the evaluator.
+
+        Args:
+            metrics (List[Metric]): The evaluation metric instances.
+            store (Optional[ResultStore]): The store of previously computed scores.
+            scope (str): Identifier of the judge models, so that scores from
+                different judges are stored separately.
+            **kwargs: Optional keyword arguments, including 'llm' or 'embeddings' if required by the metrics.
+        """
+        self.metrics = metrics
+        self.store = store
+        self.scope = scope
+        for metric in self.metrics:
+            if isinstance(metric, MetricWithLLM):
+                metric.llm = kwargs.get("llm")
+            if isinstance(metric, MetricWithEmbeddings):
+                metric.embeddings = kwargs.get("embeddings")
+            metric.init()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the event loop of the evaluator, starting it on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="evaluator-loop", daemon=True
+                ).start()
+            return self._loop
+
+    def score_sample(self, sample: Sample) -> List[EvaluationResult]:
+        """Scores a sample with every metric, from any thread.
+
+        Args:
+            sample (Sample): The sample to evaluate.
+
+        Returns:
+            List[EvaluationResult]: The results of `ascore_sample`.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.ascore_sample(sample), self._event_loop()
+        ).result()
+
+    @staticmethod
+    def build_sample(run: Run, example: Optional[Example] = None) -> Sample:
+        """Builds the evaluation sample of a run.
+
+        Args:
+            run (Run): The RAG pipeline run to evaluate.
+            example (Optional[Example]): Ground truth data for evaluation.
+
+        Returns:
+            Sample: The sample holding every column used by the metrics.
+        """
+        return MultiMetricEvaluator.build_sample_from(
+            run.outputs, example.outputs if example is not None else None
+        )
+
+    @staticmethod
+    def build_sample_from(
+        outputs: Dict[str, Any], reference: Optional[Dict[str, Any]] = None
+    ) -> Sample:
+        """Builds an evaluation sample from the output of a RAG chain.
+
+        Args:
+            outputs (Dict[str, Any]): The output of the RAG chain, with its `input`,
+                `answer` and retrieved `context` documents.
+            reference (Optional[Dict[str, Any]]): The reference `output` answer and
+                optional reference `context` of the example.
+
+        Returns:
+            Sample: The sample holding every column used by the metrics.
+        """
+        reference = reference or {}
+        return Sample(
+            question=outputs["input"],
+            answer=outputs["answer"],
+            retrieved_context=[context.page_content for context in outputs["context"]],
+            reference_context=reference.get("context"),
+            reference_answer=reference.get("output"),
+        )
+
+    async def ascore_sample(self, sample: Sample) -> List[EvaluationResult]:
+        """Scores a sample with every metric.
+
+        A metric that fails is reported with no score and the error as comment,
+        without affecting the other metrics.
+
+        Args:
+            sample (Sample): The sample to evaluate.
+
+        Returns:
+            List[EvaluationResult]: One result per metric, or per criterion for
+                metrics returning several scores, in the order of `metrics`.
+        """
+
+        async def ascore(metric: Metric) -> float:
+            uses_model = isinstance(metric, (MetricWithLLM, MetricWithEmbeddings))
+            if self.store is not None:
+                key = metric.fingerprint() + (f"|{self.scope}" if uses_model else "")
+                inputs = inputs_hash(metric, sample)
+                score = self.store.get_score(key, inputs)
+                if score is not None:
+                    return score
+
+            with timed(f"score/{metric.name}"):
+                score = (
+                    await metric.ascore(sample) if uses_model else metric.score(sample)
+                )
+            if self.store is not None:
+                self.store.put_score(key, inputs, score)
+            return score
+
+        scores = await asyncio.gather(
+            *(ascore(metric) for metric in self.metrics), return_exceptions=True
+        )
+
+        results = []
+        for metric, score in zip(self.metrics, scores):
+            if isinstance(score, Exception):
+                print(f"{metric.name}: failed ({score})")
+                results.append(
+                    EvaluationResult(key=metric.name, score=None, comment=str(score))
+                )
+                continue
+            # Metrics judging several criteria at once return a score per criterion
+            named = score if isinstance(score, dict) else {metric.name: score}
+            for key, value in named.items():
+                print(f"{key}: {value}")
+                results.append(EvaluationResult(key=key, score=value))
+        return results
+
+    def evaluate_run(
+        self, run: Run, example: Optional[Example] = None
+    ) -> Union[EvaluationResult, EvaluationResults]:
+        """Evaluates a single run against a reference example.
+
+        Args:
+            run (Run): The RAG pipeline run to evaluate.
+            example (Optional[Example]): Ground truth data for evaluation.
+
+        Returns:
+            Union[EvaluationResult, EvaluationResults]: Evaluation results for the run.
+        """
+        results = self.score_sample(self.build_sample(run, example))
+        return EvaluationResults(results=results)
+
+    async def aevaluate_run(
+        self,
+        run: Run,
+        example: Optional[Example] = None,
+        evaluator_run_id: Optional[Any] = None,
+    ) -> Union[EvaluationResult, EvaluationResults]:
+        """Evaluates a single run against a reference example asynchronously.
+
+        Args:
+            run (Run): The RAG pipeline run to evaluate.
+            example (Optional[Example]): Ground truth data for evaluation.
+            evaluator_run_id (Optional[Any]): Identifier of the evaluator run (unused here).
+
+        Returns:
+            Union[EvaluationResult, EvaluationResults]: Evaluation results for the run.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.ascore_sample(self.build_sample(run, example)), self._event_loop()
+        )
+        results = await asyncio.wrap_future(future)
+        return EvaluationResults(results=results)
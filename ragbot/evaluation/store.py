@@ -0,0 +1,223 @@
+"""Persistent store of RAG outputs and metric scores for resumable evaluations."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+
+from ragbot.evaluation.dataset_schema import Sample
+from ragbot.evaluation.metrics.base import Metric
+
+# Configuration entries that affect how outputs are scored, or how fast the
+# index is built, but not the outputs
+EVALUATION_KEYS = {
+    "chunking_workers",
+    "dump_chunks",
+    "embedding_batch_size",
+    "embedding_workers",
+    "judge_agreement",
+    "judge_embedding_model",
+    "judge_embeddings_provider",
+    "judge_llm",
+    "judge_mode",
+    "judge_provider",
+    "max_concurrency",
+    "rate_limits",
+}
+
+
+def config_fingerprint(config: Dict[str, Any], corpus: str) -> str:
+    """Fingerprint the RAG chain defined by a configuration and a knowledge base.
+
+    Args:
+        config (Dict[str, Any]): The evaluation configuration.
+        corpus (str): The fingerprint of the knowledge base files.
+
+    Returns:
+        str: A hexadecimal digest that changes whenever the chain outputs may change.
+    """
+    chain_config = {k: v for k, v in config.items() if k not in EVALUATION_KEYS}
+    payload = json.dumps({"config": chain_config, "corpus": corpus}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def inputs_hash(metric: Metric, sample: Sample) -> str:
+    """Hash the columns of a sample that a metric reads.
+
+    Args:
+        metric (Metric): The metric scoring the sample.
+        sample (Sample): The sample to score.
+
+    Returns:
+        str: A hexadecimal digest of the metric's input columns.
+    """
+    inputs = {column: getattr(sample, column) for column in metric.required_columns}
+    payload = json.dumps(inputs, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def inputs_key(inputs: Dict[str, Any]) -> str:
+    """Identify an example by its inputs, when its ID is not available.
+
+    Args:
+        inputs (Dict[str, Any]): The inputs of the example.
+
+    Returns:
+        str: A hexadecimal digest of the inputs.
+    """
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """SQLite store of chain outputs and metric scores.
+
+    Chain outputs are keyed by the configuration fingerprint and the example ID,
+    and scores by the metric fingerprint and the hash of its inputs. A re-run
+    only calls the chain for examples without a stored output, and only computes
+    the scores that are missing, such as those of a newly added metric.
+
+    Attributes:
+        path (str): Path to the SQLite file.
+    """
+
+    def __init__(self, path: str):
+        """Initializes the store, creating its SQLite file if needed.
+
+        Args:
+            path (str): Path to the SQLite file.
+        """
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outputs ("
+                "config TEXT, example TEXT, output TEXT, PRIMARY KEY (config, example))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "metric TEXT, inputs TEXT, score TEXT, PRIMARY KEY (metric, inputs))"
+            )
+
+    def get_output(self, config: str, example_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch the stored chain output of an example.
+
+        Args:
+            config (str): The configuration fingerprint.
+            example_id (str): The example identifier.
+
+        Returns:
+            Optional[Dict[str, Any]]: The chain output with its context documents,
+                or None if it was not stored.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output FROM outputs WHERE config = ? AND example = ?",
+                (config, example_id),
+            ).fetchone()
+        if row is None:
+            return None
+        output = json.loads(row[0])
+        output["context"] = [Document(**doc) for doc in output["context"]]
+        return output
+
+    def put_output(self, config: str, example_id: str, output: Dict[str, Any]):
+        """Store the chain output of an example.
+
+        Args:
+            config (str): The configuration fingerprint.
+            example_id (str): The example identifier.
+            output (Dict[str, Any]): The chain output with its `input`, `answer`
+                and `context` documents.
+        """
+        serialized = {
+            "input": output["input"],
+            "answer": output["answer"],
+            "context": [
+                {
+                    "page_content": doc.page_content,
+                    "metadata": doc.metadata,
+                    "id": doc.id,
+                }
+                for doc in output["context"]
+            ],
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?)",
+                (config, example_id, json.dumps(serialized)),
+            )
+
+    def get_score(self, metric: str, inputs: str) -> Optional[Any]:
+        """Fetch a stored metric score.
+
+        Args:
+            metric (str): The metric fingerprint.
+            inputs (str): The hash of the metric inputs.
+
+        Returns:
+            Optional[Any]: The stored score, or None if it was not stored.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT score FROM scores WHERE metric = ? AND inputs = ?",
+                (metric, inputs),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put_score(self, metric: str, inputs: str, score: Any):
+        """Store a metric score.
+
+        Args:
+            metric (str): The metric fingerprint.
+            inputs (str): The hash of the metric inputs.
+            score (Any): The score, or the scores of a multi-criteria metric.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                (metric, inputs, json.dumps(score)),
+            )
+
+
+def with_output_cache(
+    runnable: Runnable, store: ResultStore, fingerprint: str
+) -> Runnable:
+    """Wrap a RAG chain so that its outputs are stored and reused.
+
+    Examples are identified by their inputs, for evaluation runners such as
+    LangSmith that do not pass the example ID to the chain.
+
+    Args:
+        runnable (Runnable): The RAG chain.
+        store (ResultStore): The store of chain outputs.
+        fingerprint (str): The fingerprint of the chain configuration.
+
+    Returns:
+        Runnable: A runnable with the same input and output, supporting `invoke` and `ainvoke`.
+    """
+
+    def invoke(input: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        output = store.get_output(fingerprint, inputs_key(input))
+        if output is None:
+            output = runnable.invoke(input, config)
+            store.put_output(fingerprint, inputs_key(input), output)
+        return output
+
+    async def ainvoke(input: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        output = store.get_output(fingerprint, inputs_key(input))
+        if output is None:
+            output = await runnable.ainvoke(input, config)
+            store.put_output(fingerprint, inputs_key(input), output)
+        return output
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=runnable.get_name())
@@ -0,0 +1,721 @@
+"""Persistent vector index management for project knowledge bases."""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Iterator
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ragbot.chunking import (
+    DEFAULT_CHUNKING_WORKERS,
+    file_hash,
+    split_files,
+)
+from ragbot.dedup import DEDUP_FILE, MinHashIndex
+from ragbot.ingestion import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS, ingest
+from ragbot.retrieval import BACKENDS
+from ragbot.retrieval.bm25 import BM25Index, build_bm25, load_bm25
+from ragbot.retrieval.chroma import ChromaStore
+from ragbot.retrieval.chunk_file import export_chunks, iter_stored_pages
+from ragbot.retrieval.ivf import IVFVectorStore
+from ragbot.retrieval.numpy_store import NumpyVectorStore
+from ragbot.utils.rate_limit import RateLimiter
+from ragbot.utils.stages import StageStats
+
+COLLECTION_NAME = "ragbot"
+CHECKPOINT_FILE = "checkpoint.jsonl"
+MANIFEST_FILE = "manifest.json"
+META_FILE = "meta.json"
+
+
+def knowledge_base_files(project_name: str) -> list[str]:
+    """List the knowledge base files of a project in a stable order.
+
+    Args:
+        project_name: The project identifier.
+
+    Returns:
+        The sorted paths of the `.txt` files under `data/project_name`.
+
+    Raises:
+        ValueError: If the `project_name` knowledge base is not found at data/.
+        FileNotFoundError: If the `project_name` knowledge base is empty.
+    """
+    dir_path = f"data/{project_name}"
+    if not os.path.exists(dir_path):
+        raise ValueError(
+            f"No data for project {project_name}, please add directory {dir_path} with knowledge base files"
+        )
+
+    knowledge_base = sorted(glob.glob(f"{dir_path}/*.txt"))
+    if not knowledge_base:
+        raise FileNotFoundError(f"No .txt files found in {dir_path}")
+    return knowledge_base
+
+
+def file_hashes(files: list[str], manifest: dict | None = None) -> dict[str, dict]:
+    """Hash knowledge base files, skipping the files the manifest already hashed.
+
+    A file whose size and modification time match its manifest entry keeps
+    the hash of the entry, so that opening an index only reads the files
+    edited since it was built.
+
+    Args:
+        files: Paths of the knowledge base files.
+        manifest: The per-file manifest of an index, as in `read_manifest`.
+
+    Returns:
+        A dictionary mapping each file name to its content `hash`, `size`
+        and `mtime_ns`, the size and modification time before it was hashed.
+    """
+    manifest = manifest or {}
+    states = {}
+    for file in files:
+        name = os.path.basename(file)
+        stat = os.stat(file)
+        state = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        entry = manifest.get(name, {})
+        if "hash" in entry and all(entry.get(k) == v for k, v in state.items()):
+            state["hash"] = entry["hash"]
+        else:
+            state["hash"] = file_hash(file)
+        states[name] = state
+    return states
+
+
+def corpus_fingerprint(files: list[str], hashes: dict[str, str] | None = None) -> str:
+    """Fingerprint a knowledge base from the names and contents of its files.
+
+    Args:
+        files: Paths of the knowledge base files.
+        hashes: The content hash of each file name, if already known.
+
+    Returns:
+        A hexadecimal digest that changes whenever a file is added, removed or edited.
+    """
+    digest = hashlib.sha256()
+    for file in sorted(files):
+        name = os.path.basename(file)
+        digest.update(name.encode("utf-8"))
+        digest.update((hashes[name] if hashes else file_hash(file)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def index_settings(
+    chunk_size: int,
+    chunk_overlap: int,
+    embeddings_provider: str,
+    embedding_model: str,
+    dedup_threshold: float | None = None,
+) -> dict:
+    """Collect the settings that determine the content of a vector index.
+
+    Args:
+        chunk_size: Maximum number of characters per document chunk.
+        chunk_overlap: Number of overlapping characters between chunks.
+        embeddings_provider: Provider name for embeddings.
+        embedding_model: Identifier for the embeddings model.
+        dedup_threshold: Estimated Jaccard similarity above which a chunk is
+            merged into an indexed near-duplicate, or None to index every chunk.
+
+    Returns:
+        A dictionary with the index settings.
+    """
+    settings = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embeddings_provider": embeddings_provider,
+        "embedding_model": embedding_model,
+    }
+    # Indexes built without deduplication keep their keys
+    if dedup_threshold is not None:
+        settings["dedup_threshold"] = dedup_threshold
+    return settings
+
+
+def index_key(settings: dict) -> str:
+    """Derive the directory name of the index built with the given settings.
+
+    Args:
+        settings: Index settings as returned by `index_settings`.
+
+    Returns:
+        A short hexadecimal key.
+    """
+    payload = json.dumps(settings, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def index_fingerprint(settings: dict, corpus: str) -> str:
+    """Fingerprint an index from its settings and the knowledge base it was built from.
+
+    Args:
+        settings: Index settings as returned by `index_settings`.
+        corpus: The knowledge base fingerprint as returned by `corpus_fingerprint`.
+
+    Returns:
+        A hexadecimal digest identifying the index content.
+    """
+    payload = json.dumps({"settings": settings, "corpus": corpus}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def index_root(project_name: str) -> str:
+    """Return the directory holding every index of a project.
+
+    Args:
+        project_name: The project identifier.
+
+    Returns:
+        The path `data/project_name/index`.
+    """
+    return f"data/{project_name}/index"
+
+
+def index_path(project_name: str, settings: dict) -> str:
+    """Return the directory of the index built with the given settings.
+
+    Args:
+        project_name: The project identifier.
+        settings: Index settings as returned by `index_settings`.
+
+    Returns:
+        The path of the index directory.
+    """
+    return f"{index_root(project_name)}/{index_key(settings)}"
+
+
+def read_meta(path: str) -> dict | None:
+    """Read the metadata of a persisted index.
+
+    Args:
+        path: The index directory.
+
+    Returns:
+        The metadata dictionary, or None if the index is missing or incomplete.
+    """
+    file = f"{path}/{META_FILE}"
+    if not os.path.exists(file):
+        return None
+    try:
+        with open(file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def open_backend(
+    path: str,
+    vectorstore: VectorStore,
+    fingerprint: str,
+    backend: str,
+    ann: dict | None = None,
+    dump_chunks: bool = False,
+) -> VectorStore:
+    """Return the vector store backend used to search an index.
+
+    Args:
+        path: The index directory.
+        vectorstore: The Chroma index.
+        fingerprint: The fingerprint of the index.
+        backend: "chroma" to search the Chroma index, "numpy" to search its
+            memory-mapped NumPy export, exported again if it is outdated, or
+            "ivf" to search the export with an approximate IVF index.
+        ann: The `nlist`, `nprobe`, `iterations` and `seed` of the IVF index.
+        dump_chunks: Whether to export the chunk texts as a single chunk file,
+            which the "numpy" and "ivf" backends always do.
+
+    Returns:
+        The vector store.
+
+    Raises:
+        ValueError: If the backend is not supported.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported vector store backend: {backend}")
+    if backend == "chroma":
+        if dump_chunks:
+            export_chunks(path, vectorstore, fingerprint)
+        return vectorstore
+    store = NumpyVectorStore.export(path, vectorstore, fingerprint)
+    return open_export(path, store, backend, ann)
+
+
+def open_export(
+    path: str, store: NumpyVectorStore, backend: str, ann: dict | None = None
+) -> VectorStore:
+    """Return the NumPy export of an index, or its IVF index for the "ivf" backend."""
+    if backend == "ivf":
+        return IVFVectorStore.open(path, store, **(ann or {}))
+    return store
+
+
+def load_index(
+    project_name: str,
+    settings: dict,
+    embeddings: Embeddings,
+    backend: str = "chroma",
+    ann: dict | None = None,
+    dump_chunks: bool = False,
+) -> VectorStore | None:
+    """Reopen a persisted index if it matches the current knowledge base.
+
+    Args:
+        project_name: The project identifier.
+        settings: Index settings as returned by `index_settings`.
+        embeddings: The embeddings model used to embed queries.
+        backend: The vector store backend, "chroma", "numpy" or "ivf".
+        ann: The settings of the IVF index, for the "ivf" backend.
+        dump_chunks: Whether to export the chunk texts as a single chunk file.
+
+    Returns:
+        The persisted vector store, or None if there is no index matching the
+        settings and the current knowledge base.
+    """
+    path = index_path(project_name, settings)
+    meta = read_meta(path)
+    if meta is None:
+        return None
+
+    files = knowledge_base_files(project_name)
+    states = file_hashes(files, read_manifest(path))
+    corpus = corpus_fingerprint(files, {name: s["hash"] for name, s in states.items()})
+    if meta.get("fingerprint") != index_fingerprint(settings, corpus):
+        return None
+
+    # The NumPy export is opened without touching Chroma when it is up to date
+    if backend in ("numpy", "ivf"):
+        store = NumpyVectorStore.load(path, embeddings)
+        if store is not None and store.fingerprint == meta["fingerprint"]:
+            return open_export(path, store, backend, ann)
+
+    vectorstore = ChromaStore(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings,
+        persist_directory=path,
+    )
+    return open_backend(
+        path, vectorstore, meta["fingerprint"], backend, ann, dump_chunks
+    )
+
+
+def read_manifest(path: str) -> dict | None:
+    """Read the per-file manifest of a persisted index.
+
+    Args:
+        path: The index directory.
+
+    Returns:
+        A dictionary mapping each indexed file name to its content `hash`,
+        the `size` and `mtime_ns` it was hashed at, its `chunk_ids` and, with
+        deduplication, the `duplicates` of its chunks
+        skipped in favour of an indexed near-duplicate, or None if the index
+        has no manifest.
+    """
+    file = f"{path}/{MANIFEST_FILE}"
+    if not os.path.exists(file):
+        return None
+    try:
+        with open(file, "r", encoding="utf-8") as f:
+            return json.load(f)["files"]
+    except (OSError, KeyError, json.JSONDecodeError):
+        return None
+
+
+def duplicate_sources(manifest: dict) -> dict[str, list[dict]]:
+    """Collect the provenance of the near-duplicates merged into each chunk.
+
+    Args:
+        manifest: The per-file manifest of an index, as in `read_manifest`.
+
+    Returns:
+        A dictionary mapping the ID of each indexed chunk with near-duplicates
+        to the `source`, `start_index` and `similarity` of each of them.
+    """
+    sources = {}
+    for name in sorted(manifest):
+        for duplicate in manifest[name].get("duplicates", {}).values():
+            sources.setdefault(duplicate["of"], []).append(
+                {
+                    "source": name,
+                    "start_index": duplicate["start_index"],
+                    "similarity": duplicate["similarity"],
+                }
+            )
+    return sources
+
+
+def write_provenance(
+    vectorstore: VectorStore, ids: list[str], sources: dict[str, list[dict]]
+):
+    """Record the near-duplicates of chunks in their `duplicates` metadata.
+
+    Chroma metadata values are scalars, so the provenance of a chunk is stored
+    as a JSON list, and removed from chunks left without near-duplicates.
+
+    Args:
+        vectorstore: The Chroma index.
+        ids: The IDs of the chunks to update.
+        sources: The near-duplicates of each chunk, as in `duplicate_sources`.
+    """
+    for start in range(0, len(ids), 1000):
+        batch = ids[start : start + 1000]
+        vectorstore._collection.update(
+            ids=batch,
+            metadatas=[
+                {"duplicates": json.dumps(sources[i]) if i in sources else None}
+                for i in batch
+            ],
+        )
+
+
+def update_index(
+    project_name: str,
+    settings: dict,
+    embeddings: Embeddings,
+    rebuild: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = DEFAULT_WORKERS,
+    limiter: RateLimiter | None = None,
+    backend: str = "chroma",
+    ann: dict | None = None,
+    dump_chunks: bool = False,
+    chunking_workers: int = DEFAULT_CHUNKING_WORKERS,
+) -> tuple[VectorStore, dict]:
+    """Bring the index for the given settings up to date with the knowledge base.
+
+    Compares the content hash of every knowledge base file with the manifest of
+    the persisted index. Only added or modified files are split and embedded,
+    and the chunks of modified or deleted files are removed from the index, so
+    the cost of an update grows with the size of the change. With a
+    `dedup_threshold` setting, chunks whose MinHash similarity with an indexed
+    chunk reaches the threshold are not embedded. They are recorded in the
+    manifest and in the `duplicates` metadata of the indexed chunk, and files
+    whose duplicates lose their indexed chunk are split again. Chunks are embedded
+    in concurrent batches and upserted by ID, written batches are checkpointed,
+    and the manifest and metadata files are written last, so an interrupted
+    update resumes where it stopped. Files are read and split by a pool of
+    `chunking_workers` processes while their chunks are embedded. The BM25
+    index used by hybrid search is left to `load_lexical_index`, which rebuilds
+    it on first use once the update has outdated it.
+
+    Args:
+        project_name: The project identifier.
+        settings: Index settings as returned by `index_settings`.
+        embeddings: The embeddings model used to embed the documents.
+        rebuild: Whether to discard the persisted index and embed every file.
+        batch_size: Number of chunks per embedding request.
+        workers: Number of concurrent embedding requests.
+        limiter: The embeddings provider's rate limiter, if any.
+        backend: The vector store backend, "chroma", "numpy" or "ivf".
+        ann: The settings of the IVF index, for the "ivf" backend.
+        dump_chunks: Whether to export the chunk texts as a single chunk file.
+        chunking_workers: Number of processes reading and splitting files.
+
+    Returns:
+        The persisted vector store, and a dictionary counting the `added`,
+        `modified`, `deleted` and `unchanged` files, the `embedded` chunks and
+        the `chunks` indexed, with the throughput of each of its `stages`
+        (`split`, `embed`, `write` and `export`). With deduplication, it also
+        counts the `duplicates` merged into indexed chunks, and the unchanged
+        files `requeued` because their duplicates lost their indexed chunk.
+    """
+    path = index_path(project_name, settings)
+    checkpoint_path = f"{path}/{CHECKPOINT_FILE}"
+    manifest = None if rebuild else read_manifest(path)
+    if manifest is None:
+        manifest = {}
+        # Keep the chunks of an interrupted first build, discard anything else
+        if os.path.exists(path) and (rebuild or not os.path.exists(checkpoint_path)):
+            shutil.rmtree(path)
+    os.makedirs(path, exist_ok=True)
+
+    vectorstore = ChromaStore(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings,
+        persist_directory=path,
+    )
+
+    # Compare the knowledge base with the manifest
+    files = knowledge_base_files(project_name)
+    states = file_hashes(files, manifest)
+    hashes = {name: state["hash"] for name, state in states.items()}
+    changed = [
+        file
+        for file in files
+        if manifest.get(os.path.basename(file), {}).get("hash")
+        != hashes[os.path.basename(file)]
+    ]
+    deleted = [name for name in manifest if name not in hashes]
+    stats = {
+        "added": sum(os.path.basename(file) not in manifest for file in changed),
+        "modified": sum(os.path.basename(file) in manifest for file in changed),
+        "deleted": len(deleted),
+        "unchanged": len(files) - len(changed),
+    }
+
+    # Split again the files whose duplicates point to a removed chunk
+    stale = set(deleted) | {os.path.basename(file) for file in changed}
+    stale_ids = {
+        chunk_id
+        for name in stale
+        for chunk_id in manifest.get(name, {}).get("chunk_ids", [])
+    }
+    requeued = True
+    while requeued:
+        requeued = False
+        for name, entry in manifest.items():
+            duplicates = entry.get("duplicates", {}).values()
+            if name not in stale and any(d["of"] in stale_ids for d in duplicates):
+                stale.add(name)
+                stale_ids.update(entry["chunk_ids"])
+                requeued = True
+    stats["requeued"] = len(stale) - len(deleted) - len(changed)
+    changed = [file for file in files if os.path.basename(file) in stale]
+    previous_sources = duplicate_sources(manifest)
+
+    # Remove the chunks of modified and deleted files
+    if stale_ids:
+        vectorstore.delete(ids=sorted(stale_ids))
+    for name in deleted:
+        del manifest[name]
+
+    # Find the near-duplicates of new chunks among the chunks kept
+    threshold = settings.get("dedup_threshold")
+    dedup = None
+    if threshold is not None:
+        dedup_path = f"{path}/{DEDUP_FILE}"
+        dedup = MinHashIndex.load(dedup_path, threshold) if manifest else None
+        if dedup is None:
+            dedup = MinHashIndex(threshold)
+            if manifest:
+                stored = vectorstore.get(include=["documents"])
+                for chunk_id, text in zip(stored["ids"], stored["documents"]):
+                    dedup.add(chunk_id, dedup.signature(text))
+        for chunk_id in stale_ids:
+            dedup.remove(chunk_id)
+
+    # Stream the chunks of added and modified files into the embedding stage
+    stages = {
+        "split": StageStats(workers=chunking_workers, unit="files"),
+        "embed": StageStats(workers=workers, unit="chunks"),
+        "write": StageStats(unit="chunks"),
+        "export": StageStats(unit="chunks"),
+    }
+
+    def chunks() -> Iterator[Document]:
+        for file, docs in split_files(
+            changed,
+            settings["chunk_size"],
+            settings["chunk_overlap"],
+            hashes,
+            workers=chunking_workers,
+            stats=stages["split"],
+        ):
+            name = os.path.basename(file)
+            chunk_ids = []
+            manifest[name] = {"hash": hashes[name], "chunk_ids": chunk_ids}
+            if dedup is not None:
+                duplicates = manifest[name]["duplicates"] = {}
+            for doc in docs:
+                if dedup is not None:
+                    signature = dedup.signature(doc.page_content)
+                    match = dedup.query(signature)
+                    if match is not None:
+                        duplicates[doc.id] = {
+                            "of": match[0],
+                            "start_index": doc.metadata["start_index"],
+                            "similarity": round(match[1], 3),
+                        }
+                        continue
+                    dedup.add(doc.id, signature)
+                chunk_ids.append(doc.id)
+                yield doc
+
+    stats["embedded"] = ingest(
+        vectorstore,
+        chunks(),
+        embeddings,
+        batch_size=batch_size,
+        workers=workers,
+        limiter=limiter,
+        checkpoint_path=checkpoint_path,
+        stages=stages,
+    )
+    # Indexes built before chunk files kept one text file per chunk
+    shutil.rmtree(f"{path}/content", ignore_errors=True)
+
+    start = time.perf_counter()
+    if dedup is not None:
+        # Rewrite the provenance of new chunks and of changed duplicate lists
+        sources = duplicate_sources(manifest)
+        written = {
+            chunk_id
+            for file in changed
+            for chunk_id in manifest[os.path.basename(file)]["chunk_ids"]
+        }
+        updated = [
+            chunk_id
+            for entry in manifest.values()
+            for chunk_id in entry["chunk_ids"]
+            if sources.get(chunk_id)
+            != (None if chunk_id in written else previous_sources.get(chunk_id))
+        ]
+        write_provenance(vectorstore, updated, sources)
+        dedup.save(dedup_path)
+
+    for name, state in states.items():
+        manifest[name].update(state)
+    with open(f"{path}/{MANIFEST_FILE}", "w", encoding="utf-8") as f:
+        json.dump({"files": manifest}, f, indent=2)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    corpus = corpus_fingerprint(files, hashes)
+    stats["chunks"] = sum(len(entry["chunk_ids"]) for entry in manifest.values())
+    meta = {
+        **settings,
+        "fingerprint": index_fingerprint(settings, corpus),
+        "corpus": corpus,
+        "num_chunks": stats["chunks"],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if dedup is not None:
+        stats["duplicates"] = sum(
+            len(entry.get("duplicates", {})) for entry in manifest.values()
+        )
+        meta["num_duplicates"] = stats["duplicates"]
+    with open(f"{path}/{META_FILE}", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    vectorstore = open_backend(
+        path, vectorstore, meta["fingerprint"], backend, ann, dump_chunks
+    )
+    stages["export"].add(stats["chunks"], time.perf_counter() - start)
+    stats["stages"] = {name: stage.as_dict() for name, stage in stages.items()}
+    return vectorstore, stats
+
+
+def build_lexical_index(
+    path: str, vectorstore: VectorStore, fingerprint: str
+) -> BM25Index:
+    """Build the BM25 index of every chunk of a vector index, next to it.
+
+    The chunks of a Chroma index are read a page at a time. The NumPy and IVF
+    backends already hold the metadata of every chunk, and read the texts
+    from their chunk file.
+
+    Args:
+        path: The vector index directory.
+        vectorstore: The vector index, of any backend.
+        fingerprint: The fingerprint of the vector index.
+
+    Returns:
+        The BM25 index.
+    """
+    if isinstance(vectorstore, NumpyVectorStore):
+        docs = [
+            Document(
+                page_content=vectorstore.chunks.text(chunk_id),
+                metadata=metadata,
+                id=chunk_id,
+            )
+            for chunk_id, metadata in zip(vectorstore.ids, vectorstore.metadatas)
+        ]
+    else:
+        docs = [
+            Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+            for page in iter_stored_pages(vectorstore, ["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(
+                page["ids"], page["documents"], page["metadatas"]
+            )
+        ]
+    return build_bm25(path, docs, fingerprint)
+
+
+def load_lexical_index(path: str, vectorstore: VectorStore) -> BM25Index:
+    """Load the BM25 index of a vector index, building it if it is outdated.
+
+    The BM25 index is only built for hybrid search, and only rebuilt the first
+    time it is used after an update changed the chunks.
+
+    Args:
+        path: The vector index directory.
+        vectorstore: The vector index.
+
+    Returns:
+        The BM25 index.
+    """
+    fingerprint = read_meta(path)["fingerprint"]
+    return load_bm25(path, fingerprint) or build_lexical_index(
+        path, vectorstore, fingerprint
+    )
+
+
+def index_status(project_name: str) -> list[dict]:
+    """Describe every persisted index of a project.
+
+    Args:
+        project_name: The project identifier.
+
+    Returns:
+        A list with the metadata of each index, including its `key` and whether
+        it is `fresh` with respect to the current knowledge base.
+    """
+    root = index_root(project_name)
+    if not os.path.exists(root):
+        return []
+
+    files = knowledge_base_files(project_name)
+    status = []
+    for key in sorted(os.listdir(root)):
+        meta = read_meta(f"{root}/{key}")
+        if meta is None:
+            status.append({"key": key, "fresh": False, "complete": False})
+            continue
+        states = file_hashes(files, read_manifest(f"{root}/{key}"))
+        corpus = corpus_fingerprint(
+            files, {name: state["hash"] for name, state in states.items()}
+        )
+        status.append(
+            {
+                "key": key,
+                **meta,
+                "fresh": meta.get("corpus") == corpus,
+                "complete": True,
+            }
+        )
+    return status
+
+
+def drop_index(project_name: str, key: str | None = None) -> list[str]:
+    """Remove persisted indexes of a project.
+
+    Args:
+        project_name: The project identifier.
+        key: The key of the index to remove. If None, every index is removed.
+
+    Returns:
+        The keys of the removed indexes.
+
+    Raises:
+        ValueError: If `key` does not identify an existing index.
+    """
+    root = index_root(project_name)
+    if key is not None:
+        if not os.path.exists(f"{root}/{key}"):
+            raise ValueError(f"No index {key} for project {project_name}")
+        shutil.rmtree(f"{root}/{key}")
+        return [key]
+
+    if not os.path.exists(root):
+        return []
+    keys = sorted(os.listdir(root))
+    shutil.rmtree(root)
+    return keys
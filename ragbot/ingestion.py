@@ -0,0 +1,160 @@
+"""Batched, concurrent and resumable embedding of document chunks into a vector store."""
+
+import itertools
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ragbot.utils.rate_limit import RateLimiter, estimate_tokens, retry_with_backoff
+from ragbot.utils.stages import StageStats
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_WORKERS = 4
+
+
+def read_checkpoint(checkpoint_path: str) -> set[str]:
+    """Read the IDs of the chunks already written by an interrupted ingestion.
+
+    Args:
+        checkpoint_path: Path to the checkpoint file.
+
+    Returns:
+        The set of chunk IDs recorded in the checkpoint.
+    """
+    if not os.path.exists(checkpoint_path):
+        return set()
+    done = set()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.update(json.loads(line))
+            except json.JSONDecodeError:
+                # A partially written last line is simply ignored
+                continue
+    return done
+
+
+def add_embedded(vectorstore: VectorStore, docs: list[Document], vectors: list):
+    """Write chunks whose embeddings were already computed to a vector store.
+
+    Args:
+        vectorstore: The vector store to write to.
+        docs: The chunks, with their IDs set.
+        vectors: One embedding vector per chunk.
+    """
+    vectorstore._collection.upsert(
+        ids=[doc.id for doc in docs],
+        embeddings=vectors,
+        documents=[doc.page_content for doc in docs],
+        metadatas=[doc.metadata or None for doc in docs],
+    )
+
+
+def embed_batch(
+    embeddings: Embeddings, docs: list[Document], limiter: RateLimiter | None
+) -> list:
+    """Embed a batch of chunks within the provider's rate limit.
+
+    Args:
+        embeddings: The embeddings model.
+        docs: The chunks to embed.
+        limiter: The provider's rate limiter, if any.
+
+    Returns:
+        One embedding vector per chunk.
+    """
+    texts = [doc.page_content for doc in docs]
+    if limiter is None:
+        return retry_with_backoff(embeddings.embed_documents, texts)
+    tokens = sum(estimate_tokens(text) for text in texts)
+    return limiter.call(embeddings.embed_documents, texts, tokens=tokens)
+
+
+def timed_embed_batch(
+    embeddings: Embeddings, docs: list[Document], limiter: RateLimiter | None
+) -> tuple[list, float]:
+    """Embed a batch of chunks with `embed_batch`, also returning the time it took."""
+    start = time.perf_counter()
+    vectors = embed_batch(embeddings, docs, limiter)
+    return vectors, time.perf_counter() - start
+
+
+def ingest(
+    vectorstore: VectorStore,
+    docs: Iterable[Document],
+    embeddings: Embeddings,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = DEFAULT_WORKERS,
+    limiter: RateLimiter | None = None,
+    checkpoint_path: str | None = None,
+    stages: dict[str, StageStats] | None = None,
+) -> int:
+    """Embed chunks in concurrent batches and write them to a vector store.
+
+    Batches are embedded by a pool of `workers` threads, each call waiting for
+    the provider's rate limiter and backing off exponentially when throttled.
+    Chunks are consumed lazily, so a generator of chunks is read only as fast
+    as batches are embedded. Written batches are recorded in a checkpoint
+    file, so an interrupted ingestion resumes with the chunks that were not
+    written yet.
+
+    Args:
+        vectorstore: The vector store to write to.
+        docs: The chunks to embed, with their IDs set, as any iterable.
+        embeddings: The embeddings model.
+        batch_size: Number of chunks per embedding request.
+        workers: Number of concurrent embedding requests.
+        limiter: The provider's rate limiter, if any.
+        checkpoint_path: Path to the checkpoint file, or None to disable resuming.
+        stages: Where to record the throughput of the `embed` and `write` stages.
+
+    Returns:
+        The number of chunks embedded in this call.
+    """
+    done = read_checkpoint(checkpoint_path) if checkpoint_path else set()
+    pending = (doc for doc in docs if doc.id not in done)
+    batches = iter(lambda: list(itertools.islice(pending, batch_size)), [])
+    embedded = 0
+
+    checkpoint = (
+        open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+    )
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+
+            def submit(batch: list[Document]):
+                nonlocal embedded
+                future = executor.submit(timed_embed_batch, embeddings, batch, limiter)
+                futures[future] = batch
+                embedded += len(batch)
+
+            # Keep a bounded number of batches in flight to bound memory usage
+            for batch in itertools.islice(batches, 2 * workers):
+                submit(batch)
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch = futures.pop(future)
+                    vectors, seconds = future.result()
+                    start = time.perf_counter()
+                    add_embedded(vectorstore, batch, vectors)
+                    if stages is not None:
+                        stages["embed"].add(len(batch), seconds)
+                        stages["write"].add(len(batch), time.perf_counter() - start)
+                    if checkpoint is not None:
+                        checkpoint.write(json.dumps([doc.id for doc in batch]) + "\n")
+                        checkpoint.flush()
+                    for batch in itertools.islice(batches, 1):
+                        submit(batch)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    return embedded
@@ -1,17 +1,35 @@
 """RAG setup module for initializing retrieval-augmented generation chains."""
 
-import glob
+import hashlib
+import json
 import os
-import shutil
+from typing import Iterator
 
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains.retrieval import create_retrieval_chain
-from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import Runnable
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.vectorstores import VectorStore
 
+from ragbot.answer_cache import CachedChain, get_answer_cache
+from ragbot.chunking import DEFAULT_CHUNKING_WORKERS, split_files
+from ragbot.indexing import (
+    index_path,
+    index_settings,
+    knowledge_base_files,
+    load_index,
+    load_lexical_index,
+    read_meta,
+    update_index,
+)
+from ragbot.ingestion import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from ragbot.retrieval import DEFAULT_FETCH_K, DEFAULT_LAMBDA_MULT
+from ragbot.retrieval.hybrid import HybridRetriever
+from ragbot.retrieval.packing import PackedRetriever
+from ragbot.utils.instrumentation import StageTimer
+from ragbot.utils.rate_limit import get_rate_limiter
+from ragbot.utils.stages import format_stages
 from ragbot.utils.utils import get_embeddings, get_model
 
 
@@ -28,11 +46,24 @@ def setup(
     chunk_overlap: int,
     search_type: str,
     k_docs: int,
+    fetch_k: int = DEFAULT_FETCH_K,
+    lambda_mult: float = DEFAULT_LAMBDA_MULT,
+    embedding_batch_size: int = DEFAULT_BATCH_SIZE,
+    embedding_workers: int = DEFAULT_WORKERS,
+    answer_cache: dict | None = None,
+    vectorstore_backend: str = "chroma",
+    ann: dict | None = None,
+    dump_chunks: bool = False,
+    chunking_workers: int = DEFAULT_CHUNKING_WORKERS,
+    pack_context: bool = False,
+    context_tokens: int | None = None,
+    dedup_threshold: float | None = None,
 ) -> Runnable:
     """Set up and return a RAG retrieval chain.
 
-    Initializes a language model and embeddings, chunks input documents,
-    and creates a retrieval-augmented generation chain using LangChain.
+    Initializes a language model, reopens or builds the persisted vector index
+    of the knowledge base, and creates a retrieval-augmented generation chain
+    using LangChain.
 
     Args:
         project_name: Name of the project..
@@ -45,8 +76,32 @@ def setup(
         embedding_model: Identifier for the embeddings model.
         chunk_size: Maximum number of characters per document chunk.
         chunk_overlap: Number of overlapping characters between chunks.
-        search_type: Type of search for the retriever (e.g., "similarity", "mmr").
+        search_type: Type of search for the retriever: "similarity", "mmr", or
+            "hybrid" to fuse BM25 and similarity rankings with reciprocal rank fusion.
         k_docs: Number of top documents to retrieve.
+        fetch_k: Number of most similar chunks the "mmr" search selects from.
+        lambda_mult: Trade-off of the "mmr" search between relevance, at 1, and
+            diversity, at 0.
+        embedding_batch_size: Number of chunks per embedding request when indexing.
+        embedding_workers: Number of concurrent embedding requests when indexing.
+        answer_cache: Options of the semantic answer cache (`threshold`,
+            `max_entries`, `ttl`), or None to disable it. Cached answers are
+            shared by the chains of the same project, index and settings, and
+            dropped when the index changes.
+        vectorstore_backend: The vector store searched, "chroma", "numpy" for
+            a memory-mapped NumPy matrix exported from the Chroma index, or
+            "ivf" for an approximate IVF index over that matrix.
+        ann: The `nlist`, `nprobe`, `iterations` and `seed` of the IVF index.
+        dump_chunks: Whether to export the chunk texts of the index as a single
+            chunk file next to it.
+        chunking_workers: Number of processes splitting files when indexing.
+        pack_context: Whether to merge the overlapping chunks of a file and
+            drop repeated text from the retrieved context.
+        context_tokens: Budget of the retrieved context, in estimated tokens,
+            which also enables `pack_context`. No limit if None.
+        dedup_threshold: Similarity above which chunks are merged into an
+            indexed near-duplicate instead of being embedded, or None to index
+            every chunk.
 
     Returns:
         A `Runnable` LangChain object that processes user input through a RAG pipeline.
@@ -55,24 +110,61 @@ def setup(
         FileNotFoundError: If there is no `system.prompt` file at `data/project_name`.
         RuntimeError: If the system prompt file cannot be read, or if it does not contain the required `{context}` placeholder.
     """
+    # Identify the settings of the answers, before `llm` becomes the model
+    chain_settings = [
+        llm_provider,
+        llm,
+        llm_temperature,
+        llm_top_p,
+        llm_top_k,
+        search_type,
+        k_docs,
+        fetch_k,
+        lambda_mult,
+        pack_context,
+        context_tokens,
+    ]
+
     # Set up a language model
     llm = get_model(
         llm_provider, llm, temperature=llm_temperature, top_p=llm_top_p, top_k=llm_top_k
     )
 
-    # Create documents from knowledge base
-    docs = create_docs(project_name, chunk_size, chunk_overlap)
-
-    # Create vectorstore
-    vectorstore = Chroma.from_documents(
-        documents=docs,
-        embedding=get_embeddings(embeddings_provider, embedding_model),
+    # Reopen the persisted index, or build it from the knowledge base
+    vectorstore = get_vectorstore(
+        project_name=project_name,
+        embeddings_provider=embeddings_provider,
+        embedding_model=embedding_model,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        batch_size=embedding_batch_size,
+        workers=embedding_workers,
+        backend=vectorstore_backend,
+        ann=ann,
+        dump_chunks=dump_chunks,
+        chunking_workers=chunking_workers,
+        dedup_threshold=dedup_threshold,
     )
 
     # Instantiate the relevant docs retriever
-    retriever = vectorstore.as_retriever(
-        search_type=search_type, search_kwargs={"k": k_docs}
+    settings = index_settings(
+        chunk_size, chunk_overlap, embeddings_provider, embedding_model, dedup_threshold
     )
+    if search_type == "hybrid":
+        path = index_path(project_name, settings)
+        bm25 = load_lexical_index(path, vectorstore)
+        retriever = HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=k_docs)
+    elif search_type == "mmr":
+        retriever = vectorstore.as_retriever(
+            search_type=search_type,
+            search_kwargs={"k": k_docs, "fetch_k": fetch_k, "lambda_mult": lambda_mult},
+        )
+    else:
+        retriever = vectorstore.as_retriever(
+            search_type=search_type, search_kwargs={"k": k_docs}
+        )
+    if pack_context or context_tokens is not None:
+        retriever = PackedRetriever(retriever=retriever, max_tokens=context_tokens)
 
     # Check system prompt and read
     file = f"data/{project_name}/system.prompt"
@@ -105,72 +197,178 @@ def setup(
         ]
     )
 
-    # Create retrieval chain
+    # Create retrieval chain, timing its stages locally
     qa_chain = create_stuff_documents_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(retriever, qa_chain)
+    rag_chain = create_retrieval_chain(retriever, qa_chain).with_config(
+        callbacks=[StageTimer()]
+    )
+
+    # Answer queries similar to previous ones from the cache
+    if answer_cache is not None:
+        meta = read_meta(index_path(project_name, settings)) or {}
+        payload = json.dumps([*chain_settings, system_prompt])
+        cache = get_answer_cache(
+            project_name,
+            meta.get("fingerprint", ""),
+            hashlib.sha256(payload.encode("utf-8")).hexdigest(),
+            **answer_cache,
+        )
+        rag_chain = CachedChain(rag_chain, cache, vectorstore.embeddings)
 
     return rag_chain
 
 
+def setup_from_config(project_name: str, config: dict) -> Runnable:
+    """Set up a RAG retrieval chain from a configuration.
+
+    Args:
+        project_name: Name of the project.
+        config: A configuration with the parameters of `setup`, such as the
+            ones in the `configs/` directory.
+
+    Returns:
+        A `Runnable` LangChain object that processes user input through a RAG pipeline.
+    """
+    return setup(
+        project_name=project_name,
+        llm_provider=config["llm_provider"],
+        llm=config["llm"],
+        llm_temperature=config["llm_temperature"],
+        llm_top_p=config["llm_top_p"],
+        llm_top_k=config["llm_top_k"],
+        embeddings_provider=config["embeddings_provider"],
+        embedding_model=config["embedding_model"],
+        chunk_size=config["chunk_size"],
+        chunk_overlap=config["chunk_overlap"],
+        search_type=config["search_type"],
+        k_docs=config["k_docs"],
+        fetch_k=config.get("fetch_k", DEFAULT_FETCH_K),
+        lambda_mult=config.get("lambda_mult", DEFAULT_LAMBDA_MULT),
+        embedding_batch_size=config.get("embedding_batch_size", DEFAULT_BATCH_SIZE),
+        embedding_workers=config.get("embedding_workers", DEFAULT_WORKERS),
+        answer_cache=config.get("answer_cache"),
+        vectorstore_backend=config.get("vectorstore", "chroma"),
+        ann=config.get("ann"),
+        dump_chunks=config.get("dump_chunks", False),
+        chunking_workers=config.get("chunking_workers", DEFAULT_CHUNKING_WORKERS),
+        pack_context=config.get("pack_context", False),
+        context_tokens=config.get("context_tokens"),
+        dedup_threshold=config.get("dedup_threshold"),
+    )
+
+
+def get_vectorstore(
+    project_name: str,
+    embeddings_provider: str,
+    embedding_model: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    rebuild: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = DEFAULT_WORKERS,
+    backend: str = "chroma",
+    ann: dict | None = None,
+    dump_chunks: bool = False,
+    chunking_workers: int = DEFAULT_CHUNKING_WORKERS,
+    dedup_threshold: float | None = None,
+) -> VectorStore:
+    """Return the vector index of a project, building it only when needed.
+
+    The index is persisted under `data/project_name/index/` and keyed by a
+    fingerprint of the knowledge base files and the chunking and embeddings
+    settings. A matching index is reopened without re-embedding anything, and
+    an outdated one is updated by re-embedding only the files that changed.
+
+    Args:
+        project_name: The project identifier.
+        embeddings_provider: Provider name for embeddings.
+        embedding_model: Identifier for the embeddings model.
+        chunk_size: Maximum number of characters per document chunk.
+        chunk_overlap: Number of overlapping characters between chunks.
+        rebuild: Whether to rebuild the whole index from scratch.
+        batch_size: Number of chunks per embedding request.
+        workers: Number of concurrent embedding requests.
+        backend: The vector store backend, "chroma", "numpy" or "ivf".
+        ann: The settings of the IVF index, for the "ivf" backend.
+        dump_chunks: Whether to export the chunk texts as a single chunk file.
+        chunking_workers: Number of processes reading and splitting files.
+        dedup_threshold: Similarity above which chunks are merged into an
+            indexed near-duplicate, or None to index every chunk.
+
+    Returns:
+        The vector store holding the project's document chunks.
+    """
+    embeddings = get_embeddings(embeddings_provider, embedding_model)
+    settings = index_settings(
+        chunk_size, chunk_overlap, embeddings_provider, embedding_model, dedup_threshold
+    )
+
+    if not rebuild:
+        vectorstore = load_index(
+            project_name, settings, embeddings, backend, ann, dump_chunks
+        )
+        if vectorstore is not None:
+            return vectorstore
+
+    vectorstore, stats = update_index(
+        project_name,
+        settings,
+        embeddings,
+        rebuild=rebuild,
+        batch_size=batch_size,
+        workers=workers,
+        limiter=get_rate_limiter(embeddings_provider, embedding_model),
+        backend=backend,
+        ann=ann,
+        dump_chunks=dump_chunks,
+        chunking_workers=chunking_workers,
+    )
+    print(
+        f"Indexed project {project_name}: {stats['added']} added, "
+        f"{stats['modified']} modified, {stats['deleted']} deleted, "
+        f"{stats['unchanged']} unchanged files, {stats['embedded']} chunks "
+        f"embedded ({stats['chunks']} chunks)"
+    )
+    if "duplicates" in stats:
+        total = stats["chunks"] + stats["duplicates"]
+        print(
+            f"  dedup  {stats['duplicates']} near-duplicate chunks merged, "
+            f"index {stats['duplicates'] / total if total else 0:.1%} smaller, "
+            f"{stats['requeued']} unchanged files split again"
+        )
+    print(format_stages(stats["stages"]))
+    return vectorstore
+
+
 def create_docs(
-    project_name: str, chunk_size: int, chunk_overlap: int
-) -> list[Document]:
-    """Create and return documents for a given project.
+    project_name: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    workers: int = DEFAULT_CHUNKING_WORKERS,
+) -> Iterator[Document]:
+    """Create the documents of a given project, lazily.
 
-    Loads, splits, and stores the content to be used for embedding and
-    retrieval. The `project_name/` directory must exist under the `data`
-    directory with its knowledge base of .txt files.
+    Reads and splits the knowledge base one file block at a time, or one file
+    per worker process, so that the chunks can be consumed as they are
+    produced without holding the corpus in memory. The `project_name/`
+    directory must exist under the `data` directory with its knowledge base
+    of .txt files.
 
     Args:
         project_name: The project identifier.
         chunk_size: The maximum size of each text chunk.
         chunk_overlap: The number of characters to overlap between chunks.
+        workers: Number of processes reading and splitting files.
 
-    Returns:
-        A list of `Document` objects.
+    Yields:
+        The `Document` chunks, with their IDs and `source` and `start_index` metadata.
 
     Raises:
         ValueError: If the `project_name` knowledge base is not found at data/.
         FileNotFoundError: If the `project_name` knowledge base is empty.
         RuntimeError: If it fails to read any file from the knowledge base.
     """
-    dir_path = f"data/{project_name}"
-    if not os.path.exists(dir_path):
-        raise ValueError(
-            f"No data for project {project_name}, please add directory {dir_path} with knowledge base files"
-        )
-
-    # Remove previous content
-    content_dir = f"{dir_path}/content/"
-    if os.path.exists(content_dir):
-        shutil.rmtree(content_dir)
-    os.makedirs(content_dir)
-
-    # Declare splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        separators=["\n\n", "\n", " ", ""],
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-    )
-
-    # Create documents
-    docs = []
-    knowledge_base = glob.glob(f"{dir_path}/*.txt")
-    if not knowledge_base:
-        raise FileNotFoundError(f"No .txt files found in {dir_path}")
-
-    for file in knowledge_base:
-        try:
-            with open(file, "r", encoding="utf-8") as f:
-                content = f.read()
-        except Exception as e:
-            raise RuntimeError(f"Failed to read file {file}: {e}") from e
-        splits = text_splitter.split_text(content)
-        docs.extend([Document(page_content=chunk) for chunk in splits])
-
-    # Store documents
-    for i, doc in enumerate(docs):
-        with open(f"{dir_path}/content/doc{i}.txt", "w", encoding="utf-8") as f:
-            f.write(doc.page_content)
-
-    return docs
+    for _, docs in split_files(
+        knowledge_base_files(project_name), chunk_size, chunk_overlap, workers=workers
+    ):
+        yield from docs
@@ -0,0 +1,9 @@
+"""Vector stores and retrievers over the persisted index of a project."""
+
+# Vector store backends an index can be searched with
+BACKENDS = ("chroma", "numpy", "ivf")
+
+# Maximal marginal relevance defaults, kept here so that the CLI parses its
+# arguments without importing NumPy
+DEFAULT_FETCH_K = 20
+DEFAULT_LAMBDA_MULT = 0.5
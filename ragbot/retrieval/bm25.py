@@ -0,0 +1,266 @@
+"""BM25 inverted index over the chunks of a vector index, with vectorized scoring."""
+
+import os
+import re
+from collections import Counter
+
+import numpy as np
+from langchain_core.documents import Document
+
+BM25_FILE = "bm25.npz"
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split a text into lowercase word tokens.
+
+    Args:
+        text: The text to tokenize.
+
+    Returns:
+        The tokens, keeping codes and identifiers such as `E1234` or `v2` whole.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 index with precomputed posting weights.
+
+    Postings are stored in compressed sparse row form: the chunks containing
+    term `t` are `postings[indptr[t]:indptr[t + 1]]`, and each posting holds
+    the final BM25 contribution of the term to the chunk's score. Scoring a
+    query is then a single weighted `bincount` over the postings of its terms,
+    and only those postings are ranked.
+
+    Attributes:
+        terms (np.ndarray): The vocabulary.
+        indptr (np.ndarray): Start of the postings of each term.
+        postings (np.ndarray): Chunk positions of the postings.
+        weights (np.ndarray): BM25 weight of each posting.
+        ids (np.ndarray): Chunk ID of each chunk position.
+        sources (np.ndarray): Source file of each chunk.
+        starts (np.ndarray): Start index of each chunk in its source file.
+        fingerprint (str | None): The fingerprint of the index the chunks belong to.
+    """
+
+    def __init__(
+        self,
+        terms: np.ndarray,
+        indptr: np.ndarray,
+        postings: np.ndarray,
+        weights: np.ndarray,
+        ids: np.ndarray,
+        sources: np.ndarray,
+        starts: np.ndarray,
+        fingerprint: str | None = None,
+    ):
+        """Initializes the index from its arrays.
+
+        Args:
+            terms: The vocabulary.
+            indptr: Start of the postings of each term, plus the total number of postings.
+            postings: Chunk positions of the postings.
+            weights: BM25 weight of each posting.
+            ids: Chunk ID of each chunk position.
+            sources: Source file of each chunk.
+            starts: Start index of each chunk in its source file.
+            fingerprint: The fingerprint of the index the chunks belong to.
+        """
+        self.terms = terms
+        self.indptr = indptr
+        self.postings = postings
+        self.weights = weights
+        self.ids = ids
+        self.sources = sources
+        self.starts = starts
+        self.fingerprint = fingerprint
+        self.vocabulary = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def build(
+        cls,
+        docs: list[Document],
+        k1: float = 1.5,
+        b: float = 0.75,
+        fingerprint: str | None = None,
+    ) -> "BM25Index":
+        """Build the index of a list of chunks.
+
+        Args:
+            docs: The chunks, with their IDs and `source` and `start_index` metadata.
+            k1: Term frequency saturation.
+            b: Document length normalization.
+            fingerprint: The fingerprint of the index the chunks belong to.
+
+        Returns:
+            The BM25 index.
+        """
+        vocabulary: dict[str, int] = {}
+        term_ids, doc_ids, tfs, lengths = [], [], [], []
+        for position, doc in enumerate(docs):
+            tokens = tokenize(doc.page_content)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(position)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float32)
+        lengths = np.asarray(lengths, dtype=np.float32)
+
+        # Group the postings by term
+        order = np.argsort(term_ids, kind="stable")
+        df = np.bincount(term_ids, minlength=len(vocabulary))
+        indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        num_docs = len(docs)
+        idf = np.log1p((num_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = lengths.mean() if num_docs else 1.0
+        norm = k1 * (1 - b + b * lengths[doc_ids] / max(avgdl, 1.0))
+        weights = idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)
+
+        return cls(
+            terms=np.asarray(list(vocabulary), dtype=str),
+            indptr=indptr,
+            postings=doc_ids[order],
+            weights=weights[order].astype(np.float32),
+            ids=np.asarray([doc.id for doc in docs], dtype=str),
+            sources=np.asarray(
+                [doc.metadata.get("source", "") for doc in docs], dtype=str
+            ),
+            starts=np.asarray(
+                [doc.metadata.get("start_index", -1) for doc in docs], dtype=np.int64
+            ),
+            fingerprint=fingerprint,
+        )
+
+    def save(self, path: str):
+        """Write the index to a `.npz` file.
+
+        Args:
+            path: Path to the file.
+        """
+        np.savez(
+            path,
+            terms=self.terms,
+            indptr=self.indptr,
+            postings=self.postings,
+            weights=self.weights,
+            ids=self.ids,
+            sources=self.sources,
+            starts=self.starts,
+            fingerprint=np.asarray(self.fingerprint or ""),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Read an index written by `save`.
+
+        Args:
+            path: Path to the file.
+
+        Returns:
+            The BM25 index.
+        """
+        with np.load(path) as arrays:
+            fields = {name: arrays[name] for name in arrays.files}
+        # Indexes saved before fingerprints were recorded are never up to date
+        fingerprint = str(fields.pop("fingerprint", ""))
+        return cls(**fields, fingerprint=fingerprint or None)
+
+    def scores(self, query: str) -> tuple[np.ndarray, np.ndarray, int]:
+        """Score every chunk against a query.
+
+        Args:
+            query: The query text.
+
+        Returns:
+            The BM25 score of each chunk position, the chunk positions of the
+            postings of the query terms, and the number of query terms found.
+        """
+        term_ids = [
+            self.vocabulary[term]
+            for term in set(tokenize(query))
+            if term in self.vocabulary
+        ]
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        candidates = np.concatenate(
+            [self.postings[s] for s in slices] or [np.zeros(0, np.int32)]
+        )
+        scores = np.bincount(
+            candidates,
+            weights=np.concatenate(
+                [self.weights[s] for s in slices] or [np.zeros(0, np.float32)]
+            ),
+            minlength=len(self.ids),
+        )
+        return scores, candidates, len(term_ids)
+
+    def top_k(self, query: str, k: int) -> list[tuple[int, float]]:
+        """Find the best matching chunks of a query.
+
+        Only the postings of the query terms are ranked, never the whole corpus.
+
+        Args:
+            query: The query text.
+            k: Maximum number of chunks to return.
+
+        Returns:
+            The chunk positions and scores of the matching chunks, best first.
+        """
+        scores, candidates, num_terms = self.scores(query)
+        # A chunk appears once per matching term, so the best k chunks are
+        # among the best k * num_terms postings
+        limit = k * num_terms
+        if len(candidates) > limit:
+            candidates = candidates[
+                np.argpartition(-scores[candidates], limit - 1)[:limit]
+            ]
+        candidates = np.unique(candidates)
+        best = candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def key(self, position: int) -> tuple:
+        """Identify the chunk at a position by its source file and start index."""
+        return str(self.sources[position]), int(self.starts[position])
+
+    def id(self, position: int) -> str:
+        """Return the ID of the chunk at a position."""
+        return str(self.ids[position])
+
+
+def build_bm25(path: str, docs: list[Document], fingerprint: str) -> BM25Index:
+    """Build and save the BM25 index of a vector index directory.
+
+    Args:
+        path: The vector index directory.
+        docs: Every chunk of the vector index.
+        fingerprint: The fingerprint of the vector index.
+
+    Returns:
+        The BM25 index.
+    """
+    index = BM25Index.build(docs, fingerprint=fingerprint)
+    index.save(f"{path}/{BM25_FILE}")
+    return index
+
+
+def load_bm25(path: str, fingerprint: str | None = None) -> BM25Index | None:
+    """Load the BM25 index of a vector index directory.
+
+    Args:
+        path: The vector index directory.
+        fingerprint: The fingerprint the index must have been built with, if any.
+
+    Returns:
+        The BM25 index, or None if it was not built or is outdated.
+    """
+    file = f"{path}/{BM25_FILE}"
+    if not os.path.exists(file):
+        return None
+    index = BM25Index.load(file)
+    if fingerprint is not None and index.fingerprint != fingerprint:
+        return None
+    return index
@@ -0,0 +1,120 @@
+"""Chroma vector store with vectorized maximal marginal relevance search."""
+
+from typing import Any, Sequence
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_community.vectorstores.chroma import _results_to_docs
+from langchain_core.documents import Document
+
+from ragbot.retrieval import DEFAULT_FETCH_K, DEFAULT_LAMBDA_MULT
+from ragbot.retrieval.mmr import maximal_marginal_relevance
+from ragbot.utils.instrumentation import timed
+
+
+class ChromaStore(Chroma):
+    """Chroma vector store selecting MMR results with `maximal_marginal_relevance`.
+
+    The candidates are fetched as in `Chroma`, and the same chunks are
+    returned in the same order, without recomputing candidate similarities at
+    each selection step. Chunks can also be loaded by ID with `get_by_ids`.
+    Query embedding and vector search are timed as local stages.
+    """
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        """Load chunks by ID, skipping unknown IDs."""
+        if not ids:
+            return []
+        stored = self.get(ids=list(ids), include=["documents", "metadatas"])
+        return [
+            Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+            for chunk_id, text, metadata in zip(
+                stored["ids"], stored["documents"], stored["metadatas"]
+            )
+        ]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, str] | None = None,
+        where_document: dict[str, str] | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Return the chunks most similar to a query, with their distance."""
+        if self._embedding_function is None:
+            return super().similarity_search_with_score(
+                query, k, filter=filter, where_document=where_document, **kwargs
+            )
+        with timed("query_embedding"):
+            embedding = self._embedding_function.embed_query(query)
+        with timed("vector_search"):
+            return self.similarity_search_by_vector_with_relevance_scores(
+                embedding, k, filter=filter, where_document=where_document, **kwargs
+            )
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = DEFAULT_FETCH_K,
+        lambda_mult: float = DEFAULT_LAMBDA_MULT,
+        filter: dict[str, str] | None = None,
+        where_document: dict[str, str] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Return chunks similar to a query and diverse among themselves."""
+        if self._embedding_function is None:
+            raise ValueError("MMR search needs an embedding function")
+        with timed("query_embedding"):
+            embedding = self._embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(
+            embedding,
+            k,
+            fetch_k,
+            lambda_mult=lambda_mult,
+            filter=filter,
+            where_document=where_document,
+        )
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        fetch_k: int = DEFAULT_FETCH_K,
+        lambda_mult: float = DEFAULT_LAMBDA_MULT,
+        filter: dict[str, str] | None = None,
+        where_document: dict[str, str] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Return chunks similar to an embedding and diverse among themselves.
+
+        Args:
+            embedding: The embedding of the query.
+            k: Number of chunks to return.
+            fetch_k: Number of most similar chunks the selection is made from.
+            lambda_mult: Trade-off between relevance, at 1, and diversity, at 0.
+            filter: Filter by metadata.
+            where_document: Filter by chunk content.
+
+        Returns:
+            The selected chunks, in order of similarity to the query.
+        """
+        with timed("vector_search"):
+            results = self._collection.query(
+                query_embeddings=[embedding],
+                n_results=fetch_k,
+                where=filter,
+                where_document=where_document,
+                include=["metadatas", "documents", "distances", "embeddings"],
+                **kwargs,
+            )
+            selected = set(
+                maximal_marginal_relevance(
+                    np.array(embedding, dtype=np.float32),
+                    results["embeddings"][0],
+                    k=k,
+                    lambda_mult=lambda_mult,
+                )
+            )
+        return [doc for i, doc in enumerate(_results_to_docs(results)) if i in selected]
@@ -0,0 +1,162 @@
+"""Single compact file holding the text of every chunk of an index."""
+
+import json
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator
+
+from langchain_core.vectorstores import VectorStore
+
+CHUNK_FILE = "chunks.bin"
+# Number of chunks read from the vector store at a time when exporting
+EXPORT_PAGE_SIZE = 1000
+FOOTER = struct.Struct("<Q")
+
+
+class ChunkFile:
+    """Read-only, memory-mapped file of chunk texts, looked up by chunk ID.
+
+    The file holds the UTF-8 texts back to back, followed by a JSON table of
+    the ID, offset and length of each text, and by the offset of that table.
+    Opening the file only reads the table, and texts are sliced from the
+    memory map, so processes reading the same file share its pages.
+
+    Attributes:
+        path (str): Path to the file.
+        fingerprint (str): The fingerprint of the index the chunks were exported from.
+    """
+
+    def __init__(self, path: str):
+        """Opens a chunk file.
+
+        Args:
+            path: Path to the file.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (table_offset,) = FOOTER.unpack(self._map[-FOOTER.size :])
+        table = json.loads(self._map[table_offset : -FOOTER.size])
+        self.fingerprint = table["fingerprint"]
+        self._positions = {
+            chunk_id: (offset, length)
+            for chunk_id, offset, length in zip(
+                table["ids"], table["offsets"], table["lengths"]
+            )
+        }
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._positions
+
+    def text(self, chunk_id: str) -> str:
+        """Read the text of a chunk.
+
+        Args:
+            chunk_id: The chunk ID.
+
+        Returns:
+            The chunk text.
+
+        Raises:
+            KeyError: If the file has no chunk with this ID.
+        """
+        offset, length = self._positions[chunk_id]
+        return self._map[offset : offset + length].decode("utf-8")
+
+    @staticmethod
+    def write(path: str, chunks: Iterable[tuple[str, str]], fingerprint: str):
+        """Write chunk texts to a file, replacing it once complete.
+
+        Args:
+            path: Path to the file.
+            chunks: The ID and text of each chunk.
+            fingerprint: The fingerprint of the index the chunks belong to.
+        """
+        ids, offsets, lengths = [], [], []
+        offset = 0
+        with open(f"{path}.tmp", "wb") as f:
+            for chunk_id, text in chunks:
+                data = text.encode("utf-8")
+                f.write(data)
+                ids.append(chunk_id)
+                offsets.append(offset)
+                lengths.append(len(data))
+                offset += len(data)
+            table = {
+                "fingerprint": fingerprint,
+                "ids": ids,
+                "offsets": offsets,
+                "lengths": lengths,
+            }
+            f.write(json.dumps(table).encode("utf-8"))
+            f.write(FOOTER.pack(offset))
+        os.replace(f"{path}.tmp", path)
+
+
+def iter_stored_pages(vectorstore: VectorStore, include: list[str]) -> Iterator[dict]:
+    """Read the chunks of a Chroma index a page of `EXPORT_PAGE_SIZE` at a time.
+
+    Args:
+        vectorstore: The Chroma index.
+        include: The fields read, as in `Chroma.get`.
+
+    Yields:
+        The non-empty pages, with the `ids` and the included fields of their chunks.
+    """
+    offset = 0
+    while True:
+        page = vectorstore.get(include=include, limit=EXPORT_PAGE_SIZE, offset=offset)
+        if len(page["ids"]):
+            yield page
+        if len(page["ids"]) < EXPORT_PAGE_SIZE:
+            return
+        offset += EXPORT_PAGE_SIZE
+
+
+def iter_stored_chunks(vectorstore: VectorStore) -> Iterator[tuple[str, str]]:
+    """Read the ID and text of every chunk of a Chroma index, a page at a time."""
+    for page in iter_stored_pages(vectorstore, ["documents"]):
+        yield from zip(page["ids"], page["documents"])
+
+
+def load_chunk_file(path: str, fingerprint: str | None = None) -> ChunkFile | None:
+    """Open the chunk file of an index directory.
+
+    Args:
+        path: The index directory.
+        fingerprint: The fingerprint the file must have been exported with, if any.
+
+    Returns:
+        The chunk file, or None if it was not exported or is outdated.
+    """
+    file = f"{path}/{CHUNK_FILE}"
+    if not os.path.exists(file):
+        return None
+    chunks = ChunkFile(file)
+    if fingerprint is not None and chunks.fingerprint != fingerprint:
+        return None
+    return chunks
+
+
+def export_chunks(path: str, vectorstore: VectorStore, fingerprint: str) -> ChunkFile:
+    """Write the chunk file of a Chroma index next to it, unless it is up to date.
+
+    Args:
+        path: The index directory.
+        vectorstore: The Chroma index.
+        fingerprint: The fingerprint of the index.
+
+    Returns:
+        The chunk file.
+    """
+    chunks = load_chunk_file(path, fingerprint)
+    if chunks is not None:
+        return chunks
+    ChunkFile.write(
+        f"{path}/{CHUNK_FILE}", iter_stored_chunks(vectorstore), fingerprint
+    )
+    return ChunkFile(f"{path}/{CHUNK_FILE}")
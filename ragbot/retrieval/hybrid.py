@@ -0,0 +1,90 @@
+"""Hybrid lexical and dense retrieval with reciprocal rank fusion."""
+
+from typing import Hashable
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from ragbot.retrieval.bm25 import BM25Index
+
+# Rank offset of reciprocal rank fusion, as in the original paper
+RRF_K = 60
+
+
+def chunk_key(doc: Document) -> tuple:
+    """Identify a chunk by its position in its source file."""
+    return doc.metadata.get("source"), doc.metadata.get("start_index")
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[Hashable]], k: int, rrf_k: int = RRF_K
+) -> list[Hashable]:
+    """Fuse several rankings of chunks into one.
+
+    Each chunk scores `1 / (rrf_k + rank)` in every ranking it appears in, and
+    chunks are sorted by their total score.
+
+    Args:
+        rankings: The rankings to fuse, as lists of chunk keys, best first.
+        k: Number of chunks to return.
+        rrf_k: Rank offset, damping the weight of the first ranks.
+
+    Returns:
+        The keys of the `k` chunks with the highest fused score.
+    """
+    scores: dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever fusing BM25 and vector similarity rankings.
+
+    Keyword-heavy queries, such as product names or error codes, are matched
+    by the lexical ranking even when their embeddings are not close, and
+    paraphrases by the dense ranking.
+
+    Attributes:
+        vectorstore (VectorStore): The vector index.
+        bm25 (BM25Index): The BM25 index of the same chunks.
+        k (int): Number of chunks to return.
+        fetch_k (int): Number of chunks taken from each ranking before fusion.
+        rrf_k (int): Rank offset of reciprocal rank fusion.
+    """
+
+    vectorstore: VectorStore
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = RRF_K
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        dense = {
+            chunk_key(doc): doc
+            for doc in self.vectorstore.similarity_search(query, k=self.fetch_k)
+        }
+        lexical = {
+            self.bm25.key(position): self.bm25.id(position)
+            for position, _ in self.bm25.top_k(query, self.fetch_k)
+        }
+        fused = reciprocal_rank_fusion([list(dense), list(lexical)], self.k, self.rrf_k)
+        # Only the lexical matches that made it through fusion are loaded
+        loaded = {
+            doc.id: doc
+            for doc in self.vectorstore.get_by_ids(
+                [lexical[key] for key in fused if key not in dense]
+            )
+        }
+        return [
+            dense[key] if key in dense else loaded[lexical[key]]
+            for key in fused
+            if key in dense or lexical[key] in loaded
+        ]
@@ -0,0 +1,359 @@
+"""Inverted file (IVF) approximate nearest neighbour index over a NumPy vector store."""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from ragbot.retrieval.numpy_store import NumpyVectorStore, normalize_rows
+
+IVF_FILE = "ivf.npz"
+DEFAULT_NPROBE = 8
+DEFAULT_ITERATIONS = 10
+# Training points per cluster: centroids degrade below about 40, and training
+# time grows linearly with it
+POINTS_PER_CLUSTER = 64
+ASSIGN_BATCH_SIZE = 65536
+# Norm of the noise added to the sampled chunk embeddings of recall queries
+DEFAULT_QUERY_NOISE = 0.5
+
+
+def default_nlist(num_chunks: int) -> int:
+    """Number of clusters for a number of chunks, about `4 * sqrt(num_chunks)`."""
+    return max(1, min(num_chunks, int(4 * np.sqrt(num_chunks))))
+
+
+def resolve_nlist(nlist: int | None, num_chunks: int) -> int:
+    """Number of clusters actually built, at most one per chunk."""
+    return min(nlist or default_nlist(num_chunks), max(num_chunks, 1))
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Find the most similar centroid of each vector, in batches.
+
+    Args:
+        vectors: The normalized vectors, one per row.
+        centroids: The normalized centroids, one per row.
+
+    Returns:
+        The centroid index of each vector.
+    """
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BATCH_SIZE):
+        batch = np.asarray(vectors[start : start + ASSIGN_BATCH_SIZE])
+        labels[start : start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, nlist: int, iterations: int, seed: int = 0
+) -> np.ndarray:
+    """Cluster normalized vectors by cosine similarity.
+
+    The centroids are trained on a sample of `POINTS_PER_CLUSTER * nlist`
+    vectors. Empty clusters are restarted from random vectors of the sample.
+
+    Args:
+        vectors: The normalized vectors, one per row.
+        nlist: Number of clusters.
+        iterations: Number of k-means iterations.
+        seed: Seed of the sampling and initialization.
+
+    Returns:
+        The normalized centroids, one per row.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), POINTS_PER_CLUSTER * nlist)
+    sample = np.asarray(
+        vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    )
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """NumPy vector store searching only the clusters closest to each query.
+
+    The chunks are clustered around `nlist` centroids, and their positions
+    grouped by cluster in inverted lists. A query is compared with the
+    centroids, then exactly with the chunks of its `nprobe` closest clusters,
+    so that it scans about `nprobe / nlist` of the index. Raising `nprobe`
+    trades latency for recall, up to exact search when it equals `nlist`.
+
+    Attributes:
+        centroids (np.ndarray): The normalized centroids, one per row.
+        lists (np.ndarray): Chunk positions, grouped by cluster.
+        offsets (np.ndarray): Start of the positions of each cluster in `lists`,
+            plus the total number of chunks.
+        nprobe (int): Number of clusters searched per query.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        lists: np.ndarray,
+        offsets: np.ndarray,
+        nprobe: int = DEFAULT_NPROBE,
+        **kwargs,
+    ):
+        """Initializes the store.
+
+        Args:
+            centroids: The normalized centroids, one per row.
+            lists: Chunk positions, grouped by cluster.
+            offsets: Start of the positions of each cluster in `lists`, plus
+                the total number of chunks.
+            nprobe: Number of clusters searched per query.
+            **kwargs: Keyword arguments of `NumpyVectorStore`.
+        """
+        super().__init__(**kwargs)
+        self.centroids = centroids
+        self.lists = lists
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        store: NumpyVectorStore,
+        nlist: int | None = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        seed: int = 0,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> "IVFVectorStore":
+        """Cluster the chunks of a NumPy store and save the inverted lists next to it.
+
+        Args:
+            path: The index directory.
+            store: The NumPy store exported from the index.
+            nlist: Number of clusters, by default `default_nlist` of the number of chunks.
+            iterations: Number of k-means iterations.
+            seed: Seed of the clustering.
+            nprobe: Number of clusters searched per query.
+
+        Returns:
+            The IVF store.
+        """
+        nlist = resolve_nlist(nlist, len(store.ids))
+        if len(store.ids):
+            centroids = spherical_kmeans(store.vectors, nlist, iterations, seed)
+            labels = assign(store.vectors, centroids)
+        else:
+            centroids = np.zeros((0, 0), dtype=np.float32)
+            labels = np.zeros(0, dtype=np.int64)
+        lists = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))]
+        ).astype(np.int64)
+        np.savez(
+            f"{path}/{IVF_FILE}",
+            centroids=centroids,
+            lists=lists,
+            offsets=offsets,
+            params=json.dumps(
+                {
+                    "fingerprint": store.fingerprint,
+                    "nlist": nlist,
+                    "iterations": iterations,
+                    "seed": seed,
+                }
+            ),
+        )
+        return cls.from_store(store, centroids, lists, offsets, nprobe)
+
+    @classmethod
+    def from_store(
+        cls,
+        store: NumpyVectorStore,
+        centroids: np.ndarray,
+        lists: np.ndarray,
+        offsets: np.ndarray,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> "IVFVectorStore":
+        """Wrap the vectors of a NumPy store with inverted lists."""
+        return cls(
+            centroids=centroids,
+            lists=lists,
+            offsets=offsets,
+            nprobe=nprobe,
+            vectors=store.vectors,
+            ids=store.ids,
+            metadatas=store.metadatas,
+            embeddings=store.embeddings,
+            chunks=store.chunks,
+            fingerprint=store.fingerprint,
+        )
+
+    @classmethod
+    def open(
+        cls,
+        path: str,
+        store: NumpyVectorStore,
+        nlist: int | None = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        seed: int = 0,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> "IVFVectorStore":
+        """Load the inverted lists of a NumPy store, building them if outdated.
+
+        Args:
+            path: The index directory.
+            store: The NumPy store exported from the index.
+            nlist: Number of clusters, by default `default_nlist` of the number of chunks.
+            iterations: Number of k-means iterations.
+            seed: Seed of the clustering.
+            nprobe: Number of clusters searched per query.
+
+        Returns:
+            The IVF store.
+        """
+        file = f"{path}/{IVF_FILE}"
+        if os.path.exists(file):
+            with np.load(file) as arrays:
+                params = json.loads(str(arrays["params"]))
+                expected = {
+                    "fingerprint": store.fingerprint,
+                    "nlist": resolve_nlist(nlist, len(store.ids)),
+                    "iterations": iterations,
+                    "seed": seed,
+                }
+                if params == expected:
+                    return cls.from_store(
+                        store,
+                        arrays["centroids"],
+                        arrays["lists"],
+                        arrays["offsets"],
+                        nprobe,
+                    )
+        return cls.build(path, store, nlist, iterations, seed, nprobe)
+
+    def _top_k(self, embedding: list[float], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Find the rows most similar to an embedding in the closest clusters."""
+        if len(self.ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = normalize_rows(embedding)
+        nprobe = min(self.nprobe, len(self.centroids))
+        probed = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate(
+            [self.lists[self.offsets[c] : self.offsets[c + 1]] for c in probed]
+        )
+        # Rows are read in file order, which is friendlier to the memory map
+        candidates = np.sort(candidates)
+        scores = self.vectors[candidates] @ query
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return candidates[best], scores[best]
+
+
+def recall_report(
+    path: str,
+    store: NumpyVectorStore,
+    nprobes: list[int],
+    k: int = 4,
+    num_queries: int = 200,
+    nlist: int | None = None,
+    iterations: int = DEFAULT_ITERATIONS,
+    seed: int = 0,
+    queries: np.ndarray | None = None,
+    noise: float = DEFAULT_QUERY_NOISE,
+) -> dict:
+    """Measure the recall and latency of IVF search against exact search.
+
+    Queries must not be indexed vectors, whose exact match always lies in the
+    nearest cluster, which would overstate the recall. Without `queries`, each
+    query is the embedding of a chunk sampled from the store, moved by random
+    noise of norm `noise`, so that the report reflects the distribution of the
+    project's own chunks. The sampled chunk is also left out of both the
+    exact and the IVF results.
+
+    Args:
+        path: The index directory, where the IVF index is loaded or built.
+        store: The NumPy store exported from the index.
+        nprobes: The numbers of clusters searched per query to compare.
+        k: Number of chunks retrieved per query.
+        num_queries: Number of sampled queries.
+        nlist: Number of clusters, by default `default_nlist` of the number of chunks.
+        iterations: Number of k-means iterations.
+        seed: Seed of the clustering and of the query sample.
+        queries: Held-out query embeddings, such as embedded dataset questions,
+            searched instead of the perturbed chunks.
+        noise: Norm of the noise added to the unit-length chunk embeddings.
+
+    Returns:
+        The `num_chunks`, `nlist` and `build_seconds` (or load time) of the index,
+        the `query_source` ("dataset" or "perturbed chunks"), the `exact`
+        latency, and one row per `nprobe` with its `recall`, mean and p95
+        latency in milliseconds, and `speedup` over exact search.
+    """
+    start = time.perf_counter()
+    ivf = IVFVectorStore.open(path, store, nlist, iterations, seed)
+    build_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    if queries is not None:
+        query_source = "dataset"
+        queries = normalize_rows(queries)[:num_queries]
+        sources = [None] * len(queries)
+    else:
+        query_source = "perturbed chunks"
+        sample = np.sort(
+            rng.choice(len(store.ids), min(num_queries, len(store.ids)), replace=False)
+        )
+        perturbation = normalize_rows(
+            rng.standard_normal((len(sample), store.vectors.shape[1]))
+        )
+        queries = normalize_rows(store.vectors[sample] + noise * perturbation)
+        sources = sample.tolist()
+
+    def measure(search) -> tuple[list[set], np.ndarray]:
+        results, latencies = [], []
+        for query, source in zip(queries, sources):
+            start = time.perf_counter()
+            best, _ = search(query, k + 1)
+            latencies.append(time.perf_counter() - start)
+            results.append(set([row for row in best.tolist() if row != source][:k]))
+        return results, np.asarray(latencies) * 1000
+
+    exact, exact_latencies = measure(store._top_k)
+    rows = []
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        found, latencies = measure(ivf._top_k)
+        recall = np.mean(
+            [len(f & e) / len(e) if e else 1.0 for f, e in zip(found, exact)]
+        )
+        rows.append(
+            {
+                "nprobe": nprobe,
+                "recall": float(recall),
+                "mean_ms": float(latencies.mean()),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "speedup": float(exact_latencies.mean() / latencies.mean()),
+            }
+        )
+    return {
+        "num_chunks": len(store.ids),
+        "nlist": len(ivf.centroids),
+        "k": k,
+        "num_queries": len(queries),
+        "query_source": query_source,
+        "build_seconds": build_seconds,
+        "exact": {
+            "mean_ms": float(exact_latencies.mean()),
+            "p95_ms": float(np.percentile(exact_latencies, 95)),
+        },
+        "nprobe": rows,
+    }
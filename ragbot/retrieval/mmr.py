@@ -0,0 +1,59 @@
+"""Maximal marginal relevance (MMR) selection with vectorized NumPy updates."""
+
+import numpy as np
+
+from ragbot.retrieval import DEFAULT_FETCH_K, DEFAULT_LAMBDA_MULT
+
+
+def unit_rows(matrix: list | np.ndarray) -> np.ndarray:
+    """Scale the rows of a float32 matrix to unit length, leaving zero rows as is."""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def maximal_marginal_relevance(
+    query_embedding: np.ndarray,
+    embedding_list: list | np.ndarray,
+    lambda_mult: float = DEFAULT_LAMBDA_MULT,
+    k: int = 4,
+) -> list[int]:
+    """Select candidates similar to a query and diverse among themselves.
+
+    Makes the same greedy selection as
+    `langchain_core.vectorstores.utils.maximal_marginal_relevance`. The first
+    pick is the candidate most similar to the query. Each next pick maximizes
+    `lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))`.
+    The candidate similarity matrix is computed once. Each pick then updates
+    the running maximum similarity to the selected candidates with one
+    vectorized `np.maximum`, instead of recomputing the similarities of every
+    candidate to every selected one. Each pick costs O(fetch_k).
+
+    Args:
+        query_embedding: The embedding of the query.
+        embedding_list: The embeddings of the candidates, one per row.
+        lambda_mult: Trade-off between relevance, at 1, and diversity, at 0.
+        k: Number of candidates to select.
+
+    Returns:
+        The indices of the selected candidates, in selection order.
+    """
+    k = min(k, len(embedding_list))
+    if k <= 0:
+        return []
+    candidates = unit_rows(embedding_list)
+    relevance = candidates @ unit_rows(query_embedding)[0]
+    similarity = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
@@ -0,0 +1,303 @@
+"""Read-only vector store searching a memory-mapped NumPy matrix of embeddings."""
+
+import json
+import os
+from typing import Any, Callable, Iterable, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ragbot.retrieval import DEFAULT_FETCH_K, DEFAULT_LAMBDA_MULT
+from ragbot.retrieval.chunk_file import (
+    ChunkFile,
+    export_chunks,
+    iter_stored_pages,
+    load_chunk_file,
+)
+from ragbot.retrieval.mmr import maximal_marginal_relevance
+from ragbot.utils.instrumentation import timed
+
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "vectors.json"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale the rows of a matrix to unit length.
+
+    Args:
+        matrix: The vectors, one per row.
+
+    Returns:
+        A float32 matrix whose row dot products are cosine similarities.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class NumpyVectorStore(VectorStore):
+    """Vector store keeping normalized embeddings in one contiguous float32 matrix.
+
+    The matrix is memory-mapped from a `.npy` file, so opening the store only
+    maps the file, and the processes serving the same index share its pages
+    through the OS page cache. A query is answered with a single matrix-vector
+    product and `argpartition`, and only the texts of the returned chunks are
+    read from the memory-mapped chunk file. The store is read-only: it is
+    exported from the Chroma index by `export`, which keeps handling
+    incremental updates.
+
+    Attributes:
+        vectors (np.ndarray): The normalized embeddings, one row per chunk.
+        ids (list[str]): The ID of each chunk.
+        metadatas (list[dict]): The metadata of each chunk.
+        chunks (ChunkFile): The text of each chunk.
+        fingerprint (str): The fingerprint of the index the store was exported from.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: list[str],
+        metadatas: list[dict],
+        embeddings: Embeddings,
+        chunks: ChunkFile,
+        fingerprint: str = "",
+    ):
+        """Initializes the store.
+
+        Args:
+            vectors: The normalized embeddings, one row per chunk.
+            ids: The ID of each chunk.
+            metadatas: The metadata of each chunk.
+            embeddings: The embeddings model used to embed queries.
+            chunks: The text of each chunk.
+            fingerprint: The fingerprint of the index the store was exported from.
+        """
+        self.vectors = vectors
+        self.ids = ids
+        self.metadatas = metadatas
+        self._embeddings = embeddings
+        self.chunks = chunks
+        self._positions: dict[str, int] | None = None
+        self.fingerprint = fingerprint
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    @classmethod
+    def export(
+        cls, path: str, vectorstore: VectorStore, fingerprint: str
+    ) -> "NumpyVectorStore":
+        """Write the embeddings and chunk file of a Chroma index as a NumPy store next to it.
+
+        Embeddings are read a page at a time into a memory-mapped temporary
+        file, so the export does not hold the corpus in memory. The files are
+        then moved over the previous export, so processes that memory-mapped it
+        keep reading the old files until they reopen the store.
+
+        Args:
+            path: The index directory.
+            vectorstore: The Chroma index.
+            fingerprint: The fingerprint of the index.
+
+        Returns:
+            The memory-mapped store.
+
+        Raises:
+            RuntimeError: If the index changed while it was exported.
+        """
+        export_chunks(path, vectorstore, fingerprint)
+        count = vectorstore._collection.count()
+        ids, metadatas = [], []
+        vectors = None
+        for page in iter_stored_pages(vectorstore, ["embeddings", "metadatas"]):
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(
+                    f"{path}/{VECTORS_FILE}.tmp",
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(count, len(page["embeddings"][0])),
+                )
+            vectors[len(ids) : len(ids) + len(page["ids"])] = normalize_rows(
+                page["embeddings"]
+            )
+            ids += page["ids"]
+            metadatas += [metadata or {} for metadata in page["metadatas"]]
+        if len(ids) != count:
+            raise RuntimeError(f"Index at {path} changed while it was exported")
+        if vectors is None:
+            with open(f"{path}/{VECTORS_FILE}.tmp", "wb") as f:
+                np.save(f, np.zeros((0, 0), dtype=np.float32))
+        else:
+            vectors.flush()
+            del vectors
+
+        with open(f"{path}/{CHUNKS_FILE}.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {"fingerprint": fingerprint, "ids": ids, "metadatas": metadatas}, f
+            )
+        os.replace(f"{path}/{VECTORS_FILE}.tmp", f"{path}/{VECTORS_FILE}")
+        os.replace(f"{path}/{CHUNKS_FILE}.tmp", f"{path}/{CHUNKS_FILE}")
+        return cls.load(path, vectorstore.embeddings)
+
+    @classmethod
+    def load(cls, path: str, embeddings: Embeddings) -> "NumpyVectorStore | None":
+        """Memory-map the NumPy store of an index directory.
+
+        Args:
+            path: The index directory.
+            embeddings: The embeddings model used to embed queries.
+
+        Returns:
+            The store, or None if it was not exported, or only partially.
+        """
+        if not os.path.exists(f"{path}/{CHUNKS_FILE}"):
+            return None
+        with open(f"{path}/{CHUNKS_FILE}", "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        texts = load_chunk_file(path, chunks["fingerprint"])
+        if texts is None:
+            return None
+        vectors = np.load(f"{path}/{VECTORS_FILE}", mmap_mode="r")
+        # A matrix and an ID list from different exports do not match
+        if len(vectors) != len(chunks["ids"]):
+            return None
+        return cls(
+            vectors=vectors,
+            ids=chunks["ids"],
+            metadatas=chunks["metadatas"],
+            embeddings=embeddings,
+            chunks=texts,
+            fingerprint=chunks["fingerprint"],
+        )
+
+    def _document(self, position: int) -> Document:
+        """Load the chunk at a row of the matrix."""
+        chunk_id = self.ids[position]
+        return Document(
+            page_content=self.chunks.text(chunk_id),
+            metadata=dict(self.metadatas[position]),
+            id=chunk_id,
+        )
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        """Load chunks by ID, skipping unknown IDs."""
+        # Built on first use, since only hybrid search looks chunks up by ID
+        if self._positions is None:
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        return [
+            self._document(self._positions[chunk_id])
+            for chunk_id in ids
+            if chunk_id in self._positions
+        ]
+
+    def _top_k(self, embedding: list[float], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Find the rows most similar to an embedding, best first."""
+        if len(self.ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self.vectors @ normalize_rows(embedding)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return best, scores[best]
+
+    def _search(self, embedding: list[float], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Find the rows most similar to an embedding, timed as the "vector_search" stage."""
+        with timed("vector_search"):
+            return self._top_k(embedding, k)
+
+    def _embed_query(self, query: str) -> list[float]:
+        """Embed a query, timed as the "query_embedding" stage."""
+        with timed("query_embedding"):
+            return self._embeddings.embed_query(query)
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        """Return the chunks most similar to an embedding, with their cosine similarity."""
+        best, scores = self._search(embedding, k)
+        return [(self._document(i), float(s)) for i, s in zip(best, scores)]
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        """Return the chunks most similar to an embedding."""
+        best, _ = self._search(embedding, k)
+        return [self._document(i) for i in best]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        """Return the chunks most similar to a query, with their cosine similarity."""
+        return self.similarity_search_with_score_by_vector(self._embed_query(query), k)
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        """Return the chunks most similar to a query."""
+        return self.similarity_search_by_vector(self._embed_query(query), k)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        fetch_k: int = DEFAULT_FETCH_K,
+        lambda_mult: float = DEFAULT_LAMBDA_MULT,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Return chunks similar to an embedding and diverse among themselves.
+
+        The selected chunks are returned in order of similarity to the query,
+        as by `ChromaStore`.
+        """
+        with timed("vector_search"):
+            best, _ = self._top_k(embedding, fetch_k)
+            selected = maximal_marginal_relevance(
+                np.asarray(embedding, dtype=np.float32),
+                self.vectors[best],
+                k=k,
+                lambda_mult=lambda_mult,
+            )
+        return [self._document(best[i]) for i in sorted(selected)]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = DEFAULT_FETCH_K,
+        lambda_mult: float = DEFAULT_LAMBDA_MULT,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Return chunks similar to a query and diverse among themselves."""
+        return self.max_marginal_relevance_search_by_vector(
+            self._embed_query(query), k, fetch_k, lambda_mult
+        )
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        raise NotImplementedError(
+            "NumpyVectorStore is read-only, update the index with `update_index`"
+        )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        raise NotImplementedError(
+            "NumpyVectorStore is read-only, export it from an index with `export`"
+        )
@@ -0,0 +1,150 @@
+"""Assembly of the retrieved chunks into a compact, token-budgeted context."""
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from ragbot.utils.instrumentation import timed
+from ragbot.utils.rate_limit import estimate_tokens
+
+
+def uncovered(start: int, end: int, spans: list[tuple[int, int]]) -> int:
+    """Count the characters of `[start, end)` outside a list of spans.
+
+    Args:
+        start: Start of the span.
+        end: End of the span, excluded.
+        spans: Disjoint spans, sorted by start.
+
+    Returns:
+        The number of characters of the span not covered by `spans`.
+    """
+    covered = sum(
+        max(0, min(end, other_end) - max(start, other_start))
+        for other_start, other_end in spans
+    )
+    return end - start - covered
+
+
+def add_span(spans: list[tuple[int, int]], start: int, end: int):
+    """Add a span to a sorted list of disjoint spans, merging the touching ones."""
+    merged = [(start, end)]
+    for other_start, other_end in spans:
+        if other_end < start or other_start > end:
+            merged.append((other_start, other_end))
+        else:
+            merged[0] = (min(merged[0][0], other_start), max(merged[0][1], other_end))
+    spans[:] = sorted(merged)
+
+
+def merge_chunks(chunks: list[tuple[int, Document]]) -> list[tuple[int, Document]]:
+    """Merge the overlapping or adjacent chunks of one source file.
+
+    Chunk texts are spans of their file starting at their `start_index`, so
+    the text shared by overlapping chunks is identical and is kept only once.
+
+    Args:
+        chunks: The relevance rank and the chunk of each selected chunk.
+
+    Returns:
+        The rank of its best chunk and the merged document of each run of
+        overlapping chunks, with the metadata of the best chunk and the
+        `start_index` of the run.
+    """
+    chunks = sorted(chunks, key=lambda chunk: chunk[1].metadata["start_index"])
+    merged = []
+    for rank, doc in chunks:
+        start = doc.metadata["start_index"]
+        if merged:
+            best, text, run_start, run_metadata = merged[-1]
+            run_end = run_start + len(text)
+            if start <= run_end:
+                text += doc.page_content[run_end - start :]
+                if rank < best:
+                    best, run_metadata = rank, doc.metadata
+                merged[-1] = (best, text, run_start, run_metadata)
+                continue
+        merged.append((rank, doc.page_content, start, doc.metadata))
+    return [
+        (rank, Document(page_content=text, metadata={**metadata, "start_index": start}))
+        for rank, text, start, metadata in merged
+    ]
+
+
+def pack_context(docs: list[Document], max_tokens: int | None = None) -> list[Document]:
+    """Deduplicate, merge and pack retrieved chunks under a token budget.
+
+    Chunks are taken in relevance order. A chunk whose text is already in the
+    context, because it overlaps the selected chunks of its file or repeats
+    another chunk, only costs its new characters, and is dropped if it adds
+    none. A chunk whose new characters do not fit in the remaining budget is
+    skipped, so that later, smaller chunks can still fill it. The selected
+    chunks of each file are then merged into contiguous passages, ordered by
+    the relevance of their best chunk.
+
+    Args:
+        docs: The retrieved chunks, most relevant first, with their `source`
+            and `start_index` metadata.
+        max_tokens: The budget of the context, in estimated tokens. No limit
+            if None.
+
+    Returns:
+        The packed passages, most relevant first.
+    """
+    spans: dict[str, list[tuple[int, int]]] = {}
+    texts: set[str] = set()
+    positioned: dict[str, list[tuple[int, Document]]] = {}
+    packed: list[tuple[int, Document]] = []
+    used = 0
+    for rank, doc in enumerate(docs):
+        if doc.page_content in texts:
+            continue
+        source = doc.metadata.get("source")
+        start = doc.metadata.get("start_index")
+        # Without a position, only exact repetitions can be detected
+        new = len(doc.page_content)
+        if start is not None:
+            new = uncovered(start, start + new, spans.get(source, []))
+            if new == 0:
+                continue
+        cost = estimate_tokens(doc.page_content[:new])
+        if max_tokens is not None and used + cost > max_tokens:
+            continue
+        used += cost
+        texts.add(doc.page_content)
+        if start is None:
+            packed.append((rank, doc))
+        else:
+            add_span(spans.setdefault(source, []), start, start + len(doc.page_content))
+            positioned.setdefault(source, []).append((rank, doc))
+
+    for chunks in positioned.values():
+        packed += merge_chunks(chunks)
+    return [doc for _, doc in sorted(packed, key=lambda passage: passage[0])]
+
+
+class PackedRetriever(BaseRetriever):
+    """Retriever packing the chunks of another retriever with `pack_context`.
+
+    Overlapping chunks of the same file are merged and repeated text is
+    dropped, so that the prompt holds the same retrieved text in fewer tokens,
+    within an optional token budget.
+
+    Attributes:
+        retriever (BaseRetriever): The retriever of the chunks.
+        max_tokens (int | None): The budget of the context, in estimated tokens.
+    """
+
+    retriever: BaseRetriever
+    max_tokens: int | None = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        docs = self.retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        with timed("context_packing"):
+            return pack_context(docs, self.max_tokens)
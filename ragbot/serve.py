@@ -0,0 +1,407 @@
+"""Asynchronous HTTP server exposing a RAG chain to many concurrent chat sessions."""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http import HTTPStatus
+
+from langchain_core.runnables import Runnable
+
+from ragbot.answer_cache import CachedChain
+from ragbot.rag import setup_from_config
+from ragbot.utils.clients import client_stats
+from ragbot.utils.instrumentation import prometheus_text
+from ragbot.utils.rate_limit import (
+    RateLimiter,
+    configure_rate_limits,
+    estimate_tokens,
+    get_rate_limiter,
+    is_throttling_error,
+)
+from ragbot.utils.utils import load_config
+
+MAX_BODY_SIZE = 1024 * 1024
+# Messages kept per session, as many as the chat prompt uses
+MAX_HISTORY = 10
+
+
+@dataclass
+class Session:
+    """History of a chat session.
+
+    Attributes:
+        history (list): The (role, message) pairs of the previous turns.
+        lock (asyncio.Lock): Serializes the turns of the session.
+    """
+
+    history: list = field(default_factory=list)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class HTTPError(Exception):
+    """Error answered to the client with an HTTP status code."""
+
+    def __init__(self, status: HTTPStatus, message: str, headers: dict | None = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class ChatServer:
+    """HTTP server answering chat turns with a shared RAG chain.
+
+    Every session uses the same chain, hence the same loaded index and model
+    client, and only keeps its own history. At most `max_concurrency` turns
+    run at the same time, and up to `max_queue` more wait for a slot. Further
+    requests, and requests throttled by the provider, are answered with
+    `503 Service Unavailable` and a `Retry-After` header, so that clients back
+    off instead of piling up while the provider is saturated. Sessions are only
+    created or refreshed by admitted turns, and the turns of a session run one
+    at a time, in their slots.
+
+    Endpoints:
+        POST /chat: Answers `{"input": ..., "session": ..., "stream": ...}`. A new
+            session is created when `session` is missing or unknown. The reply is
+            a JSON object with the `session`, the `answer` and its `sources`, or
+            the answer streamed as chunked plain text with the session in the
+            `X-Session-Id` header.
+        DELETE /chat/<session>: Forgets a session.
+        GET /health: Reports the number of sessions, of running and waiting
+            turns, the answer cache stats and the reuse of model clients.
+        GET /metrics: Reports the latency histograms of the pipeline stages in
+            the Prometheus text format.
+
+    Attributes:
+        chain (Runnable): The RAG chain.
+        limiter (RateLimiter | None): The rate limiter of the chain's LLM provider.
+        extra_tokens (int): Tokens added to each request by the retrieved context.
+        max_concurrency (int): Maximum number of turns running at the same time.
+        max_queue (int): Maximum number of turns waiting for a slot.
+        max_sessions (int): Maximum number of sessions kept, the least recently
+            used ones being forgotten first.
+    """
+
+    def __init__(
+        self,
+        chain: Runnable,
+        limiter: RateLimiter | None = None,
+        extra_tokens: int = 0,
+        max_concurrency: int = 32,
+        max_queue: int = 256,
+        max_sessions: int = 10000,
+    ):
+        """Initializes the server.
+
+        Args:
+            chain: The RAG chain.
+            limiter: The rate limiter of the chain's LLM provider, if any.
+            extra_tokens: Tokens added to each request by the retrieved context.
+            max_concurrency: Maximum number of turns running at the same time.
+            max_queue: Maximum number of turns waiting for a slot.
+            max_sessions: Maximum number of sessions kept.
+        """
+        self.chain = chain
+        self.limiter = limiter
+        self.extra_tokens = extra_tokens
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_sessions = max_sessions
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+        self.running = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def session(self, session_id: str | None) -> tuple[str, Session]:
+        """Return a session, creating it if it does not exist."""
+        if session_id not in self.sessions:
+            session_id = session_id or uuid.uuid4().hex
+            self.sessions[session_id] = Session()
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session_id)
+        return session_id, self.sessions[session_id]
+
+    async def acquire(self, query: str):
+        """Wait for a turn slot and for the provider's budget.
+
+        Raises:
+            HTTPError: If the queue of waiting turns is full.
+        """
+        if self.waiting >= self.max_queue:
+            raise HTTPError(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "Server is saturated, retry later",
+                {"Retry-After": "1"},
+            )
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        if self.limiter is not None:
+            try:
+                await self.limiter.aacquire(estimate_tokens(query) + self.extra_tokens)
+            except BaseException:
+                self.release()
+                raise
+
+    def release(self):
+        """Free a turn slot."""
+        self.running -= 1
+        self._slots.release()
+
+    def throttled(self, error: Exception) -> HTTPError:
+        """Convert a provider error into the HTTP error answered to the client."""
+        if not is_throttling_error(error):
+            return HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, str(error))
+        if self.limiter is not None:
+            self.limiter.on_throttle()
+        return HTTPError(
+            HTTPStatus.SERVICE_UNAVAILABLE,
+            "Provider is throttling requests, retry later",
+            {"Retry-After": "5"},
+        )
+
+    async def chat(self, writer: asyncio.StreamWriter, request: dict):
+        """Answer a chat turn, streamed or as a whole."""
+        query = request.get("input")
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing input")
+        # Only admitted turns create sessions or make them recent, so that
+        # rejected requests never evict the sessions in use
+        await self.acquire(query)
+        try:
+            session_id, session = self.session(request.get("session"))
+            async with session.lock:
+                inputs = {"history": list(session.history), "input": query}
+                if request.get("stream"):
+                    answer = await self.stream(writer, session_id, inputs)
+                else:
+                    try:
+                        response = await self.chain.ainvoke(inputs)
+                    except Exception as e:
+                        raise self.throttled(e) from e
+                    answer = response["answer"]
+                    await respond(
+                        writer,
+                        HTTPStatus.OK,
+                        {
+                            "session": session_id,
+                            "answer": answer,
+                            "sources": sources(response.get("context", [])),
+                        },
+                    )
+                if self.limiter is not None:
+                    self.limiter.on_success()
+                session.history.extend([("human", query), ("ai", answer)])
+                del session.history[:-MAX_HISTORY]
+        finally:
+            self.release()
+
+    async def stream(
+        self, writer: asyncio.StreamWriter, session_id: str, inputs: dict
+    ) -> str:
+        """Stream an answer as chunked plain text, returning the whole answer."""
+        chunks = aiter(self.chain.astream(inputs))
+        answer = ""
+        try:
+            # Wait for the first piece of the answer before committing to a status
+            chunk = await anext(chunks, None)
+            while chunk is not None and not chunk.get("answer"):
+                chunk = await anext(chunks, None)
+        except Exception as e:
+            raise self.throttled(e) from e
+
+        writer.write(
+            head(
+                HTTPStatus.OK,
+                {
+                    "Content-Type": "text/plain; charset=utf-8",
+                    "Transfer-Encoding": "chunked",
+                    "X-Session-Id": session_id,
+                },
+            )
+        )
+        try:
+            while chunk is not None:
+                if chunk.get("answer"):
+                    answer += chunk["answer"]
+                    data = chunk["answer"].encode("utf-8")
+                    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    await writer.drain()
+                chunk = await anext(chunks, None)
+        except Exception as e:
+            # The status was already sent, so the truncated body signals the error
+            raise ConnectionAbortedError(str(e)) from e
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return answer
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one HTTP request and close the connection."""
+        try:
+            method, path, body = await read_request(reader)
+            if method == "POST" and path == "/chat":
+                try:
+                    request = json.loads(body or b"{}")
+                except json.JSONDecodeError:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid JSON body")
+                await self.chat(writer, request)
+            elif method == "DELETE" and path.startswith("/chat/"):
+                self.sessions.pop(path.removeprefix("/chat/"), None)
+                await respond(writer, HTTPStatus.NO_CONTENT)
+            elif method == "GET" and path == "/health":
+                health = {
+                    "status": "ok",
+                    "sessions": len(self.sessions),
+                    "running": self.running,
+                    "waiting": self.waiting,
+                    "clients": client_stats(),
+                }
+                if isinstance(self.chain, CachedChain):
+                    health["answer_cache"] = self.chain.cache.stats()
+                await respond(writer, HTTPStatus.OK, health)
+            elif method == "GET" and path == "/metrics":
+                body = prometheus_text().encode("utf-8")
+                headers = {
+                    "Content-Type": "text/plain; version=0.0.4",
+                    "Content-Length": len(body),
+                }
+                writer.write(head(HTTPStatus.OK, headers) + body)
+                await writer.drain()
+            else:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+        except HTTPError as e:
+            await respond(writer, e.status, {"error": str(e)}, e.headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await respond(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def serve_forever(self, host: str, port: int):
+        """Accept connections until the process is interrupted.
+
+        Args:
+            host: The interface to listen on.
+            port: The port to listen on.
+        """
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"Serving on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def sources(context: list) -> list[dict]:
+    """Describe the retrieved documents of an answer, with their near-duplicates."""
+    return [
+        {
+            "source": doc.metadata.get("source"),
+            "start_index": doc.metadata.get("start_index"),
+            **(
+                {"duplicates": json.loads(doc.metadata["duplicates"])}
+                if "duplicates" in doc.metadata
+                else {}
+            ),
+        }
+        for doc in context
+    ]
+
+
+def head(status: HTTPStatus, headers: dict) -> bytes:
+    """Build the status line and headers of a response."""
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", "Connection: close"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def respond(
+    writer: asyncio.StreamWriter,
+    status: HTTPStatus,
+    payload: dict | None = None,
+    headers: dict | None = None,
+):
+    """Send a JSON response."""
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    headers = {**(headers or {}), "Content-Length": len(body)}
+    if payload is not None:
+        headers["Content-Type"] = "application/json"
+    writer.write(head(status, headers) + body)
+    await writer.drain()
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+    """Read the method, path and body of an HTTP request.
+
+    Raises:
+        HTTPError: If the request is malformed or its body is too large.
+    """
+    try:
+        method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            try:
+                length = int(value.strip() or 0)
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], body
+
+
+def serve(
+    project_name: str,
+    config_path: str,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    max_concurrency: int = 32,
+    max_queue: int = 256,
+):
+    """Serve the RAG chain of a configuration over HTTP.
+
+    The index and the models are loaded once at startup and shared by every
+    session. Calls to the LLM provider go through its rate limiter, configured
+    by the `rate_limits` entry of the configuration.
+
+    Args:
+        project_name: Name of the project.
+        config_path: Path to the JSON configuration file defining the RAG setup.
+        host: The interface to listen on.
+        port: The port to listen on.
+        max_concurrency: Maximum number of turns running at the same time.
+        max_queue: Maximum number of turns waiting for a slot before new ones
+            are rejected.
+
+    Raises:
+        IOError: If the configuration file at `config_path` does not exist.
+    """
+    config = load_config(config_path)
+    configure_rate_limits(config.get("rate_limits", {}))
+    start = time.perf_counter()
+    chain = setup_from_config(project_name, config)
+    print(f"Loaded project {project_name} in {time.perf_counter() - start:.2f}s")
+
+    server = ChatServer(
+        chain,
+        limiter=get_rate_limiter(config["llm_provider"], config["llm"]),
+        extra_tokens=config["k_docs"] * config["chunk_size"] // 4,
+        max_concurrency=max_concurrency,
+        max_queue=max_queue,
+    )
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        print("Server stopped!")
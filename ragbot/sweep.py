@@ -0,0 +1,243 @@
+"""Evaluation of a grid of configurations, sharing indexes across configurations."""
+
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ragbot.chunking import DEFAULT_CHUNKING_WORKERS
+from ragbot.evaluate import evaluate_config
+from ragbot.ingestion import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from ragbot.rag import get_vectorstore
+from ragbot.utils.rate_limit import configure_rate_limits
+from ragbot.utils.utils import load_config
+
+# Configuration entries that define an index, shared by the configurations using it
+INDEX_KEYS = (
+    "chunk_size",
+    "chunk_overlap",
+    "embeddings_provider",
+    "embedding_model",
+    "dedup_threshold",
+)
+# Configuration entries that define how an index is searched, each exported once
+BACKEND_KEYS = ("vectorstore", "ann")
+
+
+def expand_grid(base: dict, grid: dict[str, list]) -> list[dict]:
+    """Build one configuration per combination of the grid values.
+
+    Args:
+        base: The configuration entries shared by every combination.
+        grid: The values to try for each varied entry.
+
+    Returns:
+        The configurations, in the order of the cartesian product of the grid.
+    """
+    keys = list(grid)
+    return [
+        {**base, **dict(zip(keys, values))}
+        for values in itertools.product(*(grid[key] for key in keys))
+    ]
+
+
+def load_grid(grid_path: str) -> tuple[list[dict], list[str]]:
+    """Load a parameter grid from a JSON file.
+
+    The file has a `grid` object mapping configuration entries to the list of
+    values to try, and either a `base` object or the path of a base configuration
+    file for the entries that are not varied.
+
+    Args:
+        grid_path: Path to the JSON grid file.
+
+    Returns:
+        The configurations of the grid, and the names of the varied entries.
+
+    Raises:
+        IOError: If the grid file or its base configuration file does not exist.
+        ValueError: If the grid is empty.
+    """
+    spec = load_config(grid_path)
+    base = spec.get("base", {})
+    if isinstance(base, str):
+        base = load_config(base)
+    grid = spec.get("grid", {})
+    if not grid or not all(grid.values()):
+        raise ValueError(f"Grid file {grid_path} has no values to sweep")
+    return expand_grid(base, grid), list(grid)
+
+
+def scale_rate_limits(limits: dict[str, dict], factor: float) -> dict[str, dict]:
+    """Scale the budgets of rate limits, to share them between processes.
+
+    Args:
+        limits: The `rate_limits` entry of a configuration.
+        factor: The fraction of each budget to keep.
+
+    Returns:
+        The rate limits with every per-minute budget scaled by `factor`.
+    """
+    return {
+        key: {
+            name: value * factor if name.endswith("_per_minute") and value else value
+            for name, value in limit.items()
+        }
+        for key, limit in limits.items()
+    }
+
+
+def build_indexes(project_name: str, configs: list[dict]) -> int:
+    """Build the index of each distinct index and backend setting once.
+
+    Configurations sharing the `INDEX_KEYS` entries share a Chroma index, and
+    their `BACKEND_KEYS` entries decide which NumPy or IVF exports of it are
+    built.
+
+    Args:
+        project_name: The name of the project.
+        configs: The configurations of the sweep.
+
+    Returns:
+        The number of distinct index and backend settings.
+    """
+    # The `ann` entry is a dictionary, so settings are compared as JSON
+    settings = {
+        json.dumps(
+            {key: config.get(key) for key in INDEX_KEYS + BACKEND_KEYS},
+            sort_keys=True,
+        ): config
+        for config in configs
+    }
+    for config in settings.values():
+        configure_rate_limits(config.get("rate_limits", {}))
+        get_vectorstore(
+            project_name=project_name,
+            embeddings_provider=config["embeddings_provider"],
+            embedding_model=config["embedding_model"],
+            chunk_size=config["chunk_size"],
+            chunk_overlap=config["chunk_overlap"],
+            batch_size=config.get("embedding_batch_size", DEFAULT_BATCH_SIZE),
+            workers=config.get("embedding_workers", DEFAULT_WORKERS),
+            backend=config.get("vectorstore", "chroma"),
+            ann=config.get("ann"),
+            dump_chunks=config.get("dump_chunks", False),
+            chunking_workers=config.get("chunking_workers", DEFAULT_CHUNKING_WORKERS),
+            dedup_threshold=config.get("dedup_threshold"),
+        )
+    return len(settings)
+
+
+def label(config: dict, keys: list[str]) -> str:
+    """Name a configuration after its varied entries."""
+    return " ".join(f"{key}={config[key]}" for key in keys)
+
+
+def _evaluate(job: tuple) -> dict:
+    """Evaluate one configuration of a sweep in a worker process."""
+    project_name, config, dataset_name, dataset_path, output_path, prefix = job
+    return evaluate_config(
+        project_name,
+        config,
+        dataset_name,
+        dataset_path=dataset_path,
+        output_path=output_path,
+        experiment_prefix=prefix,
+    )
+
+
+def print_table(rows: list[dict], keys: list[str]):
+    """Print the scores of every configuration as a table.
+
+    Args:
+        rows: One row per configuration, with its `config` and its `scores`.
+        keys: The names of the varied entries.
+    """
+    metrics = list(dict.fromkeys(metric for row in rows for metric in row["scores"]))
+    header = [*keys, *metrics]
+    cells = [
+        [str(row["config"][key]) for key in keys]
+        + [
+            f"{row['scores'][metric]:.4f}" if metric in row["scores"] else "-"
+            for metric in metrics
+        ]
+        for row in rows
+    ]
+    widths = [
+        max(len(line[i]) for line in [header, *cells]) for i in range(len(header))
+    ]
+    for line in [header, ["-" * width for width in widths], *cells]:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def sweep(
+    project_name: str,
+    grid_path: str,
+    dataset_name: str,
+    dataset_path: str | None = None,
+    output_dir: str | None = None,
+    workers: int | None = None,
+) -> list[dict]:
+    """Evaluate every configuration of a parameter grid and compare their scores.
+
+    The index of each distinct (chunk_size, chunk_overlap, embeddings_provider,
+    embedding_model, dedup_threshold) setting, and its export for each
+    vectorstore and ann setting, is built once, before any evaluation, and then
+    reopened by every retrieval and LLM variant using it. Configurations are
+    evaluated in parallel in a pool of processes. Rate limiters cannot be shared
+    between processes, so each process gets an equal share of every budget.
+
+    Args:
+        project_name: The name of the project.
+        grid_path: Path to the JSON grid file.
+        dataset_name: The name of the dataset to be used for evaluation, registered in LangSmith.
+        dataset_path: Path to a local JSONL or Parquet dataset, for offline evaluation.
+        output_dir: Directory where the offline results of each configuration and
+            the comparison table are written. Defaults to a timestamped directory
+            under `data/project_name/sweeps/`.
+        workers: Number of configurations evaluated at the same time. Defaults
+            to the number of configurations, up to the number of CPUs.
+
+    Returns:
+        One row per configuration, with its `config` and the mean of each score.
+    """
+    configs, keys = load_grid(grid_path)
+    output_dir = output_dir or (
+        f"data/{project_name}/sweeps/{time.strftime('%Y%m%d-%H%M%S')}"
+    )
+    os.makedirs(output_dir, exist_ok=True)
+
+    num_indexes = build_indexes(project_name, configs)
+    print(f"Sweeping {len(configs)} configurations over {num_indexes} indexes")
+
+    workers = workers or min(len(configs), os.cpu_count() or 1)
+    jobs = []
+    for i, config in enumerate(configs):
+        config = {
+            **config,
+            "rate_limits": scale_rate_limits(
+                config.get("rate_limits", {}), 1 / workers
+            ),
+        }
+        output_path = f"{output_dir}/{i}.jsonl" if dataset_path else None
+        prefix = f"sweep-{label(config, keys).replace(' ', '-')}"
+        jobs.append(
+            (project_name, config, dataset_name, dataset_path, output_path, prefix)
+        )
+
+    # Spawn workers, as forking a process with running threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        summaries = list(executor.map(_evaluate, jobs))
+
+    rows = [
+        {"config": config, "scores": scores}
+        for config, scores in zip(configs, summaries)
+    ]
+    with open(f"{output_dir}/summary.json", "w") as f:
+        json.dump({"keys": keys, "rows": rows}, f, indent=2)
+    print_table(rows, keys)
+    print(f"Results written to {output_dir}")
+    return rows
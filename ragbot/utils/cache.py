@@ -0,0 +1,207 @@
+"""Disk-backed cache for embeddings shared across indexing, retrieval and evaluation."""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = "data/.cache/embeddings.db"
+DEFAULT_MAX_SIZE_MB = 1024
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that stores every computed vector in a local SQLite file.
+
+    Vectors are keyed by provider, model, kind of embedding (document or query)
+    and a hash of the text, so different models never share entries. When the
+    stored vectors exceed `max_size_mb`, the least recently used ones are evicted.
+    Asynchronous calls run the cached paths in a worker thread, so that
+    concurrent queries, such as those of the server, also reuse cached vectors.
+
+    Attributes:
+        embeddings (Embeddings): The wrapped embeddings model.
+        provider (str): Name of the embeddings provider.
+        model_id (str): Identifier of the embeddings model.
+        hits (int): Number of texts served from the cache.
+        misses (int): Number of texts embedded by the wrapped model.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        provider: str,
+        model_id: str,
+        path: str = DEFAULT_CACHE_PATH,
+        max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+    ):
+        """Initializes the cache, creating its SQLite file if needed.
+
+        Args:
+            embeddings: The embeddings model to wrap.
+            provider: Name of the embeddings provider.
+            model_id: Identifier of the embeddings model.
+            path: Path to the SQLite cache file.
+            max_size_mb: Maximum size of the stored vectors, in megabytes.
+        """
+        self.embeddings = embeddings
+        self.provider = provider
+        self.model_id = model_id
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, provider TEXT, model TEXT, "
+                "vector BLOB, size INTEGER, accessed REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)"
+            )
+
+    def _key(self, kind: str, text: str) -> str:
+        """Build the cache key of a text."""
+        payload = f"{self.provider}\0{self.model_id}\0{kind}\0{text}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        """Fetch the cached vectors of the given keys and refresh their access time."""
+        found = {}
+        with self._lock, self._conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        return found
+
+    def _store(self, vectors: dict[str, list[float]]):
+        """Store new vectors and evict the least recently used ones if needed."""
+        now = time.time()
+        rows = []
+        for key, vector in vectors.items():
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, self.provider, self.model_id, blob, len(blob), now))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()[0]
+            while total > self.max_size:
+                rows = self._conn.execute(
+                    "SELECT key, size FROM embeddings ORDER BY accessed LIMIT 1000"
+                ).fetchall()
+                evicted = []
+                for key, size in rows:
+                    if total <= self.max_size:
+                        break
+                    evicted.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+
+    def _embed(self, kind: str, texts: list[str], embed) -> list[list[float]]:
+        """Embed texts, computing only those missing from the cache."""
+        keys = [self._key(kind, text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            computed = dict(zip(missing, embed(list(missing.values()))))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed a list of documents, reusing cached vectors.
+
+        Args:
+            texts: The documents to embed.
+
+        Returns:
+            One embedding vector per document.
+        """
+        return self._embed("document", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query, reusing a cached vector.
+
+        Args:
+            text: The query to embed.
+
+        Returns:
+            The embedding vector of the query.
+        """
+        return self._embed(
+            "query", [text], lambda texts: [self.embeddings.embed_query(texts[0])]
+        )[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed a list of documents in a worker thread, reusing cached vectors.
+
+        Args:
+            texts: The documents to embed.
+
+        Returns:
+            One embedding vector per document.
+        """
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embed a query in a worker thread, reusing a cached vector.
+
+        Args:
+            text: The query to embed.
+
+        Returns:
+            The embedding vector of the query.
+        """
+        return await asyncio.to_thread(self.embed_query, text)
+
+    def stats(self) -> dict:
+        """Report the usage of the cache.
+
+        Returns:
+            A dictionary with the `hits`, `misses` and `hit_rate` of this wrapper,
+            and the number of `entries` and `size_mb` stored in the cache file.
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_mb": size / (1024 * 1024),
+        }
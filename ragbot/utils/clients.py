@@ -0,0 +1,153 @@
+"""Process-wide registry of model and embeddings clients, and of their connection pools."""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+@dataclass
+class ClientStats:
+    """Counts of the lookups of one shared client.
+
+    Attributes:
+        created (int): Number of times the client was built, once unless cleared.
+        reused (int): Number of lookups served by the already built client.
+    """
+
+    created: int = 0
+    reused: int = 0
+
+
+@dataclass
+class ConnectionStats:
+    """Counts of the requests sent through the connection pool of one provider.
+
+    Attributes:
+        requests (int): Number of requests sent through the pool.
+        connections (int): Number of connections the pool opened. Every other
+            request reused an open connection.
+    """
+
+    requests: int = 0
+    connections: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+
+_clients: dict[tuple, Any] = {}
+_stats: dict[tuple, ClientStats] = {}
+_registry_lock = threading.Lock()
+_pools: dict[str, Any] = {}
+_pool_stats: dict[str, ConnectionStats] = {}
+# Separate from `_registry_lock`, since clients get their pool while being built
+_pools_lock = threading.Lock()
+
+
+def get_client(key: tuple, create: Callable[[], Any]) -> Any:
+    """Return the process-wide client of a key, building it on first use.
+
+    Callers that share a client, such as the RAG chain, the evaluation judges
+    and the server, skip building it again. Clients of the same provider with
+    different parameters still share the provider's pool from `get_pool`.
+
+    Args:
+        key: Identifier of the client, such as its kind, provider, model and
+            parameters. Clients built with different parameters are not shared.
+        create: Builds the client if it is not in the registry.
+
+    Returns:
+        The shared client.
+    """
+    with _registry_lock:
+        if key in _clients:
+            _stats[key].reused += 1
+            return _clients[key]
+        # Build under the lock, so that concurrent callers never build twice
+        _clients[key] = create()
+        _stats.setdefault(key, ClientStats()).created += 1
+        return _clients[key]
+
+
+def get_pool(provider: str, create: Callable[[ConnectionStats], Any]) -> Any:
+    """Return the process-wide connection pool of a provider, building it on first use.
+
+    Args:
+        provider: Name of the model provider.
+        create: Builds the pool from the `ConnectionStats` it must update.
+
+    Returns:
+        The shared pool.
+    """
+    with _pools_lock:
+        if provider not in _pools:
+            _pool_stats[provider] = ConnectionStats()
+            _pools[provider] = create(_pool_stats[provider])
+        return _pools[provider]
+
+
+def clear_clients():
+    """Drop every shared client and close every pool, with their stats.
+
+    The next lookups build new clients and pools.
+    """
+    with _registry_lock:
+        _clients.clear()
+        _stats.clear()
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        _pool_stats.clear()
+
+
+def client_stats() -> dict:
+    """Summarize the reuse of the shared clients and of their connections.
+
+    Returns:
+        The number of `clients` in the registry, the total `created` and
+        `reused` lookups, their `reuse_rate`, the counts of each client by
+        `"kind/provider/model/parameters..."`, and the `connections` of each
+        provider pool: its `requests`, the `connections` it opened, and the
+        `reuse_rate` of open connections by requests.
+    """
+    with _registry_lock:
+        per_client = {
+            "/".join(str(part) for part in key): {
+                "created": stats.created,
+                "reused": stats.reused,
+            }
+            for key, stats in _stats.items()
+        }
+        created = sum(stats.created for stats in _stats.values())
+        reused = sum(stats.reused for stats in _stats.values())
+        num_clients = len(_clients)
+    with _pools_lock:
+        connections = {
+            provider: {
+                "requests": stats.requests,
+                "connections": stats.connections,
+                "reuse_rate": (
+                    max(0.0, 1 - stats.connections / stats.requests)
+                    if stats.requests
+                    else 0.0
+                ),
+            }
+            for provider, stats in _pool_stats.items()
+        }
+    return {
+        "clients": num_clients,
+        "created": created,
+        "reused": reused,
+        "reuse_rate": reused / (created + reused) if created + reused else 0.0,
+        "per_client": per_client,
+        "connections": connections,
+    }
@@ -0,0 +1,251 @@
+"""Keep-alive connection pools shared by the clients of each model provider.
+
+Every model and embeddings client of a provider sends its requests through
+the provider's pool, so the RAG chain, the evaluation judges and the server
+reuse the same open connections. Pools count the requests they send and the
+connections they open, and are registered in `ragbot.utils.clients`.
+"""
+
+from typing import Any
+
+import grpc
+import httpx
+
+from ragbot.utils.clients import ConnectionStats, get_pool
+
+# Trace events of `httpcore` marking the opening of a new connection
+CONNECT_EVENTS = {
+    "connection.connect_tcp.started",
+    "connection.connect_unix_socket.started",
+}
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """HTTP transport of a shared pool, counting requests and new connections.
+
+    Clients built on the transport only borrow its pool, so closing them
+    leaves the pool open. It is closed by `clear_clients`.
+
+    Attributes:
+        stats (ConnectionStats): The counts of the pool.
+    """
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.record_request()
+        previous = request.extensions.get("trace")
+
+        def trace(name: str, info: dict):
+            if name in CONNECT_EVENTS:
+                self.stats.record_connection()
+            if previous is not None:
+                previous(name, info)
+
+        request.extensions["trace"] = trace
+        return super().handle_request(request)
+
+    def close(self):
+        """Leave the pool open for the other clients."""
+
+    def __exit__(self, *args):
+        """Leave the pool open when a client is used as a context manager."""
+
+    def shutdown(self):
+        """Close the connections of the pool."""
+        super().close()
+
+
+class AsyncPooledTransport(httpx.AsyncHTTPTransport):
+    """Asynchronous counterpart of `PooledTransport`, sharing its stats.
+
+    Attributes:
+        stats (ConnectionStats): The counts of the pool.
+    """
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.record_request()
+        previous = request.extensions.get("trace")
+
+        async def trace(name: str, info: dict):
+            if name in CONNECT_EVENTS:
+                self.stats.record_connection()
+            if previous is not None:
+                await previous(name, info)
+
+        request.extensions["trace"] = trace
+        return await super().handle_async_request(request)
+
+    async def aclose(self):
+        """Leave the pool open for the other clients."""
+
+    async def __aexit__(self, *args):
+        """Leave the pool open when a client is used as a context manager."""
+
+
+class HTTPPool:
+    """Synchronous and asynchronous keep-alive HTTP pools of one provider.
+
+    Attributes:
+        transport (PooledTransport): The pool of synchronous clients.
+        async_transport (AsyncPooledTransport): The pool of asynchronous clients.
+    """
+
+    def __init__(self, stats: ConnectionStats):
+        """Initializes the pools.
+
+        Args:
+            stats: The counts shared by both pools.
+        """
+        self.transport = PooledTransport(stats)
+        self.async_transport = AsyncPooledTransport(stats)
+
+    def close(self):
+        """Close the connections of the synchronous pool.
+
+        Asynchronous connections belong to the event loop that opened them,
+        and are dropped with the pool.
+        """
+        self.transport.shutdown()
+
+
+def http_pool(provider: str) -> HTTPPool:
+    """Return the process-wide HTTP pool of a provider.
+
+    Args:
+        provider: Name of the model provider.
+
+    Returns:
+        The shared pool.
+    """
+    return get_pool(provider, HTTPPool)
+
+
+def ollama_client_kwargs(provider: str = "ollama") -> dict:
+    """Arguments of `ChatOllama` sending its requests through the shared pool."""
+    pool = http_pool(provider)
+    return {
+        "sync_client_kwargs": {"transport": pool.transport},
+        "async_client_kwargs": {"transport": pool.async_transport},
+    }
+
+
+def use_huggingface_pool(provider: str = "hf"):
+    """Make the `huggingface_hub` session send its requests through the shared pool.
+
+    `huggingface_hub` shares one session between all its synchronous clients,
+    and builds asynchronous ones from a factory, so both are built on the pool.
+    """
+    import huggingface_hub
+    from huggingface_hub.utils import _http
+
+    pool = http_pool(provider)
+    huggingface_hub.set_client_factory(
+        lambda: httpx.Client(
+            transport=pool.transport,
+            event_hooks={"request": [_http.hf_request_event_hook]},
+            follow_redirects=True,
+            timeout=None,
+        )
+    )
+    huggingface_hub.set_async_client_factory(
+        lambda: httpx.AsyncClient(
+            transport=pool.async_transport,
+            event_hooks={
+                "request": [_http.async_hf_request_event_hook],
+                "response": [_http.async_hf_response_event_hook],
+            },
+            follow_redirects=True,
+            timeout=None,
+        )
+    )
+
+
+class CountingInterceptor(
+    grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor
+):
+    """gRPC interceptor counting the calls sent through a channel.
+
+    Attributes:
+        stats (ConnectionStats): The counts of the channel.
+    """
+
+    def __init__(self, stats: ConnectionStats):
+        self.stats = stats
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        self.stats.record_request()
+        return continuation(client_call_details, request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        self.stats.record_request()
+        return continuation(client_call_details, request)
+
+
+class GrpcPool:
+    """Google Generative AI service client over one shared, counted gRPC channel.
+
+    A gRPC channel multiplexes every call over one HTTP/2 connection, which
+    it reopens when it drops. Calls are counted by `CountingInterceptor`, and
+    connections each time the channel becomes ready.
+
+    Attributes:
+        client (GenerativeServiceClient): The client shared by the chat and
+            embeddings models.
+    """
+
+    def __init__(self, stats: ConnectionStats, api_key: str):
+        """Initializes the client, without connecting.
+
+        Args:
+            stats: The counts of the channel.
+            api_key: The Google AI Studio API key.
+        """
+        from google.ai.generativelanguage_v1beta.services.generative_service.transports.grpc import (
+            GenerativeServiceGrpcTransport,
+        )
+        from langchain_google_genai import _genai_extension as genaix
+
+        self._channels: list[grpc.Channel] = []
+
+        def on_state(state: grpc.ChannelConnectivity):
+            if state == grpc.ChannelConnectivity.READY:
+                stats.record_connection()
+
+        def channel(*args, **kwargs) -> grpc.Channel:
+            raw = GenerativeServiceGrpcTransport.create_channel(*args, **kwargs)
+            raw.subscribe(on_state)
+            self._channels.append(raw)
+            return grpc.intercept_channel(raw, CountingInterceptor(stats))
+
+        self.client = genaix.build_generative_service(
+            api_key=api_key,
+            transport=lambda **kwargs: GenerativeServiceGrpcTransport(
+                channel=channel, **kwargs
+            ),
+        )
+
+    def close(self):
+        """Close the channel."""
+        for channel in self._channels:
+            channel.close()
+        self._channels.clear()
+
+
+def google_client(api_key: str, provider: str = "google") -> Any:
+    """Return the process-wide Google Generative AI service client.
+
+    Args:
+        api_key: The Google AI Studio API key.
+        provider: Name of the model provider.
+
+    Returns:
+        The shared `GenerativeServiceClient`.
+    """
+    return get_pool(provider, lambda stats: GrpcPool(stats, api_key)).client
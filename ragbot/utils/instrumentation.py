@@ -0,0 +1,238 @@
+"""Local latency histograms of the stages of the RAG pipeline.
+
+Stages are timed in process, without any network call, into histograms with
+fixed buckets, which can be dumped as JSON or in the Prometheus text format.
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+METRIC_NAME = "ragbot_stage_seconds"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets.
+
+    Attributes:
+        counts (list[int]): Number of observations per bucket, the last one
+            counting the observations above every bound.
+        count (int): Number of observations.
+        sum (float): Sum of the observations, in seconds.
+    """
+
+    def __init__(self):
+        """Initializes an empty histogram."""
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """Record an observation, from any thread."""
+        with self._lock:
+            self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile, interpolating linearly within its bucket.
+
+        Args:
+            q: The quantile, between 0 and 1.
+
+        Returns:
+            The estimated quantile in seconds, or the largest bound if it falls
+            above every bound, as Prometheus' `histogram_quantile` does.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return BUCKETS[-1]
+
+    def as_dict(self) -> dict:
+        """Summarize the histogram.
+
+        Returns:
+            The `count` and `sum` of the observations, their mean and estimated
+            p50, p95 and p99 in milliseconds, and the cumulative count of each
+            bucket by upper bound.
+        """
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip([*map(str, BUCKETS), "+Inf"], self.counts):
+                cumulative += count
+                buckets[bound] = cumulative
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+                "p50_ms": self.quantile(0.5) * 1000,
+                "p95_ms": self.quantile(0.95) * 1000,
+                "p99_ms": self.quantile(0.99) * 1000,
+                "buckets": buckets,
+            }
+
+
+_histograms: dict[str, Histogram] = {}
+_registry_lock = threading.Lock()
+
+
+def observe(stage: str, seconds: float):
+    """Record the duration of a stage in its process-wide histogram."""
+    with _registry_lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+    histogram.observe(seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block as a stage, unless it raises."""
+    start = time.perf_counter()
+    yield
+    observe(stage, time.perf_counter() - start)
+
+
+def reset_histograms():
+    """Drop every recorded observation."""
+    with _registry_lock:
+        _histograms.clear()
+
+
+def stage_histograms() -> dict[str, dict]:
+    """Summarize the histogram of every stage, as in `Histogram.as_dict`."""
+    with _registry_lock:
+        histograms = dict(_histograms)
+    return {stage: histograms[stage].as_dict() for stage in sorted(histograms)}
+
+
+def prometheus_text() -> str:
+    """Format the histograms of every stage in the Prometheus text format."""
+    lines = [
+        f"# HELP {METRIC_NAME} Latency of the stages of the RAG pipeline.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for stage, histogram in stage_histograms().items():
+        label = json.dumps(stage)
+        for bound, count in histogram["buckets"].items():
+            lines.append(f'{METRIC_NAME}_bucket{{stage={label},le="{bound}"}} {count}')
+        lines.append(f"{METRIC_NAME}_sum{{stage={label}}} {histogram['sum']}")
+        lines.append(f"{METRIC_NAME}_count{{stage={label}}} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def dump_histograms(path: str):
+    """Write the histograms of every stage to a file.
+
+    Args:
+        path: Path to the file, written in the Prometheus text format if it ends
+            with `.prom`, and as JSON otherwise.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith(".prom"):
+            f.write(prometheus_text())
+        else:
+            json.dump(stage_histograms(), f, indent=2)
+
+
+class StageTimer(BaseCallbackHandler):
+    """Callback handler timing the stages of a chain into local histograms.
+
+    Times the `retrieval` of the context, the `prompt_assembly` of every prompt
+    template and the `llm_generation` of every model call. Failed runs are
+    not recorded.
+    """
+
+    # Time the stages in the caller's thread, even in async chains
+    run_inline = True
+
+    def __init__(self):
+        """Initializes the handler."""
+        self._starts: dict[UUID, tuple[str, float]] = {}
+
+    def _start(self, stage: str, run_id: UUID):
+        self._starts[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id: UUID):
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            observe(started[0], time.perf_counter() - started[1])
+
+    def _error(self, run_id: UUID):
+        self._starts.pop(run_id, None)
+
+    def on_retriever_start(
+        self,
+        serialized,
+        query,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ):
+        # Retrievers wrapped by another retriever are timed as part of it
+        if parent_run_id not in self._starts:
+            self._start("retrieval", run_id)
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._error(run_id)
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, **kwargs: Any):
+        if kwargs.get("run_type") == "prompt":
+            self._start("prompt_assembly", run_id)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._error(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._start("llm_generation", run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._start("llm_generation", run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._error(run_id)
@@ -0,0 +1,387 @@
+"""Rate limiting and retry helpers for calls to model providers."""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+
+THROTTLING_MARKERS = ("429", "rate limit", "ratelimit", "quota", "resource exhausted")
+MIN_RATE_FACTOR = 0.1
+RECOVERY_STEP = 0.05
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a constant rate.
+
+    Attributes:
+        capacity (float): Maximum number of tokens the bucket can hold.
+        rate (float): Number of tokens added per second.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        """Initializes a full bucket.
+
+        Args:
+            capacity: Maximum number of tokens the bucket can hold.
+            rate: Number of tokens added per second.
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Add the tokens accumulated since the last update."""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Take `amount` tokens if available, or tell how long to wait for them.
+
+        Args:
+            amount: Number of tokens to take. Amounts above the capacity are
+                capped, so oversized requests wait for a full bucket.
+
+        Returns:
+            0.0 if the tokens were taken, otherwise the seconds to wait before
+            trying again.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def acquire(self, amount: float = 1.0):
+        """Block until `amount` tokens can be taken from the bucket.
+
+        Args:
+            amount: Number of tokens to take.
+        """
+        while (delay := self.wait_time(amount)) > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, amount: float = 1.0):
+        """Wait without blocking the event loop until `amount` tokens can be taken.
+
+        Args:
+            amount: Number of tokens to take.
+        """
+        while (delay := self.wait_time(amount)) > 0:
+            await asyncio.sleep(delay)
+
+
+class RateLimiter:
+    """Adaptive requests-per-minute and tokens-per-minute budget for a provider.
+
+    The limiter starts at the configured budgets. Each throttling error halves
+    the rate at which budgets refill, down to a tenth of the configured rate, and
+    each successful call recovers it by a small step, so sustained traffic
+    settles just below the quota actually granted by the provider.
+
+    Attributes:
+        requests_per_minute (float | None): Maximum requests per minute, or None for no limit.
+        tokens_per_minute (float | None): Maximum input tokens per minute, or None for no limit.
+        max_retries (int): Maximum number of retries after throttling errors.
+        base_delay (float): Delay before the first retry, in seconds.
+        max_delay (float): Maximum delay between retries, in seconds.
+        throttled (int): Number of throttling errors seen.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        """Initializes the limiter with full budgets.
+
+        Args:
+            requests_per_minute: Maximum requests per minute, or None for no limit.
+            tokens_per_minute: Maximum input tokens per minute, or None for no limit.
+            max_retries: Maximum number of retries after throttling errors.
+            base_delay: Delay before the first retry, in seconds.
+            max_delay: Maximum delay between retries, in seconds.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0
+        self._factor = 1.0
+        self._lock = threading.Lock()
+        self._requests = (
+            TokenBucket(requests_per_minute, requests_per_minute / 60)
+            if requests_per_minute
+            else None
+        )
+        self._tokens = (
+            TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+            if tokens_per_minute
+            else None
+        )
+
+    @property
+    def rate_factor(self) -> float:
+        """Fraction of the configured budgets currently granted."""
+        return self._factor
+
+    def _set_factor(self, factor: float):
+        """Scale the refill rate of the budgets to a fraction of the configured one."""
+        with self._lock:
+            self._factor = min(1.0, max(MIN_RATE_FACTOR, factor))
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None:
+                    bucket.rate = bucket.capacity / 60 * self._factor
+
+    def on_success(self):
+        """Recover part of the budget after a successful call."""
+        if self._factor < 1.0:
+            self._set_factor(self._factor + RECOVERY_STEP)
+
+    def on_throttle(self):
+        """Halve the budget after a throttling error."""
+        self.throttled += 1
+        self._set_factor(self._factor / 2)
+
+    def acquire(self, tokens: float = 0.0):
+        """Block until one request consuming `tokens` input tokens fits the budget.
+
+        Args:
+            tokens: Estimated number of input tokens of the request.
+        """
+        if self._requests is not None:
+            self._requests.acquire(1)
+        if self._tokens is not None and tokens:
+            self._tokens.acquire(tokens)
+
+    async def aacquire(self, tokens: float = 0.0):
+        """Wait without blocking the event loop until one request fits the budget.
+
+        Args:
+            tokens: Estimated number of input tokens of the request.
+        """
+        if self._requests is not None:
+            await self._requests.aacquire(1)
+        if self._tokens is not None and tokens:
+            await self._tokens.aacquire(tokens)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Register a failed attempt and return the delay before the next one.
+
+        Raises:
+            Exception: The given error, if it is not a throttling error or if
+                the retries are exhausted.
+        """
+        if attempt == self.max_retries or not is_throttling_error(error):
+            raise error
+        self.on_throttle()
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def call(
+        self, func: Callable[..., Any], *args: Any, tokens: float = 0.0, **kwargs: Any
+    ) -> Any:
+        """Call a function within the budget, backing off while it is throttled.
+
+        Args:
+            func: The function to call.
+            *args: Positional arguments for `func`.
+            tokens: Estimated number of input tokens of the call.
+            **kwargs: Keyword arguments for `func`.
+
+        Returns:
+            The result of `func`.
+
+        Raises:
+            Exception: The last error raised by `func`, if it is not a throttling
+                error or if the retries are exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                time.sleep(self._backoff(attempt, e))
+                continue
+            self.on_success()
+            return result
+
+    async def acall(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        tokens: float = 0.0,
+        **kwargs: Any,
+    ) -> Any:
+        """Await a coroutine function within the budget, backing off while it is throttled.
+
+        Args:
+            func: The coroutine function to call.
+            *args: Positional arguments for `func`.
+            tokens: Estimated number of input tokens of the call.
+            **kwargs: Keyword arguments for `func`.
+
+        Returns:
+            The result of `func`.
+
+        Raises:
+            Exception: The last error raised by `func`, if it is not a throttling
+                error or if the retries are exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(tokens)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._backoff(attempt, e))
+                continue
+            self.on_success()
+            return result
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limits: dict[str, dict] = {}
+_registry_lock = threading.Lock()
+
+
+def configure_rate_limits(limits: dict[str, dict]):
+    """Set the budgets used by `get_rate_limiter`.
+
+    Args:
+        limits: A mapping from `"provider"` or `"provider/model"` to the keyword
+            arguments of `RateLimiter`, such as `requests_per_minute` and
+            `tokens_per_minute`. Model entries take precedence over provider entries.
+    """
+    with _registry_lock:
+        _limits.update(limits)
+        _limiters.clear()
+
+
+def get_rate_limiter(provider: str, model_id: str | None = None) -> RateLimiter:
+    """Return the process-wide rate limiter of a provider and model.
+
+    Callers that use the same provider and model share one limiter, so their
+    combined traffic stays within the configured budget.
+
+    Args:
+        provider: Name of the model provider.
+        model_id: Identifier of the model, if limits are set per model.
+
+    Returns:
+        The shared `RateLimiter`. It does not limit anything if no budget was
+        configured for the provider or model.
+    """
+    with _registry_lock:
+        key = f"{provider}/{model_id}"
+        if key not in _limits:
+            key = provider
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(**_limits.get(key, {}))
+        return _limiters[key]
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of tokens of a text.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        The estimated number of tokens, assuming about four characters per token.
+    """
+    return len(text) // 4 + 1
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Tell whether an exception signals that the provider is throttling requests.
+
+    Args:
+        error: The exception raised by a provider call.
+
+    Returns:
+        True if the error is an HTTP 429, a quota or a rate limit error.
+    """
+    if (
+        getattr(error, "status_code", None) == 429
+        or getattr(error, "code", None) == 429
+    ):
+        return True
+    description = f"{type(error).__name__} {error}".lower()
+    return any(marker in description for marker in THROTTLING_MARKERS)
+
+
+def retry_with_backoff(
+    func: Callable[..., Any],
+    *args: Any,
+    max_retries: int = 6,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    **kwargs: Any,
+) -> Any:
+    """Call a function, retrying with exponential backoff while it is throttled.
+
+    Args:
+        func: The function to call.
+        *args: Positional arguments for `func`.
+        max_retries: Maximum number of retries after throttling errors.
+        base_delay: Delay before the first retry, in seconds.
+        max_delay: Maximum delay between retries, in seconds.
+        **kwargs: Keyword arguments for `func`.
+
+    Returns:
+        The result of `func`.
+
+    Raises:
+        Exception: The last error raised by `func`, if it is not a throttling
+            error or if the retries are exhausted.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries or not is_throttling_error(e):
+                raise
+            delay = min(max_delay, base_delay * 2**attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def with_rate_limit(
+    runnable: Runnable, limiter: RateLimiter, extra_tokens: int = 0
+) -> Runnable:
+    """Wrap a runnable so that every call goes through a rate limiter.
+
+    Args:
+        runnable: The runnable to wrap, such as a chat model or a chain.
+        limiter: The rate limiter of the provider serving the runnable.
+        extra_tokens: Tokens added by the runnable to each input, such as the
+            retrieved context of a RAG chain.
+
+    Returns:
+        A runnable with the same input and output, supporting `invoke` and `ainvoke`.
+    """
+
+    def tokens(input: Any) -> int:
+        return estimate_tokens(str(input)) + extra_tokens
+
+    def invoke(input: Any, config: RunnableConfig) -> Any:
+        return limiter.call(runnable.invoke, input, config, tokens=tokens(input))
+
+    async def ainvoke(input: Any, config: RunnableConfig) -> Any:
+        return await limiter.acall(
+            runnable.ainvoke, input, config, tokens=tokens(input)
+        )
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=runnable.get_name())
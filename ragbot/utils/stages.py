@@ -0,0 +1,82 @@
+"""Throughput accounting of the stages of a pipeline."""
+
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass
+class StageStats:
+    """Work done by one stage of a pipeline.
+
+    Stages of a streaming pipeline overlap in time, so each stage records its
+    own busy time, summed over its workers. `items_per_second` is the
+    throughput of one worker of the stage.
+
+    Attributes:
+        items (int): Number of items processed, such as files or chunks.
+        bytes (int): Number of bytes processed, if meaningful for the stage.
+        seconds (float): Busy time, summed over the workers of the stage.
+        workers (int): Number of workers of the stage.
+        unit (str): What the items are, such as "files" or "chunks".
+    """
+
+    items: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    workers: int = 1
+    unit: str = "items"
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def add(self, items: int, seconds: float, bytes: int = 0):
+        """Record a unit of work, from any thread.
+
+        Args:
+            items: Number of items processed.
+            seconds: Time spent processing them.
+            bytes: Number of bytes processed.
+        """
+        with self._lock:
+            self.items += items
+            self.seconds += seconds
+            self.bytes += bytes
+
+    def as_dict(self) -> dict:
+        """Summarize the stage, with its per-worker and aggregate throughput.
+
+        Returns:
+            The `items` and their `unit`, the `bytes`, busy `seconds` and
+            `workers` of the stage, its `items_per_second` and `mb_per_second`
+            per worker, and its `items_per_second_total` with every worker busy.
+        """
+        rate = self.items / self.seconds if self.seconds else 0.0
+        return {
+            "items": self.items,
+            "unit": self.unit,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "workers": self.workers,
+            "items_per_second": rate,
+            "mb_per_second": self.bytes / 1e6 / self.seconds if self.seconds else 0.0,
+            "items_per_second_total": rate * self.workers,
+        }
+
+
+def format_stages(stages: dict[str, dict]) -> str:
+    """Format the summaries of pipeline stages as one line per stage."""
+    lines = []
+    for name, stage in stages.items():
+        line = (
+            f"  {name:<6} {stage['items']} {stage['unit']} in {stage['seconds']:.2f}s busy, "
+            f"{stage['items_per_second']:.1f} {stage['unit']}/s per worker"
+        )
+        if stage["bytes"]:
+            line += f", {stage['mb_per_second']:.1f} MB/s per worker"
+        if stage["workers"] > 1:
+            line += (
+                f", ~{stage['items_per_second_total']:.1f} {stage['unit']}/s "
+                f"with {stage['workers']} workers"
+            )
+        lines.append(line)
+    return "\n".join(lines)
@@ -1,13 +1,38 @@
-"""Utilities for configuring and loading language models and embeddings."""
+"""Utilities for configuring and loading language models and embeddings.
 
+Provider SDKs are slow to import, so each one is only imported by
+`get_model` or `get_embeddings` when it is selected.
+"""
+
+import json
 import os
+from typing import TYPE_CHECKING
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from ragbot.utils.cache import CachedEmbeddings
+from ragbot.utils.clients import get_client
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import LLM, BaseChatModel
+
+
+def load_config(config_path: str) -> dict:
+    """Load a RAG configuration from a JSON file.
+
+    Args:
+        config_path: Path to the JSON configuration file.
 
-import google.generativeai as genai
-from langchain_core.embeddings import Embeddings
-from langchain_core.language_models import LLM, BaseChatModel
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_huggingface import HuggingFaceEndpoint
-from langchain_ollama import ChatOllama
+    Returns:
+        The configuration as a dictionary.
+
+    Raises:
+        IOError: If the configuration file at `config_path` does not exist.
+    """
+    if not os.path.exists(config_path):
+        raise IOError(f"Configuration file {config_path} not found.")
+    with open(config_path, "r") as f:
+        return json.load(f)
 
 
 def use_langsmith(project_name: str):
@@ -23,6 +48,20 @@ def use_langsmith(project_name: str):
     os.environ["LANGCHAIN_TRACING_V2"] = "true"
     os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
     os.environ["LANGCHAIN_PROJECT"] = project_name
+    _reload_langsmith_settings()
+
+
+def disable_langsmith():
+    """Disable LangSmith tracing, so that no chain step leaves the machine."""
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    _reload_langsmith_settings()
+
+
+def _reload_langsmith_settings():
+    """Make LangSmith read its environment variables again, which it caches."""
+    from langsmith import utils as ls_utils
+
+    ls_utils.get_env_var.cache_clear()
 
 
 def get_model(
@@ -31,16 +70,20 @@ def get_model(
     temperature: float,
     top_p: float = 0.85,
     top_k: int = 40,
-) -> BaseChatModel | LLM:
+) -> "BaseChatModel | LLM":
     """Load a chat language model from the specified provider.
 
-    Supports models from Google Generative AI, HuggingFace, and Ollama. Note that for Google
-    Generative AI you will need to have the GOOGLE_API_KEY environment variable set, and for
-    HuggingFace you will need the HUGGINGFACEHUB_API_TOKEN environment variable set.
+    Supports models from Google Generative AI, HuggingFace, and Ollama, and a fake model
+    answering locally for offline testing. Note that for Google Generative AI you will need
+    to have the GOOGLE_API_KEY environment variable set, and for HuggingFace you will need
+    the HUGGINGFACEHUB_API_TOKEN environment variable set. Models are shared
+    process-wide by provider, model and parameters, and the models of a
+    provider send their requests through its shared keep-alive connection pool.
 
     Args:
-        provider: Name of the LLM provider. Supported values: "google", "ollama", "hf".
-        model_id: Model identifier or repository ID (e.g., "gemini-1.5-flash").
+        provider: Name of the LLM provider. Supported values: "google", "ollama", "hf", "fake".
+        model_id: Model identifier or repository ID (e.g., "gemini-1.5-flash"). For the
+            "fake" provider, the text the model answers to every prompt.
         temperature: Sampling temperature to use (0.0 for deterministic output).
         top_p: Nucleus sampling threshold. Only applicable to some providers.
         top_k: Number of top tokens to consider. Only applicable to some providers.
@@ -51,29 +94,67 @@ def get_model(
     Raises:
         ValueError: If the provider is not recognized.
     """
+    return get_client(
+        ("model", provider, model_id, temperature, top_p, top_k),
+        lambda: create_model(provider, model_id, temperature, top_p, top_k),
+    )
+
+
+def create_model(
+    provider: str, model_id: str, temperature: float, top_p: float, top_k: int
+) -> "BaseChatModel | LLM":
+    """Build a new chat language model, with the arguments of `get_model`."""
     if provider == "google":
+        import google.generativeai as genai
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        from ragbot.utils.connections import google_client
+
         # Configure Google AI Studio API key
         genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
         llm = ChatGoogleGenerativeAI(
             model=model_id, temperature=temperature, top_p=top_p, top_k=top_k
         )
+        llm.client = google_client(os.environ["GOOGLE_API_KEY"])
     elif provider == "ollama":
-        llm = ChatOllama(model=model_id, temperature=temperature)
+        from langchain_ollama import ChatOllama
+
+        from ragbot.utils.connections import ollama_client_kwargs
+
+        llm = ChatOllama(
+            model=model_id, temperature=temperature, **ollama_client_kwargs()
+        )
     elif provider == "hf":
+        from langchain_huggingface import HuggingFaceEndpoint
+
+        from ragbot.utils.connections import use_huggingface_pool
+
+        use_huggingface_pool()
         llm = HuggingFaceEndpoint(repo_id=model_id, temperature=temperature)
+    elif provider == "fake":
+        from langchain_core.language_models import FakeListChatModel
+
+        llm = FakeListChatModel(responses=[model_id])
     else:
         raise ValueError(f"Unknown provider: {provider}")
     return llm
 
 
-def get_embeddings(provider: str, model_id: str) -> Embeddings:
+def get_embeddings(provider: str, model_id: str, cache: bool = True) -> Embeddings:
     """Load an embeddings model from the specified provider.
 
-    Currently only supports Google Generative AI embeddings.
+    Supports Google Generative AI embeddings, and deterministic fake embeddings
+    computed locally for testing and benchmarking. Unless disabled, the
+    model is wrapped in a disk-backed cache, so that a text is only embedded once
+    across index builds, retrieval and evaluation runs. Models are shared
+    process-wide by provider, model and caching, and Google models share the
+    gRPC channel of the Google chat models.
 
     Args:
-        provider: Name of the embedding provider. Supported value: "google".
+        provider: Name of the embedding provider. Supported values: "google", "fake".
         model_id: Identifier of the embedding model (e.g., "models/embedding-001").
+            For the "fake" provider, the size of the vectors (e.g., "768").
+        cache: Whether to cache the computed embeddings on disk.
 
     Returns:
         An instance of a LangChain-compatible embeddings model.
@@ -81,8 +162,25 @@ def get_embeddings(provider: str, model_id: str) -> Embeddings:
     Raises:
         ValueError: If the provider is not recognized.
     """
+    return get_client(
+        ("embeddings", provider, model_id, cache),
+        lambda: create_embeddings(provider, model_id, cache),
+    )
+
+
+def create_embeddings(provider: str, model_id: str, cache: bool) -> Embeddings:
+    """Build a new embeddings model, with the arguments of `get_embeddings`."""
     if provider == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        from ragbot.utils.connections import google_client
+
         embeddings = GoogleGenerativeAIEmbeddings(model=model_id)
+        embeddings.client = google_client(os.environ["GOOGLE_API_KEY"])
+    elif provider == "fake":
+        embeddings = DeterministicFakeEmbedding(size=int(model_id))
     else:
         raise ValueError(f"Unknown provider: {provider}")
+    if cache:
+        embeddings = CachedEmbeddings(embeddings, provider, model_id)
     return embeddings
@@ -0,0 +1,315 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from ragbot.evaluation.dataset_schema import Sample
+from ragbot.evaluation.metrics.bleu import BLEU
+from ragbot.evaluation.metrics.rouge import ROUGE
+from ragbot.evaluation.metrics.semantic_similarity import SemanticSimilarity
+from ragbot.rag import create_docs, get_vectorstore, setup
+from ragbot.retrieval import BACKENDS
+from ragbot.utils.utils import disable_langsmith, get_embeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Run of the default settings with --sizes 1000, compared against by default
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+# Synthetic chunks per knowledge base file
+CHUNKS_PER_FILE = 10000
+VOCABULARY_SIZE = 5000
+SYSTEM_PROMPT = "Answer the question with the context below.\n\n{context}"
+FAKE_ANSWER = "The application accepts files in CSV format."
+
+
+def vocabulary(seed):
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return [
+        "".join(rng.choice(letters, rng.integers(3, 10)))
+        for _ in range(VOCABULARY_SIZE)
+    ]
+
+
+def sentence(rng, words, num_words):
+    return " ".join(words[i] for i in rng.integers(0, len(words), num_words))
+
+
+def write_knowledge_base(path, num_chunks, chunk_size, words, seed):
+    # Paragraphs of about 80% of the chunk size are split into one chunk each
+    rng = np.random.default_rng(seed)
+    words_per_chunk = max(1, int(chunk_size * 0.8) // 7)
+    os.makedirs(path, exist_ok=True)
+    for file, start in enumerate(range(0, num_chunks, CHUNKS_PER_FILE)):
+        count = min(CHUNKS_PER_FILE, num_chunks - start)
+        with open(f"{path}/kb{file}.txt", "w", encoding="utf-8") as f:
+            f.write(
+                "\n\n".join(sentence(rng, words, words_per_chunk) for _ in range(count))
+            )
+    with open(f"{path}/system.prompt", "w", encoding="utf-8") as f:
+        f.write(SYSTEM_PROMPT)
+
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+    }
+
+
+def summary(values):
+    return "  ".join(
+        f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+        for key, value in values.items()
+    )
+
+
+def bench_create_docs(project, chunk_size):
+    chunks, size = 0, 0
+    start = time.perf_counter()
+    for doc in create_docs(project, chunk_size, 0):
+        chunks += 1
+        size += len(doc.page_content)
+    seconds = time.perf_counter() - start
+    return {
+        "chunks": chunks,
+        "seconds": seconds,
+        "chunks_per_second": chunks / seconds,
+        "mb_per_second": size / 1e6 / seconds,
+    }
+
+
+def bench_index_build(project, args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        vectorstore = get_vectorstore(
+            project_name=project,
+            embeddings_provider="fake",
+            embedding_model=str(args.dim),
+            chunk_size=args.chunk_size,
+            chunk_overlap=0,
+            rebuild=True,
+            backend=args.vectorstore,
+        )
+    seconds = time.perf_counter() - start
+    return vectorstore, {"seconds": seconds}
+
+
+def bench_retrieval(vectorstore, queries, k):
+    retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+    retriever.invoke(queries[0])
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        retriever.invoke(query)
+        latencies.append(time.perf_counter() - start)
+    return percentiles(latencies)
+
+
+def bench_chain(project, queries, args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        chain = setup(
+            project_name=project,
+            llm_provider="fake",
+            llm=FAKE_ANSWER,
+            llm_temperature=0.0,
+            llm_top_p=0.85,
+            llm_top_k=40,
+            embeddings_provider="fake",
+            embedding_model=str(args.dim),
+            chunk_size=args.chunk_size,
+            chunk_overlap=0,
+            search_type="similarity",
+            k_docs=args.k,
+            vectorstore_backend=args.vectorstore,
+        )
+    chain.invoke({"input": queries[0]})
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        chain.invoke({"input": query})
+        latencies.append(time.perf_counter() - start)
+    return percentiles(latencies)
+
+
+def bench_metrics(args, words):
+    rng = np.random.default_rng(args.seed)
+    samples = [
+        Sample(
+            question=sentence(rng, words, 10),
+            answer=". ".join(sentence(rng, words, 12) for _ in range(3)),
+            reference_answer=". ".join(sentence(rng, words, 12) for _ in range(3)),
+        )
+        for _ in range(args.samples)
+    ]
+    semantic_similarity = SemanticSimilarity()
+    semantic_similarity.embeddings = get_embeddings("fake", str(args.dim), cache=False)
+    metrics = [BLEU(), ROUGE(), semantic_similarity]
+    results = {}
+    for metric in metrics:
+        metric.init()
+        start = time.perf_counter()
+        for sample in samples:
+            metric.score(sample)
+        seconds = time.perf_counter() - start
+        results[metric.name] = {
+            "samples": len(samples),
+            "seconds": seconds,
+            "samples_per_second": len(samples) / seconds,
+        }
+    return results
+
+
+def run(args):
+    words = vocabulary(args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = [sentence(rng, words, 12) for _ in range(args.queries)]
+    results = {}
+    for size in args.sizes:
+        project = f"bench{size}"
+        print(f"[{size} chunks] writing the knowledge base")
+        write_knowledge_base(f"data/{project}", size, args.chunk_size, words, args.seed)
+        row = {"create_docs": bench_create_docs(project, args.chunk_size)}
+        print(f"[{size} chunks] create_docs: {summary(row['create_docs'])}")
+        vectorstore, row["index_build"] = bench_index_build(project, args)
+        print(f"[{size} chunks] index build: {summary(row['index_build'])}")
+        row["retrieval"] = bench_retrieval(vectorstore, queries, args.k)
+        print(f"[{size} chunks] retrieval: {summary(row['retrieval'])}")
+        row["chain"] = bench_chain(project, queries, args)
+        print(f"[{size} chunks] chain: {summary(row['chain'])}")
+        results[str(size)] = row
+    metrics = bench_metrics(args, words)
+    for name, result in metrics.items():
+        print(f"[metrics] {name}: {summary(result)}")
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {
+            "chunk_size": args.chunk_size,
+            "dim": args.dim,
+            "k": args.k,
+            "queries": args.queries,
+            "samples": args.samples,
+            "vectorstore": args.vectorstore,
+            "seed": args.seed,
+        },
+        "sizes": results,
+        "metrics": metrics,
+    }
+
+
+def flatten(report, prefix=""):
+    values = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, float):
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def compare(report, baseline, tolerance):
+    # Throughputs are better higher, and times and latencies better lower
+    current = flatten({"sizes": report["sizes"], "metrics": report["metrics"]})
+    previous = flatten({"sizes": baseline["sizes"], "metrics": baseline["metrics"]})
+    rows = []
+    for key in sorted(current.keys() & previous.keys()):
+        if not previous[key]:
+            continue
+        ratio = current[key] / previous[key]
+        higher_is_better = key.endswith("_per_second")
+        change = ratio - 1 if higher_is_better else 1 - ratio
+        rows.append(
+            {
+                "metric": key,
+                "baseline": previous[key],
+                "current": current[key],
+                "change": change,
+                "regression": change < -tolerance,
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark of ingestion, retrieval and metrics"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=64, help="Fake embedding size")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--vectorstore", choices=BACKENDS, default="chroma")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--workdir",
+        type=str,
+        default=None,
+        help="Directory of the synthetic projects, kept after the run",
+    )
+    parser.add_argument("--output", type=str, default="benchmark.json")
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=BASELINE,
+        help="Report of a previous run to compare against, or '' for none",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Relative slowdown against the baseline reported as a regression",
+    )
+    args = parser.parse_args()
+
+    disable_langsmith()
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ragbot-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        report = run(args)
+    finally:
+        os.chdir(cwd)
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = []
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            rows = compare(report, json.load(f), args.tolerance)
+        report["comparison"] = {"baseline": baseline, "rows": rows}
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['metric']:<50} {row['baseline']:12.3f} -> "
+                f"{row['current']:12.3f}  {row['change']:+7.1%}  {flag}"
+            )
+        regressions = [row for row in rows if row["regression"]]
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if regressions:
+        print(f"[FAIL] {len(regressions)} regressions beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
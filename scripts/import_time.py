@@ -0,0 +1,122 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules that importing the CLI must not load: provider SDKs, and the
+# libraries only some subcommands need
+DEFERRED_MODULES = [
+    "google.generativeai",
+    "langchain_google_genai",
+    "langchain_huggingface",
+    "langchain_ollama",
+    "transformers",
+    "langchain",
+    "langsmith",
+    "chromadb",
+    "numpy",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+loaded = [m for m in {deferred!r} if m in sys.modules]
+print(json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+
+def measure_import(module, repeat):
+    seconds, loaded = [], []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                PROBE.format(module=module, deferred=DEFERRED_MODULES),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        seconds.append(result["seconds"])
+        loaded = result["loaded"]
+    return {
+        "median_ms": statistics.median(seconds) * 1000,
+        "max_ms": max(seconds) * 1000,
+        "loaded": loaded,
+    }
+
+
+def measure_command(command, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "ragbot.cli", *command],
+            check=True,
+            capture_output=True,
+        )
+        seconds.append(time.perf_counter() - start)
+    return {
+        "median_ms": statistics.median(seconds) * 1000,
+        "max_ms": max(seconds) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time benchmark for `ragbot`")
+    parser.add_argument(
+        "--modules",
+        nargs="+",
+        default=["ragbot.cli", "ragbot.utils.utils", "ragbot.rag"],
+        help="Modules whose import is timed",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="Fail if importing `ragbot.cli` takes longer, in median",
+    )
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    imports = {module: measure_import(module, args.repeat) for module in args.modules}
+    help_time = measure_command(["--help"], args.repeat)
+    report = {"imports": imports, "cli_help": help_time}
+
+    for module, result in imports.items():
+        loaded = ", ".join(result["loaded"]) or "-"
+        print(
+            f"import {module:<20} median {result['median_ms']:7.1f} ms  "
+            f"max {result['max_ms']:7.1f} ms  loads: {loaded}"
+        )
+    print(
+        f"ragbot.cli --help         median {help_time['median_ms']:7.1f} ms  "
+        f"max {help_time['max_ms']:7.1f} ms"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    cli = imports.get("ragbot.cli") or measure_import("ragbot.cli", args.repeat)
+    if cli["loaded"]:
+        failures.append(f"importing ragbot.cli loads {', '.join(cli['loaded'])}")
+    if args.max_ms is not None and cli["median_ms"] > args.max_ms:
+        failures.append(
+            f"importing ragbot.cli takes {cli['median_ms']:.1f} ms "
+            f"(budget {args.max_ms:.1f} ms)"
+        )
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+
+async def post(host, port, payload):
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"POST /chat HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    first = await reader.read(1)
+    first_byte = time.perf_counter()
+    rest = await reader.read()
+    writer.close()
+    return status, headers, first + rest, first_byte
+
+
+async def session(args, latencies, first_bytes, statuses):
+    session_id = None
+    for turn in range(args.turns):
+        payload = {"input": f"Question {turn}", "stream": args.stream}
+        if session_id:
+            payload["session"] = session_id
+        start = time.perf_counter()
+        status, headers, body, first_byte = await post(args.host, args.port, payload)
+        statuses[status] = statuses.get(status, 0) + 1
+        if status != 200:
+            continue
+        latencies.append(time.perf_counter() - start)
+        first_bytes.append(first_byte - start)
+        session_id = (
+            headers.get("x-session-id") if args.stream else json.loads(body)["session"]
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test for `ragbot.cli serve`")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    latencies, first_bytes, statuses = [], [], {}
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(session(args, latencies, first_bytes, statuses) for _ in range(args.sessions))
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"Requests: {sum(statuses.values())} in {elapsed:.2f}s, statuses {statuses}")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} answers/s")
+    if latencies:
+        print(
+            f"Latency: p50 {statistics.median(latencies) * 1000:.0f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, "
+            f"first byte p50 {statistics.median(first_bytes) * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
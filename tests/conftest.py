@@ -0,0 +1,32 @@
+import os
+import shutil
+
+import pytest
+from chromadb.api.client import SharedSystemClient
+
+from ragbot.utils.clients import clear_clients
+from ragbot.utils.utils import load_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def offline_config():
+    """The configuration of the offline fake providers."""
+    return load_config(os.path.join(ROOT, "configs", "offline.json"))
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A copy of the example project, without its indexes and evaluations."""
+    shutil.copytree(
+        os.path.join(ROOT, "data", "example"),
+        tmp_path / "data" / "example",
+        ignore=shutil.ignore_patterns("index", "evaluations"),
+    )
+    monkeypatch.chdir(tmp_path)
+    yield "example"
+    # Chroma caches its clients by path, and every copy has the same relative
+    # index path, and cached embeddings models hold the copy's cache directory
+    SharedSystemClient.clear_system_cache()
+    clear_clients()
@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable
+
+from ragbot import answer_cache
+from ragbot.answer_cache import (
+    AnswerCache,
+    CachedChain,
+    get_answer_cache,
+    history_key,
+)
+from ragbot.rag import setup_from_config
+
+
+class FixedEmbeddings(Embeddings):
+    """Embeddings mapping each query to a given vector."""
+
+    def __init__(self, vectors: dict[str, list[float]]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+class CountingChain(Runnable):
+    """Chain answering about the question, streaming its context then its answer."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        return {**input, "context": ["doc"], "answer": f"About {input['input']}"}
+
+    def stream(self, input, config=None, **kwargs):
+        self.calls += 1
+        yield {"context": ["doc"]}
+        yield {"answer": "About "}
+        yield {"answer": input["input"]}
+
+    async def astream(self, input, config=None, **kwargs):
+        for chunk in self.stream(input, config, **kwargs):
+            yield chunk
+
+
+VECTORS = {
+    "formats": [1.0, 0.0, 0.0],
+    "file formats": [0.99, 0.1, 0.0],
+    "limits": [0.6, 0.8, 0.0],
+    "pricing": [0.0, 0.0, 1.0],
+}
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """An empty registry of shared caches."""
+    monkeypatch.setattr(answer_cache, "_caches", {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable clock replacing `time.time` in the cache."""
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def chain():
+    return CachedChain(
+        CountingChain(), AnswerCache("test", threshold=0.95), FixedEmbeddings(VECTORS)
+    )
+
+
+def test_similar_query_hits_and_dissimilar_one_misses(chain):
+    first = chain.invoke({"input": "formats"})
+    # cos = 0.995, above the threshold
+    similar = chain.invoke({"input": "file formats"})
+    # cos = 0.6, below the threshold
+    other = chain.invoke({"input": "limits"})
+
+    assert chain.chain.calls == 2
+    assert similar == {
+        "input": "file formats",
+        "context": ["doc"],
+        "answer": first["answer"],
+    }
+    assert other["answer"] == "About limits"
+    stats = chain.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = AnswerCache("test", ttl=60)
+    cache.store(VECTORS["formats"], history_key([]), {"answer": "CSV"})
+
+    clock[0] += 60
+    assert cache.lookup(VECTORS["formats"], history_key([])) == {"answer": "CSV"}
+    clock[0] += 1
+    assert cache.lookup(VECTORS["formats"], history_key([])) is None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = AnswerCache("test", max_entries=2)
+    history = history_key([])
+    for query in ("formats", "limits"):
+        cache.store(VECTORS[query], history, {"answer": query})
+    # Looking up "formats" makes "limits" the least recently used
+    assert cache.lookup(VECTORS["formats"], history) == {"answer": "formats"}
+    cache.store(VECTORS["pricing"], history, {"answer": "pricing"})
+
+    assert cache.lookup(VECTORS["limits"], history) is None
+    assert cache.lookup(VECTORS["formats"], history) == {"answer": "formats"}
+    assert cache.lookup(VECTORS["pricing"], history) == {"answer": "pricing"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_history_separates_conversations(chain):
+    earlier = [("human", "Hi"), ("ai", "Hello")]
+    chain.invoke({"input": "formats", "history": []})
+    chain.invoke({"input": "formats", "history": earlier})
+    chain.invoke({"input": "formats", "history": list(earlier)})
+
+    assert chain.chain.calls == 2
+    assert history_key(earlier) != history_key([]) == history_key(None)
+
+
+def test_index_change_replaces_the_namespace():
+    first = get_answer_cache("proj", "index1", "chain")
+    assert get_answer_cache("proj", "index1", "chain") is first
+    other_project = get_answer_cache("other", "index1", "chain")
+
+    second = get_answer_cache("proj", "index2", "chain")
+    assert second is not first and second.namespace == "proj/index2/chain"
+    # The caches of the outdated index are dropped, other projects' are kept
+    assert "proj/index1/chain" not in answer_cache._caches
+    assert get_answer_cache("other", "index1", "chain") is other_project
+
+
+def test_index_update_gives_the_chain_a_new_cache(project, offline_config):
+    config = {**offline_config, "answer_cache": {"threshold": 0.95}}
+    before = setup_from_config(project, config)
+    question = {"input": "What file formats are supported?", "history": []}
+    before.invoke(question)
+
+    with open(f"data/{project}/kb0.txt", "a", encoding="utf-8") as f:
+        f.write("\nThe application also accepts Parquet files.\n")
+    after = setup_from_config(project, config)
+
+    assert after.cache.namespace != before.cache.namespace
+    assert after.cache.stats()["entries"] == 0
+    assert setup_from_config(project, config).cache is after.cache
+
+
+def test_stream_replays_a_cached_answer(chain):
+    streamed = list(chain.stream({"input": "formats"}))
+    assert "".join(chunk.get("answer", "") for chunk in streamed) == "About formats"
+
+    replayed = list(chain.stream({"input": "file formats"}))
+    assert chain.chain.calls == 1
+    assert replayed == [
+        {"input": "file formats", "context": ["doc"], "answer": "About formats"}
+    ]
+
+
+def test_astream_replays_a_cached_answer(chain):
+    async def stream(query):
+        return [chunk async for chunk in chain.astream({"input": query})]
+
+    asyncio.run(stream("formats"))
+    replayed = asyncio.run(stream("file formats"))
+
+    assert chain.chain.calls == 1
+    assert replayed == [
+        {"input": "file formats", "context": ["doc"], "answer": "About formats"}
+    ]
@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from ragbot.utils import cache
+from ragbot.utils.cache import DEFAULT_CACHE_PATH, CachedEmbeddings
+
+# Size of a stored 4-dimensional float32 vector
+VECTOR_BYTES = 16
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Deterministic fake embeddings recording the embedded texts."""
+
+    embedded: list = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return super().embed_query(text)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Keep the cache file under a temporary `data/.cache`."""
+    monkeypatch.chdir(tmp_path)
+    # Each access is one tick later, so that LRU order is deterministic
+    ticks = itertools.count()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def cached(provider="fake", model_id="4", **kwargs) -> CachedEmbeddings:
+    return CachedEmbeddings(
+        CountingEmbedding(size=4, embedded=[]), provider, model_id, **kwargs
+    )
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    embeddings = cached()
+    first = embeddings.embed_documents(["a", "b", "a"])
+    second = embeddings.embed_documents(["b", "c"])
+
+    assert (tmp_path / DEFAULT_CACHE_PATH).exists()
+    assert embeddings.embeddings.embedded == ["a", "b", "c"]
+    assert first[0] == first[2]
+    assert second[0] == pytest.approx(first[1])
+    stats = embeddings.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 3, 3)
+    assert stats["hit_rate"] == pytest.approx(2 / 5)
+
+    # The cache file outlives the wrapper
+    reopened = cached()
+    assert reopened.embed_documents(["c"])[0] == pytest.approx(second[1])
+    assert reopened.embeddings.embedded == []
+    assert (reopened.hits, reopened.misses) == (1, 0)
+
+
+def test_keys_separate_provider_model_and_kind():
+    embeddings = cached()
+    document = embeddings.embed_documents(["text"])[0]
+    embeddings.embed_query("text")
+    other_model = cached(model_id="other")
+    other_model.embed_documents(["text"])
+    other_provider = cached(provider="other")
+    other_provider.embed_documents(["text"])
+
+    assert embeddings.embeddings.embedded == ["text", "text"]
+    assert other_model.embeddings.embedded == ["text"]
+    assert other_provider.embeddings.embedded == ["text"]
+    assert embeddings.stats()["entries"] == 4
+    assert cached().embed_documents(["text"])[0] == pytest.approx(document)
+
+
+def test_least_recently_used_vectors_are_evicted():
+    embeddings = cached(max_size_mb=3 * VECTOR_BYTES / (1024 * 1024))
+    embeddings.embed_documents(["a", "b", "c"])
+    # Reading "a" makes "b" the least recently used
+    embeddings.embed_documents(["a"])
+    embeddings.embed_documents(["d"])
+
+    stats = embeddings.stats()
+    assert stats["entries"] == 3 and stats["size_mb"] * 1024 * 1024 == 48
+    embeddings.embeddings.embedded.clear()
+    embeddings.embed_documents(["a", "c", "d"])
+    assert embeddings.embeddings.embedded == []
+    embeddings.embed_documents(["b"])
+    assert embeddings.embeddings.embedded == ["b"]
+
+
+def test_async_calls_use_the_cache():
+    embeddings = cached()
+    embeddings.embed_documents(["a"])
+    embeddings.embed_query("q")
+
+    async def embed():
+        return await asyncio.gather(
+            embeddings.aembed_documents(["a", "b"]),
+            embeddings.aembed_query("q"),
+            embeddings.aembed_query("q"),
+        )
+
+    documents, query, again = asyncio.run(embed())
+
+    assert embeddings.embeddings.embedded == ["a", "q", "b"]
+    assert documents[0] == pytest.approx(embeddings.embed_documents(["a"])[0])
+    assert query == again
+    assert embeddings.hits == 4 and embeddings.misses == 3
@@ -0,0 +1,53 @@
+import pytest
+
+from ragbot.chat import format_stats, stream_answer
+from ragbot.rag import setup_from_config
+
+QUESTION = {"input": "What file formats are supported?", "history": []}
+
+
+@pytest.fixture
+def qa(project, offline_config):
+    """The offline RAG chain of the example project."""
+    return setup_from_config(project, offline_config)
+
+
+def test_streamed_chunks_make_the_answer(qa, offline_config):
+    tokens = []
+
+    response, stats = stream_answer(qa, QUESTION, tokens.append)
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == response["answer"] == offline_config["llm"]
+    assert len(response["context"]) == offline_config["k_docs"]
+    assert 0 < stats["retrieval"] <= stats["first_token"]
+    assert stats["tokens_per_second"] > 0
+
+
+def test_cached_answer_is_streamed_at_once(project, offline_config):
+    config = {**offline_config, "answer_cache": {"threshold": 0.95}}
+    qa = setup_from_config(project, config)
+    stream_answer(qa, QUESTION, lambda token: None)
+    tokens = []
+
+    response, stats = stream_answer(qa, QUESTION, tokens.append)
+
+    assert tokens == [offline_config["llm"]]
+    assert response["answer"] == offline_config["llm"]
+    assert stats["retrieval"] == pytest.approx(stats["first_token"], abs=0.01)
+    # Nothing was generated after the first token
+    assert stats["tokens_per_second"] is None
+    assert qa.cache.stats()["hits"] == 1
+
+
+def test_format_stats():
+    stats = {"retrieval": 0.0123, "first_token": 0.25, "tokens_per_second": 41.26}
+    assert (
+        format_stats(stats) == "[retrieval 12 ms | first token 250 ms | ~41.3 tokens/s]"
+    )
+    assert format_stats({**stats, "cache_hit_rate": 0.5}).endswith(
+        " | cache hit rate 50%]"
+    )
+
+    missing = {"retrieval": None, "first_token": None, "tokens_per_second": None}
+    assert format_stats(missing) == "[]"
@@ -0,0 +1,94 @@
+import os
+import random
+
+import pytest
+
+from ragbot.chunking import (
+    READ_BLOCK_SIZE,
+    file_hash,
+    get_text_splitter,
+    split_file,
+    split_files,
+)
+from ragbot.utils.stages import StageStats
+
+
+def paragraphs(seed: int, size: int) -> str:
+    """Build a text of about `size` characters of paragraphs of varied lengths."""
+    rng = random.Random(seed)
+    parts = []
+    while sum(map(len, parts)) < size:
+        words = [f"word{rng.randrange(1000)}" for _ in range(rng.randrange(5, 200))]
+        parts.append(" ".join(words) + rng.choice(["\n\n", "\n", ". "]))
+    return "".join(parts)
+
+
+@pytest.fixture
+def files(tmp_path):
+    """A file larger than a read block, and two small files."""
+    texts = {
+        "large.txt": paragraphs(0, 2 * READ_BLOCK_SIZE + READ_BLOCK_SIZE // 3),
+        "small.txt": paragraphs(1, 5000),
+        "tiny.txt": "A single line.",
+    }
+    for name, text in texts.items():
+        (tmp_path / name).write_text(text, encoding="utf-8")
+    return {str(tmp_path / name): text for name, text in texts.items()}
+
+
+def collect(chunks) -> list[tuple]:
+    return [
+        (file, [(doc.id, doc.metadata, doc.page_content) for doc in docs])
+        for file, docs in chunks
+    ]
+
+
+def test_start_index_matches_the_source_across_blocks(files):
+    file = next(iter(files))
+    text = files[file]
+    docs = list(split_file(file, get_text_splitter(3000, 600), block_size=10000))
+
+    assert len(text) > 10000 * 100
+    for doc in docs:
+        start = doc.metadata["start_index"]
+        assert text[start : start + len(doc.page_content)] == doc.page_content
+    # Chunks cover the whole file in order, leaving out only whitespace
+    starts = [doc.metadata["start_index"] for doc in docs]
+    ends = [start + len(doc.page_content) for start, doc in zip(starts, docs)]
+    assert starts == sorted(starts)
+    assert all(not text[end:start].strip() for start, end in zip(starts[1:], ends))
+    assert not text[ends[-1] :].strip()
+
+
+def test_small_file_is_split_as_a_whole(files):
+    file = list(files)[1]
+    splitter = get_text_splitter(1000, 200)
+    docs = list(split_file(file, splitter))
+
+    expected = splitter.create_documents([files[file]])
+    assert [doc.page_content for doc in docs] == [doc.page_content for doc in expected]
+    assert [doc.metadata["start_index"] for doc in docs] == [
+        doc.metadata["start_index"] for doc in expected
+    ]
+    digest = file_hash(file)[:12]
+    assert [doc.id for doc in docs] == [
+        f"small.txt-{digest}-{i}" for i in range(len(docs))
+    ]
+
+
+def test_workers_give_the_same_chunks(files):
+    stats = StageStats(workers=2, unit="files")
+    serial = collect(split_files(list(files), 3000, 600, workers=1))
+    parallel = collect(split_files(list(files), 3000, 600, workers=2, stats=stats))
+
+    assert parallel == serial
+    assert [file for file, _ in serial] == list(files)
+    assert stats.items == 3
+    assert stats.bytes == sum(os.path.getsize(file) for file in files)
+    # The large file spans several read blocks in the workers too
+    file, chunks = serial[0]
+    text = files[file]
+    for _, metadata, content in chunks:
+        start = metadata["start_index"]
+        assert text[start : start + len(content)] == content
+    assert chunks[-1][1]["start_index"] > READ_BLOCK_SIZE * 2
@@ -0,0 +1,138 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import huggingface_hub
+import pytest
+
+from ragbot.utils.clients import clear_clients, client_stats, get_client
+from ragbot.utils.connections import http_pool, use_huggingface_pool
+from ragbot.utils.utils import get_embeddings, get_model
+
+
+class OllamaHandler(BaseHTTPRequestHandler):
+    """Keep-alive HTTP server answering every Ollama chat request with one message."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(
+            {
+                "model": "fake",
+                "created_at": "2026-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": "pong"},
+                "done": True,
+                "done_reason": "stop",
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    clear_clients()
+    yield
+    clear_clients()
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OllamaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_client_builds_each_key_once():
+    built = []
+
+    def create(name):
+        built.append(name)
+        return object()
+
+    first = get_client(("model", "a"), lambda: create("a"))
+    assert get_client(("model", "a"), lambda: create("a")) is first
+    assert get_client(("model", "b"), lambda: create("b")) is not first
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(
+            executor.map(
+                lambda _: get_client(("model", "c"), lambda: create("c")), range(16)
+            )
+        )
+    assert len(set(map(id, clients))) == 1
+    assert built == ["a", "b", "c"]
+
+    stats = client_stats()
+    assert (stats["clients"], stats["created"], stats["reused"]) == (3, 3, 16)
+    assert stats["per_client"]["model/a"] == {"created": 1, "reused": 1}
+
+
+def test_clear_clients_resets_stats_and_pools():
+    get_client(("model", "a"), object)
+    pool = http_pool("ollama")
+    clear_clients()
+
+    stats = client_stats()
+    assert (stats["clients"], stats["created"], stats["per_client"]) == (0, 0, {})
+    assert stats["connections"] == {}
+    assert http_pool("ollama") is not pool
+
+
+def test_clients_of_a_provider_share_connections(server):
+    pool = http_pool("ollama")
+    for _ in range(3):
+        # Closing a client leaves the shared pool open
+        with httpx.Client(transport=pool.transport) as client:
+            assert client.post(f"{server}/api/chat", content=b"{}").status_code == 200
+
+    assert client_stats()["connections"]["ollama"] == {
+        "requests": 3,
+        "connections": 1,
+        "reuse_rate": pytest.approx(2 / 3),
+    }
+
+
+def test_ollama_models_send_requests_through_the_pool(server, monkeypatch):
+    monkeypatch.setenv("OLLAMA_HOST", server)
+    cold = get_model("ollama", "fake", temperature=0.0)
+    warm = get_model("ollama", "fake", temperature=0.5)
+
+    assert cold.invoke("ping").content == "pong"
+    assert warm.invoke("ping").content == "pong"
+    assert get_model("ollama", "fake", temperature=0.0) is cold
+
+    stats = client_stats()
+    assert stats["created"] == 2 and stats["reused"] == 1
+    assert stats["connections"]["ollama"]["requests"] == 2
+    assert stats["connections"]["ollama"]["connections"] == 1
+
+
+def test_huggingface_session_uses_the_pool(server):
+    use_huggingface_pool()
+    session = huggingface_hub.get_session()
+    assert session._transport is http_pool("hf").transport
+    assert session.post(f"{server}/api/chat", content=b"{}").status_code == 200
+    assert client_stats()["connections"]["hf"]["requests"] == 1
+
+
+def test_google_models_share_one_channel(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    chat = get_model("google", "gemini-1.5-flash", temperature=0.0)
+    other = get_model("google", "gemini-1.5-pro", temperature=0.0)
+    embeddings = get_embeddings("google", "models/embedding-001", cache=False)
+
+    assert chat.client is other.client is embeddings.client
+    assert client_stats()["connections"]["google"]["connections"] == 0
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+
+from ragbot.evaluate import evaluate_config
+from ragbot.evaluation.dataset_schema import Sample
+from ragbot.evaluation.metrics.combined_judge import CombinedJudge
+
+VERDICTS = {"faithfulness": 5, "answer_relevance": 4, "context_relevance": 3}
+SAMPLE = Sample(
+    question="Which file formats are supported?",
+    answer="CSV files.",
+    retrieved_context=["The application accepts files in CSV format."],
+)
+
+
+def judge(*responses: str, **kwargs) -> CombinedJudge:
+    metric = CombinedJudge(**kwargs)
+    metric.llm = FakeListChatModel(responses=list(responses))
+    return metric
+
+
+@pytest.mark.parametrize(
+    "output",
+    [
+        json.dumps(VERDICTS),
+        f"```json\n{json.dumps(VERDICTS)}\n```",
+        json.dumps({**VERDICTS, "comment": "Mostly supported"}),
+    ],
+)
+def test_parse_valid_output(output):
+    assert CombinedJudge.parse(output) == VERDICTS
+
+
+@pytest.mark.parametrize(
+    "output, error",
+    [
+        ("Faithfulness: 5", "not valid JSON"),
+        ('{"faithfulness": 5, "answer_relevance": 4', "not valid JSON"),
+        ("[5, 4, 3]", "not a JSON object"),
+        (json.dumps({"faithfulness": 5, "answer_relevance": 4}), "no integer"),
+        (json.dumps({**VERDICTS, "faithfulness": "5"}), "no integer"),
+        (json.dumps({**VERDICTS, "faithfulness": True}), "no integer"),
+        (json.dumps({**VERDICTS, "answer_relevance": 4.5}), "no integer"),
+        (json.dumps({**VERDICTS, "context_relevance": 0}), "out of range"),
+        (json.dumps({**VERDICTS, "context_relevance": 6}), "out of range"),
+    ],
+)
+def test_parse_rejects_invalid_output(output, error):
+    with pytest.raises(ValueError, match=error):
+        CombinedJudge.parse(output)
+
+
+def test_scores_are_named_after_the_separate_metrics():
+    metric = judge(json.dumps(VERDICTS))
+
+    assert metric.score(SAMPLE) == {
+        "faithfulness": 5,
+        "answer relevance": 4,
+        "context relevance": 3,
+    }
+    assert metric.fallbacks == 0
+
+
+def test_unparsable_output_falls_back_to_the_separate_metrics():
+    # The separate metrics answer with the following responses, in order
+    metric = judge("I would rate it highly.", "2", "3", "4")
+
+    assert metric.score(SAMPLE) == {
+        "faithfulness": 2,
+        "answer relevance": 3,
+        "context relevance": 4,
+    }
+    assert metric.fallbacks == 1
+
+
+def test_async_fallback_scores_each_metric():
+    metric = judge("Not JSON", "1", "1", "1")
+
+    scores = asyncio.run(metric.ascore(SAMPLE))
+
+    assert scores == {"faithfulness": 1, "answer relevance": 1, "context relevance": 1}
+    assert metric.fallbacks == 1
+
+
+def test_agreement_compares_both_modes():
+    metric = judge(json.dumps(VERDICTS), "5", "2", "3", agreement=True)
+
+    scores = metric.score(SAMPLE)
+
+    assert scores["faithfulness (separate)"] == 5
+    assert scores["judge agreement"] == pytest.approx(2 / 3)
+    assert scores["judge deviation"] == pytest.approx(2 / 3)
+    assert metric.fallbacks == 0
+
+
+def test_evaluation_reports_the_fallbacks(project, offline_config, tmp_path, capsys):
+    # The fake judge answers "5", a valid verdict of the separate metrics only
+    config = {**offline_config, "judge_mode": "combined"}
+
+    summary = evaluate_config(
+        project,
+        config,
+        "example",
+        dataset_path=f"data/{project}/dataset.jsonl",
+        output_path=str(tmp_path / "results.jsonl"),
+    )
+
+    assert summary["judge fallbacks"] == 4
+    assert summary["faithfulness"] == 5
+    assert "Combined judge: 4 fallbacks to separate metrics" in capsys.readouterr().out
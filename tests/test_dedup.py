@@ -0,0 +1,116 @@
+import glob
+import json
+import os
+import random
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from ragbot.dedup import DEDUP_FILE, MinHashIndex
+from ragbot.indexing import index_path, index_settings, read_manifest, update_index
+
+SETTINGS = index_settings(3000, 600, "fake", "16", dedup_threshold=0.8)
+
+
+def words(seed: int, count: int = 200) -> str:
+    rng = random.Random(seed)
+    return " ".join(f"word{rng.randrange(5000)}" for _ in range(count))
+
+
+BOILERPLATE = words(0)
+# One edited word changes at most three of its shingles
+VARIANT = BOILERPLATE.replace(BOILERPLATE.split()[100], "edited", 1)
+
+
+@pytest.fixture
+def corpus(project):
+    """Replace the example knowledge base with two near-duplicates and a distinct file."""
+    for file in glob.glob(f"data/{project}/kb*.txt"):
+        os.remove(file)
+    texts = {"a.txt": BOILERPLATE, "b.txt": VARIANT, "c.txt": words(1)}
+    for name, text in texts.items():
+        with open(f"data/{project}/{name}", "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def update():
+        vectorstore, stats = update_index(
+            project, SETTINGS, DeterministicFakeEmbedding(size=16)
+        )
+        return vectorstore, stats, read_manifest(index_path(project, SETTINGS))
+
+    return update
+
+
+def representative(manifest: dict) -> tuple[str, str]:
+    """Return the file whose chunk was kept, and the file merged into it."""
+    kept, merged = sorted(
+        ("a.txt", "b.txt"), key=lambda n: len(manifest[n]["duplicates"])
+    )
+    return kept, merged
+
+
+def test_near_duplicates_are_merged_and_distinct_chunks_kept(corpus):
+    vectorstore, stats, manifest = corpus()
+    kept, merged = representative(manifest)
+
+    assert stats["duplicates"] == 1
+    assert manifest[merged]["chunk_ids"] == []
+    [(chunk_id, duplicate)] = manifest[merged]["duplicates"].items()
+    assert duplicate["of"] == manifest[kept]["chunk_ids"][0]
+    assert duplicate["similarity"] >= SETTINGS["dedup_threshold"]
+    assert manifest["c.txt"]["duplicates"] == {}
+    assert set(vectorstore.get()["ids"]) == set(
+        manifest[kept]["chunk_ids"] + manifest["c.txt"]["chunk_ids"]
+    )
+    assert chunk_id not in vectorstore.get()["ids"]
+
+
+def test_merged_chunk_lists_every_source(corpus, project):
+    # A third copy is merged into the same chunk
+    with open(f"data/{project}/d.txt", "w", encoding="utf-8") as f:
+        f.write(BOILERPLATE)
+    vectorstore, stats, manifest = corpus()
+    kept = next(n for n in "abd" if manifest[f"{n}.txt"]["chunk_ids"]) + ".txt"
+    [chunk_id] = manifest[kept]["chunk_ids"]
+
+    assert stats["duplicates"] == 2
+    metadata = vectorstore.get(ids=[chunk_id])["metadatas"][0]
+    sources = json.loads(metadata["duplicates"])
+    copies = {"a.txt", "b.txt", "d.txt"} - {kept}
+    assert {source["source"] for source in sources} == copies
+    assert all(source["start_index"] == 0 for source in sources)
+    [distinct] = vectorstore.get(ids=manifest["c.txt"]["chunk_ids"])["metadatas"]
+    assert not distinct.get("duplicates")
+
+
+def test_deleting_the_representative_requeues_its_duplicates(corpus, project):
+    _, _, before = corpus()
+    kept, merged = representative(before)
+    os.remove(f"data/{project}/{kept}")
+    vectorstore, stats, after = corpus()
+
+    assert stats["deleted"] == 1 and stats["requeued"] == 1
+    assert stats["duplicates"] == 0 and stats["embedded"] == 1
+    assert kept not in after
+    assert after[merged]["duplicates"] == {}
+    assert set(vectorstore.get()["ids"]) == set(
+        after[merged]["chunk_ids"] + after["c.txt"]["chunk_ids"]
+    )
+    [metadata] = vectorstore.get(ids=after[merged]["chunk_ids"])["metadatas"]
+    assert not metadata.get("duplicates")
+
+
+def test_minhash_index_round_trip(tmp_path):
+    index = MinHashIndex(0.8)
+    for key, text in {"a": BOILERPLATE, "c": words(1)}.items():
+        index.add(key, index.signature(text))
+    index.save(str(tmp_path / DEDUP_FILE))
+
+    loaded = MinHashIndex.load(str(tmp_path / DEDUP_FILE), 0.8)
+    assert len(loaded) == 2
+    assert (loaded.bands, loaded.rows) == (index.bands, index.rows)
+    assert (loaded.signature(BOILERPLATE) == index.signature(BOILERPLATE)).all()
+    assert loaded.query(loaded.signature(VARIANT))[0] == "a"
+    assert loaded.query(loaded.signature(words(2))) is None
+    assert MinHashIndex.load(str(tmp_path / DEDUP_FILE), 0.9) is None
+    assert MinHashIndex.load(str(tmp_path / "missing.npz"), 0.8) is None
@@ -0,0 +1,150 @@
+import argparse
+import json
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from ragbot import indexing
+from ragbot.cli import index_build_command, index_drop_command, index_status_command
+from ragbot.indexing import (
+    index_key,
+    index_settings,
+    index_status,
+    load_index,
+    update_index,
+)
+from ragbot.rag import get_vectorstore
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Deterministic fake embeddings counting the embedded documents."""
+
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def settings(offline_config):
+    return index_settings(
+        offline_config["chunk_size"],
+        offline_config["chunk_overlap"],
+        offline_config["embeddings_provider"],
+        offline_config["embedding_model"],
+    )
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Record the files whose content is hashed."""
+    files = []
+    file_hash = indexing.file_hash
+
+    def record(file):
+        files.append(file)
+        return file_hash(file)
+
+    monkeypatch.setattr(indexing, "file_hash", record)
+    return files
+
+
+def test_second_setup_loads_without_embedding(project, settings, hashed):
+    embeddings = CountingEmbedding(size=768)
+    update_index(project, settings, embeddings)
+    assert embeddings.embedded > 0
+    hashed.clear()
+
+    warm = CountingEmbedding(size=768)
+    vectorstore = load_index(project, settings, warm)
+
+    assert vectorstore is not None and vectorstore._collection.count() > 0
+    assert warm.embedded == 0
+    # A warm start compares sizes and modification times, and hashes nothing
+    assert hashed == []
+
+
+def test_edited_file_is_the_only_one_hashed(project, settings, hashed):
+    update_index(project, settings, CountingEmbedding(size=768))
+    with open("data/example/kb3.txt", "a", encoding="utf-8") as f:
+        f.write("\nA new paragraph.\n")
+    hashed.clear()
+
+    assert load_index(project, settings, CountingEmbedding(size=768)) is None
+    assert hashed == ["data/example/kb3.txt"]
+
+
+def test_get_vectorstore_reuses_the_index(project, offline_config, capsys):
+    def vectorstore():
+        return get_vectorstore(
+            project_name=project,
+            embeddings_provider=offline_config["embeddings_provider"],
+            embedding_model=offline_config["embedding_model"],
+            chunk_size=offline_config["chunk_size"],
+            chunk_overlap=offline_config["chunk_overlap"],
+        )
+
+    first = vectorstore()._collection.count()
+    assert "embed" in capsys.readouterr().out
+    # The persisted index is opened without splitting nor embedding any file
+    assert vectorstore()._collection.count() == first
+    assert capsys.readouterr().out == ""
+
+
+def test_settings_change_gives_a_new_key(settings):
+    other = {**settings, "chunk_size": settings["chunk_size"] // 2}
+
+    assert index_key(settings) != index_key(other)
+    assert index_key(settings) == index_key(dict(reversed(list(settings.items()))))
+
+
+def test_drop_removes_only_that_key(project, settings, capsys):
+    other = {**settings, "chunk_size": 1500, "chunk_overlap": 300}
+    for each in (settings, other):
+        update_index(project, each, CountingEmbedding(size=768))
+
+    status = {index["key"]: index for index in index_status(project)}
+    assert set(status) == {index_key(settings), index_key(other)}
+    assert all(index["fresh"] and index["complete"] for index in status.values())
+
+    index_drop_command(argparse.Namespace(proj=project, key=index_key(other)))
+    assert capsys.readouterr().out == f"Dropped index {index_key(other)}\n"
+    assert [index["key"] for index in index_status(project)] == [index_key(settings)]
+    with pytest.raises(ValueError):
+        indexing.drop_index(project, index_key(other))
+
+
+def test_index_commands(project, offline_config, tmp_path, capsys):
+    config_path = tmp_path / "offline.json"
+    config_path.write_text(json.dumps(offline_config))
+    build = argparse.Namespace(
+        proj=project,
+        config_path=str(config_path),
+        force=False,
+        batch_size=None,
+        workers=None,
+        chunking_workers=None,
+    )
+
+    index_build_command(build)
+    built = capsys.readouterr().out
+    key = index_key(
+        index_settings(
+            offline_config["chunk_size"],
+            offline_config["chunk_overlap"],
+            offline_config["embeddings_provider"],
+            offline_config["embedding_model"],
+        )
+    )
+    assert f"{key}  fresh" in built
+
+    with open("data/example/kb0.txt", "a", encoding="utf-8") as f:
+        f.write("\nEdited.\n")
+    index_status_command(argparse.Namespace(proj=project))
+    assert f"{key}  stale" in capsys.readouterr().out
+
+    index_drop_command(argparse.Namespace(proj=project, key=None))
+    assert capsys.readouterr().out == f"Dropped index {key}\n"
+    index_status_command(argparse.Namespace(proj=project))
+    assert capsys.readouterr().out == f"No indexes for project {project}\n"
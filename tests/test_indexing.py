@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from ragbot.indexing import (
+    index_path,
+    index_settings,
+    read_manifest,
+    update_index,
+)
+from ragbot.utils.utils import get_embeddings
+
+
+@pytest.fixture
+def index(project, offline_config):
+    """Update the example project's index with the offline fake embeddings."""
+    settings = index_settings(
+        offline_config["chunk_size"],
+        offline_config["chunk_overlap"],
+        offline_config["embeddings_provider"],
+        offline_config["embedding_model"],
+    )
+    embeddings = get_embeddings(
+        offline_config["embeddings_provider"],
+        offline_config["embedding_model"],
+        cache=False,
+    )
+    path = index_path(project, settings)
+
+    def update():
+        vectorstore, stats = update_index(project, settings, embeddings)
+        return vectorstore, stats, read_manifest(path)
+
+    return update
+
+
+def stored_ids(vectorstore) -> set[str]:
+    return set(vectorstore.get()["ids"])
+
+
+def chunk_ids(manifest: dict, *names: str) -> set[str]:
+    return {chunk_id for name in names for chunk_id in manifest[name]["chunk_ids"]}
+
+
+def test_first_build_embeds_every_file(index):
+    vectorstore, stats, manifest = index()
+
+    assert stats["added"] == len(manifest) == 9
+    assert stats["embedded"] == stats["chunks"] == len(stored_ids(vectorstore))
+    assert stored_ids(vectorstore) == chunk_ids(manifest, *manifest)
+
+
+def test_unchanged_corpus_embeds_nothing(index):
+    _, _, before = index()
+    vectorstore, stats, after = index()
+
+    assert stats["embedded"] == 0
+    assert (stats["added"], stats["modified"], stats["deleted"]) == (0, 0, 0)
+    assert stats["unchanged"] == 9
+    assert after == before
+    assert stored_ids(vectorstore) == chunk_ids(after, *after)
+
+
+def test_added_file_embeds_only_its_chunks(index):
+    _, _, before = index()
+    with open("data/example/kb9.txt", "w", encoding="utf-8") as f:
+        f.write("Exports are written as CSV files.\n" * 200)
+    vectorstore, stats, after = index()
+
+    assert stats["added"] == 1 and stats["unchanged"] == 9
+    assert stats["embedded"] == len(after["kb9.txt"]["chunk_ids"]) > 1
+    assert {name: after[name] for name in before} == before
+    assert stored_ids(vectorstore) == chunk_ids(after, *after)
+
+
+def test_modified_file_replaces_its_chunks(index):
+    _, _, before = index()
+    with open("data/example/kb0.txt", "a", encoding="utf-8") as f:
+        f.write("\nThe API also accepts Parquet files.\n")
+    vectorstore, stats, after = index()
+
+    assert stats["modified"] == 1 and stats["unchanged"] == 8
+    assert stats["embedded"] == len(after["kb0.txt"]["chunk_ids"])
+    assert chunk_ids(before, "kb0.txt").isdisjoint(stored_ids(vectorstore))
+    assert chunk_ids(after, "kb0.txt") <= stored_ids(vectorstore)
+    assert stored_ids(vectorstore) == chunk_ids(after, *after)
+    stored = vectorstore.get(ids=sorted(chunk_ids(after, "kb0.txt")))
+    assert any("Parquet" in text for text in stored["documents"])
+
+
+def test_deleted_file_removes_its_chunks_and_entry(index):
+    _, _, before = index()
+    os.remove("data/example/kb8.txt")
+    vectorstore, stats, after = index()
+
+    assert stats["deleted"] == 1 and stats["embedded"] == 0
+    assert "kb8.txt" not in after
+    assert chunk_ids(before, "kb8.txt").isdisjoint(stored_ids(vectorstore))
+    assert stored_ids(vectorstore) == chunk_ids(after, *after)
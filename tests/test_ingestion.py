@@ -0,0 +1,113 @@
+import json
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from ragbot.indexing import COLLECTION_NAME
+from ragbot.ingestion import ingest, read_checkpoint
+from ragbot.retrieval.chroma import ChromaStore
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Deterministic fake embeddings recording the size of every request."""
+
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def embeddings():
+    return CountingEmbedding(size=16, calls=[])
+
+
+@pytest.fixture
+def vectorstore(tmp_path, embeddings):
+    return ChromaStore(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings,
+        persist_directory=str(tmp_path / "index"),
+    )
+
+
+def make_docs(count):
+    return [
+        Document(page_content=f"chunk {i}", metadata={"source": "kb.txt"}, id=f"c{i}")
+        for i in range(count)
+    ]
+
+
+def stored_ids(vectorstore):
+    return sorted(vectorstore.get()["ids"])
+
+
+def test_ingest_batches_and_counts(vectorstore, embeddings):
+    docs = make_docs(10)
+    embedded = ingest(vectorstore, iter(docs), embeddings, batch_size=4, workers=2)
+
+    assert embedded == 10
+    assert sorted(embeddings.calls) == [2, 4, 4]
+    assert stored_ids(vectorstore) == sorted(doc.id for doc in docs)
+
+
+def test_ingest_stores_deterministic_vectors(vectorstore, embeddings):
+    docs = make_docs(3)
+    ingest(vectorstore, docs, embeddings, batch_size=2)
+
+    stored = vectorstore.get(ids=["c1"], include=["embeddings", "documents"])
+    assert stored["documents"] == ["chunk 1"]
+    assert list(stored["embeddings"][0]) == pytest.approx(
+        embeddings.embed_query("chunk 1")
+    )
+
+
+def test_ingest_upsert_is_idempotent(vectorstore, embeddings):
+    docs = make_docs(5)
+    ingest(vectorstore, docs, embeddings, batch_size=2)
+    embedded = ingest(vectorstore, docs, embeddings, batch_size=2)
+
+    assert embedded == 5
+    assert stored_ids(vectorstore) == sorted(doc.id for doc in docs)
+
+
+def test_ingest_writes_checkpoint(tmp_path, vectorstore, embeddings):
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    ingest(
+        vectorstore,
+        make_docs(5),
+        embeddings,
+        batch_size=2,
+        checkpoint_path=str(checkpoint),
+    )
+
+    assert read_checkpoint(str(checkpoint)) == {f"c{i}" for i in range(5)}
+
+
+def test_read_checkpoint_ignores_torn_last_line(tmp_path):
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    checkpoint.write_text(json.dumps(["c0", "c1"]) + "\n" + '["c2", "c')
+
+    assert read_checkpoint(str(checkpoint)) == {"c0", "c1"}
+    assert read_checkpoint(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_ingest_resumes_from_checkpoint(tmp_path, vectorstore, embeddings):
+    docs = make_docs(6)
+    checkpoint = tmp_path / "checkpoint.jsonl"
+
+    # A partial run wrote the first batch, then died while writing the second
+    ingest(vectorstore, docs[:2], embeddings, checkpoint_path=str(checkpoint))
+    with open(checkpoint, "a", encoding="utf-8") as f:
+        f.write('["c2", "c')
+    embeddings.calls.clear()
+
+    embedded = ingest(
+        vectorstore, docs, embeddings, batch_size=2, checkpoint_path=str(checkpoint)
+    )
+
+    assert embedded == 4
+    assert sum(embeddings.calls) == 4
+    assert stored_ids(vectorstore) == sorted(doc.id for doc in docs)
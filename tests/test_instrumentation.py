@@ -0,0 +1,138 @@
+import pytest
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
+
+from ragbot.rag import setup_from_config
+from ragbot.utils.instrumentation import (
+    BUCKETS,
+    METRIC_NAME,
+    Histogram,
+    StageTimer,
+    observe,
+    prometheus_text,
+    reset_histograms,
+    stage_histograms,
+)
+
+
+class FixedRetriever(BaseRetriever):
+    """Retriever returning the same documents for every query, or failing."""
+
+    docs: list[Document] = []
+    fail: bool = False
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        if self.fail:
+            raise RuntimeError("index unavailable")
+        return self.docs
+
+
+@pytest.fixture(autouse=True)
+def histograms():
+    reset_histograms()
+    yield
+    reset_histograms()
+
+
+def test_bucket_counts_use_upper_bounds():
+    histogram = Histogram()
+    for seconds in (0.0001, 0.0005, 0.0007, 0.003, 0.003, 100.0):
+        histogram.observe(seconds)
+
+    # A bucket counts the observations up to and including its bound
+    assert histogram.counts[:4] == [2, 1, 0, 2]
+    assert histogram.counts[-1] == 1
+    assert histogram.count == 6 and histogram.sum == pytest.approx(100.0073)
+    buckets = histogram.as_dict()["buckets"]
+    assert buckets["0.0005"] == 2 and buckets["0.005"] == 5
+    assert buckets["60.0"] == 5 and buckets["+Inf"] == 6
+    assert list(buckets) == [*map(str, BUCKETS), "+Inf"]
+
+
+def test_quantiles_interpolate_within_buckets():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) == 0.0
+    for _ in range(10):
+        histogram.observe(0.003)
+    for _ in range(10):
+        histogram.observe(0.2)
+
+    # The first half of the observations fills one bucket, up to its bound
+    assert histogram.quantile(0.5) == pytest.approx(0.005)
+    assert histogram.quantile(0.25) == pytest.approx(0.0025 + 0.0025 * 0.5)
+    assert histogram.quantile(0.95) == pytest.approx(0.1 + 0.15 * 0.9)
+    summary = histogram.as_dict()
+    assert summary["p95_ms"] == pytest.approx(235.0)
+    assert summary["mean_ms"] == pytest.approx(101.5)
+
+    histogram.observe(100.0)
+    assert histogram.quantile(1.0) == BUCKETS[-1]
+
+
+def test_prometheus_text_format():
+    observe("retrieval", 0.003)
+    observe("retrieval", 0.2)
+    observe('llm "generation"', 1.5)
+
+    lines = prometheus_text().splitlines()
+
+    assert lines[:2] == [
+        f"# HELP {METRIC_NAME} Latency of the stages of the RAG pipeline.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    assert f'{METRIC_NAME}_bucket{{stage="retrieval",le="0.005"}} 1' in lines
+    assert f'{METRIC_NAME}_bucket{{stage="retrieval",le="0.25"}} 2' in lines
+    assert f'{METRIC_NAME}_bucket{{stage="retrieval",le="+Inf"}} 2' in lines
+    assert f'{METRIC_NAME}_sum{{stage="retrieval"}} 0.203' in lines
+    assert f'{METRIC_NAME}_count{{stage="retrieval"}} 2' in lines
+    # Label values are escaped
+    assert f'{METRIC_NAME}_count{{stage="llm \\"generation\\""}} 1' in lines
+    assert len(lines) == 2 + 2 * (len(BUCKETS) + 3)
+
+
+def test_stage_timer_times_retrieval_and_generation():
+    prompt = ChatPromptTemplate.from_messages([("human", "{context} {input}")])
+    retriever = FixedRetriever(docs=[Document(page_content="CSV files.")])
+    chain = (
+        {"context": retriever, "input": RunnableLambda(lambda question: question)}
+        | prompt
+        | FakeListChatModel(responses=["CSV."])
+    ).with_config(callbacks=[StageTimer()])
+
+    assert chain.invoke("Which formats?").content == "CSV."
+    chain.invoke("Which formats?")
+
+    histograms = stage_histograms()
+    assert set(histograms) == {"retrieval", "prompt_assembly", "llm_generation"}
+    assert all(histogram["count"] == 2 for histogram in histograms.values())
+
+
+def test_stage_timer_skips_failed_runs():
+    timer = StageTimer()
+    retriever = FixedRetriever(fail=True).with_config(callbacks=[timer])
+
+    with pytest.raises(RuntimeError):
+        retriever.invoke("Which formats?")
+
+    assert stage_histograms() == {}
+    assert timer._starts == {}
+
+
+def test_rag_chain_stages(project, offline_config):
+    # The packed retriever wraps the vector store retriever, and is timed once
+    config = {**offline_config, "pack_context": True}
+    chain = setup_from_config(project, config)
+    reset_histograms()
+
+    chain.invoke({"input": "What file formats are supported?", "history": []})
+
+    histograms = stage_histograms()
+    assert histograms["retrieval"]["count"] == 1
+    assert histograms["llm_generation"]["count"] == 1
+    assert histograms["prompt_assembly"]["count"] >= 1
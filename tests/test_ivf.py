@@ -0,0 +1,41 @@
+import numpy as np
+
+from ragbot.retrieval.ivf import recall_report
+from ragbot.retrieval.numpy_store import NumpyVectorStore, normalize_rows
+
+
+def make_store(num_chunks=500, dim=16, seed=0):
+    vectors = normalize_rows(
+        np.random.default_rng(seed).standard_normal((num_chunks, dim))
+    )
+    ids = [f"c{i}" for i in range(num_chunks)]
+    return NumpyVectorStore(vectors, ids, [{} for _ in ids], None, None)
+
+
+def test_recall_report_probing_every_cluster_is_exact(tmp_path):
+    store = make_store()
+    report = recall_report(str(tmp_path), store, nprobes=[1, 16], nlist=16)
+
+    assert report["query_source"] == "perturbed chunks"
+    assert report["nprobe"][-1]["recall"] == 1.0
+    assert report["nprobe"][0]["recall"] < 1.0
+
+
+def test_recall_report_leaves_the_sampled_chunk_out(tmp_path):
+    store = make_store()
+    # Without noise each query is an indexed vector, found by every probe unless excluded
+    report = recall_report(str(tmp_path), store, nprobes=[1], nlist=16, k=1, noise=0.0)
+
+    assert report["nprobe"][0]["recall"] < 1.0
+
+
+def test_recall_report_searches_dataset_queries(tmp_path):
+    store = make_store()
+    queries = np.random.default_rng(1).standard_normal((30, 16))
+    report = recall_report(
+        str(tmp_path), store, nprobes=[16], nlist=16, num_queries=20, queries=queries
+    )
+
+    assert report["query_source"] == "dataset"
+    assert report["num_queries"] == 20
+    assert report["nprobe"][0]["recall"] == 1.0
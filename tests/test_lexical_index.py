@@ -0,0 +1,55 @@
+import os
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from ragbot.indexing import (
+    index_path,
+    index_settings,
+    load_lexical_index,
+    read_meta,
+    update_index,
+)
+from ragbot.retrieval.bm25 import BM25_FILE, load_bm25
+
+SETTINGS = index_settings(3000, 600, "fake", "16")
+
+
+def test_update_leaves_lexical_index_to_first_use(project):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    path = index_path(project, SETTINGS)
+    vectorstore, _ = update_index(project, SETTINGS, embeddings)
+    assert not os.path.exists(f"{path}/{BM25_FILE}")
+
+    bm25 = load_lexical_index(path, vectorstore)
+    assert len(bm25.ids) == vectorstore._collection.count()
+    assert load_bm25(path, read_meta(path)["fingerprint"]) is not None
+
+    with open(f"data/{project}/kb0.txt", "a", encoding="utf-8") as f:
+        f.write("\nThe E4242 error means the upload quota is exhausted.\n")
+    vectorstore, _ = update_index(project, SETTINGS, embeddings)
+
+    # The update outdated the index without rebuilding it
+    fingerprint = read_meta(path)["fingerprint"]
+    assert load_bm25(path) is not None and load_bm25(path, fingerprint) is None
+    bm25 = load_lexical_index(path, vectorstore)
+    assert bm25.fingerprint == fingerprint
+    assert bm25.top_k("E4242", 1)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "ivf"])
+def test_lexical_index_of_exported_backends(project, backend):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    path = index_path(project, SETTINGS)
+    chroma, _ = update_index(project, SETTINGS, embeddings)
+    expected = load_lexical_index(path, chroma)
+    os.remove(f"{path}/{BM25_FILE}")
+
+    vectorstore, _ = update_index(project, SETTINGS, embeddings, backend=backend)
+    bm25 = load_lexical_index(path, vectorstore)
+
+    assert sorted(bm25.ids.tolist()) == sorted(expected.ids.tolist())
+    query = "What file formats are supported?"
+    assert {bm25.id(i) for i, _ in bm25.top_k(query, 4)} == {
+        expected.id(i) for i, _ in expected.top_k(query, 4)
+    }
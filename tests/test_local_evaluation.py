@@ -0,0 +1,69 @@
+import json
+import sys
+
+import pytest
+from langsmith import utils as ls_utils
+
+from ragbot.evaluate import evaluate_config
+from ragbot.evaluation.local import load_dataset
+
+
+def test_load_dataset_assigns_ids(tmp_path):
+    path = tmp_path / "dataset.jsonl"
+    rows = [
+        {"id": "q1", "input": "Formats?", "output": "CSV", "context": ["CSV files"]},
+        {"input": "Limits?", "output": "10 MB"},
+    ]
+    path.write_text("\n".join(map(json.dumps, rows)) + "\n\n")
+
+    examples = load_dataset(str(path))
+
+    assert [example["id"] for example in examples] == ["q1", "1"]
+    assert examples[0]["outputs"] == {"output": "CSV", "context": ["CSV files"]}
+    assert examples[1]["inputs"] == {"input": "Limits?"}
+
+
+def test_load_dataset_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_dataset(str(tmp_path / "missing.jsonl"))
+    (tmp_path / "dataset.csv").write_text("input\nFormats?\n")
+    with pytest.raises(ValueError, match="Unsupported"):
+        load_dataset(str(tmp_path / "dataset.csv"))
+    (tmp_path / "dataset.jsonl").write_text(json.dumps({"output": "CSV"}))
+    with pytest.raises(ValueError, match="no input"):
+        load_dataset(str(tmp_path / "dataset.jsonl"))
+
+
+def test_parquet_without_pandas_chains_the_import_error(tmp_path, monkeypatch):
+    path = tmp_path / "dataset.parquet"
+    path.write_bytes(b"")
+    monkeypatch.setitem(sys.modules, "pandas", None)
+
+    with pytest.raises(ImportError, match="pip install pandas") as error:
+        load_dataset(str(path))
+    assert isinstance(error.value.__cause__, ImportError)
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    """Enable LangSmith tracing in the environment."""
+    monkeypatch.setenv("LANGCHAIN_TRACING_V2", "true")
+    # LangSmith caches the environment it has read
+    ls_utils.get_env_var.cache_clear()
+    yield
+    monkeypatch.undo()
+    ls_utils.get_env_var.cache_clear()
+
+
+def test_local_evaluation_disables_tracing(project, offline_config, tmp_path, tracing):
+    assert ls_utils.tracing_is_enabled()
+
+    evaluate_config(
+        project,
+        offline_config,
+        "example",
+        dataset_path=f"data/{project}/dataset.jsonl",
+        output_path=str(tmp_path / "results.jsonl"),
+    )
+
+    assert not ls_utils.tracing_is_enabled()
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from ragbot.evaluation.local import evaluate_local
+from ragbot.evaluation.metrics.base import MetricWithLLM
+from ragbot.evaluation.multi_evaluator import MultiMetricEvaluator
+
+
+@dataclass
+class LoopBoundJudge(MetricWithLLM):
+    """Judge failing outside the event loop of its first call, as gRPC clients do."""
+
+    name: str = "loop_bound"
+    loops: list = field(default_factory=list)
+
+    def prompt(self, sample):
+        return sample.question
+
+    async def ascore(self, sample, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.loops and loop is not self.loops[0]:
+            raise RuntimeError("attached to a different loop")
+        self.loops.append(loop)
+        return 1.0
+
+
+def outputs(question):
+    return {
+        "input": question,
+        "answer": "answer",
+        "context": [Document(page_content="context")],
+    }
+
+
+def test_runs_share_the_evaluator_loop():
+    judge = LoopBoundJudge()
+    evaluator = MultiMetricEvaluator([judge], llm="judge")
+    run = SimpleNamespace(outputs=outputs("question"))
+    example = SimpleNamespace(outputs={"output": "answer"})
+
+    first = evaluator.evaluate_run(run, example)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        threaded = list(executor.map(lambda _: evaluator.evaluate_run(run), range(8)))
+    awaited = asyncio.run(evaluator.aevaluate_run(run, example))
+
+    for results in [first, *threaded, awaited]:
+        assert [(r.key, r.score) for r in results["results"]] == [("loop_bound", 1.0)]
+    assert len(judge.loops) == 10 and not judge.loops[0].is_closed()
+
+
+def test_local_evaluation_shares_the_evaluator_loop(tmp_path):
+    judge = LoopBoundJudge()
+    evaluator = MultiMetricEvaluator([judge], llm="judge")
+    examples = [
+        {"id": str(i), "inputs": {"input": f"q{i}"}, "outputs": {"output": "a"}}
+        for i in range(6)
+    ]
+    target = RunnableLambda(lambda inputs: outputs(inputs["input"]))
+
+    means = evaluate_local(
+        target, examples, evaluator, str(tmp_path / "out.jsonl"), max_concurrency=3
+    )
+
+    assert means == {"loop_bound": 1.0}
+    with open(tmp_path / "out.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["scores"] for line in f] == [{"loop_bound": 1.0}] * 6
+    assert len(set(map(id, judge.loops))) == 1
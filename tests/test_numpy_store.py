@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores.utils import (
+    maximal_marginal_relevance as langchain_mmr,
+)
+
+from ragbot.indexing import COLLECTION_NAME
+from ragbot.ingestion import ingest
+from ragbot.retrieval import chunk_file
+from ragbot.retrieval.chroma import ChromaStore
+from ragbot.retrieval.mmr import maximal_marginal_relevance
+from ragbot.retrieval.numpy_store import VECTORS_FILE, NumpyVectorStore, normalize_rows
+
+
+@pytest.fixture
+def vectorstore(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    store = ChromaStore(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings,
+        persist_directory=str(tmp_path),
+    )
+    docs = [
+        Document(page_content=f"chunk {i}", metadata={"source": "kb.txt"}, id=f"c{i}")
+        for i in range(7)
+    ]
+    ingest(store, docs, embeddings, batch_size=3)
+    return store
+
+
+def test_export_reads_pages(tmp_path, vectorstore, monkeypatch):
+    monkeypatch.setattr(chunk_file, "EXPORT_PAGE_SIZE", 3)
+    store = NumpyVectorStore.export(str(tmp_path), vectorstore, "f1")
+
+    stored = vectorstore.get(include=["embeddings"])
+    expected = dict(zip(stored["ids"], normalize_rows(stored["embeddings"])))
+    assert sorted(store.ids) == sorted(expected)
+    for chunk_id, vector in zip(store.ids, store.vectors):
+        assert vector == pytest.approx(expected[chunk_id])
+    assert store.chunks.text("c4") == "chunk 4"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_export_replaces_mapped_files(tmp_path, vectorstore):
+    old = NumpyVectorStore.export(str(tmp_path), vectorstore, "f1")
+    before = np.array(old.vectors)
+    inode = os.stat(tmp_path / VECTORS_FILE).st_ino
+
+    vectorstore.delete(ids=["c0"])
+    new = NumpyVectorStore.export(str(tmp_path), vectorstore, "f2")
+
+    # The previous map still reads the previous, complete file
+    assert os.stat(tmp_path / VECTORS_FILE).st_ino != inode
+    assert np.array_equal(old.vectors, before)
+    assert len(new.ids) == 6 and new.fingerprint == "f2"
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.25, 0.5, 1.0])
+def test_mmr_matches_langchain(lambda_mult):
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=16)
+    candidates = rng.normal(size=(20, 16))
+
+    for k in (1, 4, 20, 25):
+        assert maximal_marginal_relevance(
+            query, candidates, lambda_mult=lambda_mult, k=k
+        ) == langchain_mmr(query, candidates, lambda_mult=lambda_mult, k=k)
+
+
+def test_mmr_search_returns_fetch_order(tmp_path, vectorstore):
+    store = NumpyVectorStore.export(str(tmp_path), vectorstore, "f1")
+
+    for query in ("chunk 3", "chunk 6", "anything else"):
+        fetched = [doc.id for doc in store.similarity_search(query, k=5)]
+        docs = store.max_marginal_relevance_search(query, k=3, fetch_k=5)
+        ids = [doc.id for doc in docs]
+        # The selected chunks keep the order of similarity to the query
+        assert ids == [chunk_id for chunk_id in fetched if chunk_id in ids]
+        assert len(ids) == 3
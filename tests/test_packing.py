@@ -0,0 +1,91 @@
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from ragbot.retrieval.packing import merge_chunks, pack_context
+from ragbot.utils.rate_limit import estimate_tokens
+
+TEXT = "".join(f"Sentence {i} of the guide. " for i in range(200))
+
+
+def chunk(start: int, end: int, source: str = "kb0.txt", text: str = TEXT):
+    return Document(
+        page_content=text[start:end], metadata={"source": source, "start_index": start}
+    )
+
+
+def test_overlapping_chunks_merge_into_one_passage():
+    chunks = [(1, chunk(100, 400)), (0, chunk(300, 600)), (2, chunk(600, 700))]
+
+    [(rank, passage)] = merge_chunks(chunks)
+
+    assert rank == 0
+    assert passage.page_content == TEXT[100:700]
+    assert passage.metadata == {"source": "kb0.txt", "start_index": 100}
+
+
+def test_disjoint_chunks_stay_separate():
+    merged = merge_chunks([(0, chunk(500, 600)), (1, chunk(100, 200))])
+
+    assert [(rank, doc.page_content) for rank, doc in merged] == [
+        (1, TEXT[100:200]),
+        (0, TEXT[500:600]),
+    ]
+
+
+def test_pack_context_merges_per_file_in_relevance_order():
+    other = "Another file entirely. " * 20
+    docs = [
+        chunk(300, 600),
+        chunk(0, 200, "kb1.txt", other),
+        chunk(100, 400),
+        # Contained in the first chunk, so it adds nothing
+        chunk(350, 450),
+    ]
+
+    packed = pack_context(docs)
+
+    assert [doc.page_content for doc in packed] == [TEXT[100:600], other[0:200]]
+    assert packed[0].metadata["start_index"] == 100
+
+
+def test_repeated_text_is_dropped():
+    boilerplate = "Contact support for help."
+    docs = [
+        Document(page_content=boilerplate, metadata={"source": "kb0.txt"}),
+        Document(page_content=boilerplate, metadata={"source": "kb1.txt"}),
+        chunk(0, 100),
+        chunk(0, 100),
+    ]
+
+    packed = pack_context(docs)
+
+    assert [doc.page_content for doc in packed] == [boilerplate, TEXT[0:100]]
+
+
+@pytest.mark.parametrize("max_tokens", [1, 50, 120, 400])
+def test_packed_context_stays_within_the_budget(max_tokens):
+    rng = random.Random(max_tokens)
+    docs = []
+    for _ in range(30):
+        start = rng.randrange(0, len(TEXT) - 400)
+        docs.append(
+            chunk(start, start + rng.randrange(50, 400), f"kb{rng.randrange(3)}.txt")
+        )
+
+    packed = pack_context(docs, max_tokens)
+
+    assert packed or max_tokens == 1
+    assert sum(estimate_tokens(doc.page_content) for doc in packed) <= max_tokens
+    for doc in packed:
+        start = doc.metadata["start_index"]
+        assert doc.page_content == TEXT[start : start + len(doc.page_content)]
+
+
+def test_chunk_over_the_budget_is_skipped_for_smaller_ones():
+    docs = [chunk(0, 400), chunk(1000, 1100), chunk(2000, 2040)]
+
+    packed = pack_context(docs, max_tokens=40)
+
+    assert [doc.page_content for doc in packed] == [TEXT[1000:1100], TEXT[2000:2040]]
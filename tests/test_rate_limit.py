@@ -0,0 +1,178 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ragbot.utils import rate_limit
+from ragbot.utils.rate_limit import (
+    MIN_RATE_FACTOR,
+    RECOVERY_STEP,
+    RateLimiter,
+    TokenBucket,
+    configure_rate_limits,
+    get_rate_limiter,
+    is_throttling_error,
+    retry_with_backoff,
+)
+
+
+class FakeClock:
+    """Replacement of the `time` module whose sleeps advance a fake clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty registry of limiters and limits."""
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(rate_limit, "_limits", {})
+
+
+def failing(errors: list[Exception], result: str = "done"):
+    """Return a function raising the given errors, then returning a result."""
+    calls = []
+
+    def func():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return func, calls
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(capacity=10, rate=2)
+
+    assert bucket.wait_time(10) == 0.0
+    assert bucket.wait_time(4) == pytest.approx(2.0)
+    clock.now += 1.5
+    assert bucket.wait_time(4) == pytest.approx(0.5)
+    clock.now += 100
+    # The bucket holds at most its capacity, and larger amounts are capped
+    assert bucket.wait_time(25) == 0.0
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+
+
+def test_acquire_sleeps_until_the_tokens_are_refilled(clock):
+    bucket = TokenBucket(capacity=60, rate=1)
+    bucket.acquire(60)
+    bucket.acquire(5)
+
+    assert clock.now == pytest.approx(5.0)
+
+
+def test_throttling_halves_the_rate_and_success_recovers_it(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+
+    limiter.on_throttle()
+    assert limiter.rate_factor == 0.5
+    assert limiter._requests.rate == pytest.approx(0.5)
+    for _ in range(10):
+        limiter.on_throttle()
+    assert limiter.rate_factor == MIN_RATE_FACTOR
+    assert limiter.throttled == 11
+
+    limiter.on_success()
+    assert limiter.rate_factor == pytest.approx(MIN_RATE_FACTOR + RECOVERY_STEP)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate_factor == 1.0
+    assert limiter._requests.rate == pytest.approx(1.0)
+
+
+def test_limiter_call_backs_off_on_throttling(clock):
+    limiter = RateLimiter(base_delay=1.0, max_retries=3)
+    func, calls = failing([Throttled(), Exception("Rate limit exceeded")])
+
+    assert limiter.call(func) == "done"
+    assert len(calls) == 3 and limiter.throttled == 2
+    assert 0.5 <= clock.sleeps[0] <= 1.0 and 1.0 <= clock.sleeps[1] <= 2.0
+    # Two throttles, then one success
+    assert limiter.rate_factor == pytest.approx(0.25 + RECOVERY_STEP)
+
+
+def test_is_throttling_error():
+    assert is_throttling_error(Throttled())
+    assert is_throttling_error(Exception("429 Resource has been exhausted"))
+    assert is_throttling_error(Exception("Quota exceeded for this project"))
+    assert not is_throttling_error(ValueError("Invalid model name"))
+    assert not is_throttling_error(ConnectionError("Connection refused"))
+
+
+def test_retry_with_backoff_retries_only_throttling_errors(clock):
+    func, calls = failing([Throttled(), Throttled()])
+    assert retry_with_backoff(func, base_delay=1.0, max_delay=1.5) == "done"
+    assert len(calls) == 3
+    assert 0.5 <= clock.sleeps[0] <= 1.0 and 0.75 <= clock.sleeps[1] <= 1.5
+
+    func, calls = failing([ValueError("Invalid model name")])
+    with pytest.raises(ValueError):
+        retry_with_backoff(func)
+    assert len(calls) == 1
+
+    func, calls = failing([Throttled()] * 3)
+    with pytest.raises(Throttled):
+        retry_with_backoff(func, max_retries=2)
+    assert len(calls) == 3
+
+
+def test_registry_shares_one_limiter_per_provider(registry):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        limiters = list(executor.map(lambda _: get_rate_limiter("openai"), range(32)))
+    assert len(set(map(id, limiters))) == 1
+    assert limiters[0].requests_per_minute is None
+    # Models without limits of their own share the provider's limiter
+    assert get_rate_limiter("openai", "gpt-4o") is limiters[0]
+
+
+def test_configured_limits_replace_the_limiters(registry):
+    before = get_rate_limiter("openai")
+    configure_rate_limits(
+        {
+            "openai": {"requests_per_minute": 500},
+            "openai/gpt-4o": {"tokens_per_minute": 30000},
+        }
+    )
+
+    provider = get_rate_limiter("openai")
+    assert provider is not before and provider.requests_per_minute == 500
+    model = get_rate_limiter("openai", "gpt-4o")
+    assert model is not provider and model.tokens_per_minute == 30000
+    assert get_rate_limiter("openai", "gpt-4o-mini") is provider
+
+
+def test_concurrent_configuration_and_lookups(registry):
+    limits = [{f"provider{i}": {"requests_per_minute": i + 1}} for i in range(16)]
+
+    def configure_and_get(i: int) -> RateLimiter:
+        configure_rate_limits(limits[i])
+        return get_rate_limiter(f"provider{i}")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        limiters = list(executor.map(configure_and_get, range(16)))
+
+    # Every limiter was built from the limits configured before it
+    assert [limiter.requests_per_minute for limiter in limiters] == [
+        i + 1 for i in range(16)
+    ]
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import os
+import shutil
+
+import pytest
+from langchain_core.runnables import Runnable
+
+from ragbot.rag import setup_from_config
+from ragbot.serve import ChatServer
+from ragbot.utils.utils import disable_langsmith, load_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_ANSWER = "The application accepts files in CSV format."
+
+
+@pytest.fixture(scope="module")
+def chain(tmp_path_factory):
+    """The RAG chain of the example project with the offline fake providers."""
+    disable_langsmith()
+    config = load_config(os.path.join(ROOT, "configs", "offline.json"))
+    workdir = tmp_path_factory.mktemp("serve")
+    shutil.copytree(
+        os.path.join(ROOT, "data", "example"),
+        workdir / "data" / "example",
+        ignore=shutil.ignore_patterns("index", "evaluations"),
+    )
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        yield setup_from_config("example", {**config, "llm": FAKE_ANSWER})
+    finally:
+        os.chdir(cwd)
+
+
+class GatedChain(Runnable):
+    """Chain holding every turn until its gate opens, counting the running turns."""
+
+    def __init__(self, chain: Runnable):
+        self.chain = chain
+        self.gate = asyncio.Event()
+        self.active = 0
+        self.max_active = 0
+        self.inputs = []
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.chain.invoke(input, config)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        self.inputs.append(input)
+        try:
+            await self.gate.wait()
+            return await self.chain.ainvoke(input, config)
+        finally:
+            self.active -= 1
+
+
+async def start(server: ChatServer) -> tuple[asyncio.Server, int]:
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    return listener, listener.sockets[0].getsockname()[1]
+
+
+async def request(port: int, method: str, path: str, payload: dict | None = None):
+    """Send a request and return its status, headers and raw body."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line, *lines = head.decode("latin-1").split("\r\n")
+    headers = {
+        name.strip().lower(): value.strip()
+        for name, _, value in (line.partition(":") for line in lines)
+    }
+    return int(status_line.split(" ")[1]), headers, body
+
+
+def dechunk(body: bytes) -> list[bytes]:
+    """Split a chunked transfer encoded body into its chunks."""
+    chunks = []
+    while True:
+        size, _, body = body.partition(b"\r\n")
+        size = int(size, 16)
+        if size == 0:
+            return chunks
+        chunks.append(body[:size])
+        body = body[size + 2 :]
+
+
+def test_chat_answers_with_sources(chain):
+    async def run():
+        server = ChatServer(chain)
+        listener, port = await start(server)
+        async with listener:
+            status, headers, body = await request(
+                port, "POST", "/chat", {"input": "What file formats are supported?"}
+            )
+            health = await request(port, "GET", "/health")
+        return server, status, headers, json.loads(body), json.loads(health[2])
+
+    server, status, headers, reply, health = asyncio.run(run())
+    assert status == 200
+    assert headers["content-type"] == "application/json"
+    assert reply["answer"] == FAKE_ANSWER
+    assert reply["sources"] and all("source" in source for source in reply["sources"])
+    assert server.sessions[reply["session"]].history[-1] == ("ai", FAKE_ANSWER)
+    assert health["sessions"] == 1 and health["running"] == 0
+
+
+def test_chat_streams_chunked_answer(chain):
+    async def run():
+        listener, port = await start(ChatServer(chain))
+        async with listener:
+            return await request(
+                port,
+                "POST",
+                "/chat",
+                {"input": "What file formats are supported?", "stream": True},
+            )
+
+    status, headers, body = asyncio.run(run())
+    assert status == 200
+    assert headers["transfer-encoding"] == "chunked"
+    assert headers["x-session-id"]
+    chunks = dechunk(body)
+    assert len(chunks) > 1
+    assert b"".join(chunks).decode("utf-8") == FAKE_ANSWER
+
+
+def test_chat_rejects_requests_beyond_the_queue(chain):
+    async def run():
+        gated = GatedChain(chain)
+        server = ChatServer(gated, max_concurrency=1, max_queue=1)
+        listener, port = await start(server)
+        async with listener:
+            running = asyncio.create_task(
+                request(port, "POST", "/chat", {"input": "first"})
+            )
+            while gated.active < 1:
+                await asyncio.sleep(0.01)
+            waiting = asyncio.create_task(
+                request(port, "POST", "/chat", {"input": "second"})
+            )
+            while server.waiting < 1:
+                await asyncio.sleep(0.01)
+            rejected = await request(port, "POST", "/chat", {"input": "third"})
+            gated.gate.set()
+            return rejected, await running, await waiting
+
+    (status, headers, body), running, waiting = asyncio.run(run())
+    assert status == 503
+    assert headers["retry-after"] == "1"
+    assert "saturated" in json.loads(body)["error"]
+    assert running[0] == 200 and waiting[0] == 200
+
+
+def test_chat_serializes_turns_of_a_session(chain):
+    async def run():
+        gated = GatedChain(chain)
+        server = ChatServer(gated, max_concurrency=4)
+        listener, port = await start(server)
+        async with listener:
+            turns = [
+                asyncio.create_task(
+                    request(port, "POST", "/chat", {"input": query, "session": "s1"})
+                )
+                for query in ("first", "second")
+            ]
+            other = asyncio.create_task(
+                request(port, "POST", "/chat", {"input": "other", "session": "s2"})
+            )
+            while gated.active < 2:
+                await asyncio.sleep(0.01)
+            # One turn of each session runs, the second turn of s1 waits
+            await asyncio.sleep(0.1)
+            active = gated.active
+            gated.gate.set()
+            results = [await turn for turn in turns] + [await other]
+        return gated, active, results, server
+
+    gated, active, results, server = asyncio.run(run())
+    assert active == 2
+    assert gated.max_active == 2
+    assert [status for status, _, _ in results] == [200, 200, 200]
+    s1 = [inputs for inputs in gated.inputs if inputs["input"] != "other"]
+    assert [inputs["input"] for inputs in s1] == ["first", "second"]
+    assert s1[0]["history"] == []
+    assert s1[1]["history"] == [("human", "first"), ("ai", FAKE_ANSWER)]
+    assert len(server.sessions["s1"].history) == 4
+
+
+def test_rejected_requests_keep_the_sessions(chain):
+    async def run():
+        gated = GatedChain(chain)
+        server = ChatServer(gated, max_concurrency=1, max_queue=1, max_sessions=1)
+        listener, port = await start(server)
+        async with listener:
+            gated.gate.set()
+            first = await request(
+                port, "POST", "/chat", {"input": "first", "session": "s1"}
+            )
+            gated.gate.clear()
+            turns = [
+                asyncio.create_task(
+                    request(port, "POST", "/chat", {"input": query, "session": "s1"})
+                )
+                for query in ("second", "third")
+            ]
+            while gated.active < 1 or server.waiting < 1:
+                await asyncio.sleep(0.01)
+            invalid = await request(port, "POST", "/chat", {"session": "s2"})
+            rejected = await request(
+                port, "POST", "/chat", {"input": "fourth", "session": "s3"}
+            )
+            sessions = list(server.sessions)
+            gated.gate.set()
+            return [first, *await asyncio.gather(*turns)], invalid, rejected, sessions
+
+    turns, invalid, rejected, sessions = asyncio.run(run())
+    assert [status for status, *_ in turns] == [200, 200, 200]
+    assert invalid[0] == 400 and rejected[0] == 503
+    # Neither the invalid nor the rejected request evicted the only session
+    assert sessions == ["s1"]
+
+
+async def raw_request(port: int, head: bytes) -> tuple[int, dict]:
+    """Send raw request headers and return the status and JSON body."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(head)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, rest = response.partition(b"\r\n")
+    return int(status_line.split(b" ")[1]), json.loads(rest.partition(b"\r\n\r\n")[2])
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1.5"])
+def test_invalid_content_length_is_a_bad_request(chain, length):
+    async def run():
+        listener, port = await start(ChatServer(chain))
+        async with listener:
+            return await raw_request(
+                port,
+                f"POST /chat HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode(),
+            )
+
+    status, body = asyncio.run(run())
+    assert status == 400
+    assert body == {"error": "Invalid Content-Length"}
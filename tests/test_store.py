@@ -0,0 +1,22 @@
+import os
+
+from ragbot.evaluation.store import config_fingerprint
+from ragbot.utils.utils import load_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_fingerprint_ignores_settings_that_keep_outputs():
+    config = load_config(os.path.join(ROOT, "configs", "offline.json"))
+    fingerprint = config_fingerprint(config, "corpus")
+
+    for key, value in [
+        ("chunking_workers", 4),
+        ("dump_chunks", True),
+        ("embedding_workers", 8),
+        ("judge_llm", "4"),
+    ]:
+        assert config_fingerprint({**config, key: value}, "corpus") == fingerprint
+    for key, value in [("chunk_size", 1500), ("k_docs", 2), ("llm", "Other answer.")]:
+        assert config_fingerprint({**config, key: value}, "corpus") != fingerprint
+    assert config_fingerprint(config, "edited corpus") != fingerprint
@@ -0,0 +1,37 @@
+import json
+
+from ragbot import sweep
+from ragbot.sweep import build_indexes, expand_grid
+
+BASE = {
+    "embeddings_provider": "fake",
+    "embedding_model": "16",
+    "chunk_size": 3000,
+    "chunk_overlap": 600,
+}
+
+
+def test_build_indexes_once_per_index_and_backend(monkeypatch):
+    built = []
+    monkeypatch.setattr(sweep, "get_vectorstore", lambda **kwargs: built.append(kwargs))
+    configs = expand_grid(
+        BASE,
+        {
+            "k_docs": [2, 4],
+            "vectorstore": ["chroma", "ivf"],
+            "ann": [{"nlist": 8, "nprobe": 2}, {"nprobe": 2, "nlist": 8}, {"nlist": 4}],
+            "dedup_threshold": [None, 0.8],
+        },
+    )
+
+    assert build_indexes("example", configs) == 8
+    assert len(built) == 8
+    assert {
+        (b["backend"], json.dumps(b["ann"], sort_keys=True), b["dedup_threshold"])
+        for b in built
+    } == {
+        (backend, json.dumps(ann, sort_keys=True), threshold)
+        for backend in ["chroma", "ivf"]
+        for ann in [{"nlist": 8, "nprobe": 2}, {"nlist": 4}]
+        for threshold in [None, 0.8]
+    }